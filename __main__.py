@@ -1,6 +1,5 @@
 """The web server command line interface."""
 import argparse
-from uhue.app import app
 
 
 parser = argparse.ArgumentParser(description=__doc__)
@@ -10,13 +9,48 @@ parser.add_argument('--port', '-p',
     required=False,
     default=8080
 )
+parser.add_argument('--host',
+    type=str,
+    help='The address to listen at (e.g., 0.0.0.0 for every interface).',
+    required=False,
+    default='127.0.0.1'
+)
 parser.add_argument('--debug', '-d',
     help='Whether to run the server in debugging mode.',
     required=False,
     default=False,
     action='store_true'
 )
+parser.add_argument('--production',
+    help='Whether to run the server with a production WSGI server (waitress or gunicorn).',
+    required=False,
+    default=False,
+    action='store_true'
+)
+parser.add_argument('--workers', '-w',
+    type=int,
+    help='The number of worker processes in production mode (more than 1 needs gunicorn).',
+    required=False,
+    default=1
+)
+parser.add_argument('--threads', '-t',
+    type=int,
+    help='The number of request threads per worker in production mode.',
+    required=False,
+    default=8
+)
+parser.add_argument('--streams', '-s',
+    type=int,
+    help='The most live-update event streams open at once in production mode (each holds a thread).',
+    required=False,
+    default=4
+)
 args = parser.parse_args()
 
 
-app.run(port=args.port, debug=args.debug)
+if args.production:
+    from uhue.serve import serve
+    serve(args.host, args.port, workers=args.workers, threads=args.threads, streams=args.streams)
+else:
+    from uhue.app import create_app
+    create_app().run(host=args.host, port=args.port, debug=args.debug, threaded=True)
@@ -0,0 +1,56 @@
+"""Benchmark the table-driven color conversion against the pow-based path."""
+import argparse
+import os
+import sys
+import timeit
+import numpy as np
+from numba import njit, prange
+
+
+# make `uhue` importable when run from the benchmarks directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from uhue.philips_hue import colors
+
+
+@njit(parallel=True)
+def rgb_to_xy_bri_array_pow(rgb):
+    """Convert colors with a pow call per channel (the original path)."""
+    xy = np.empty((rgb.shape[0], 2), dtype=np.float64)
+    brightness = np.empty(rgb.shape[0], dtype=np.int64)
+    for i in prange(rgb.shape[0]):
+        r = colors.correct_rgb2xyz_gamma(rgb[i, 0])
+        g = colors.correct_rgb2xyz_gamma(rgb[i, 1])
+        b = colors.correct_rgb2xyz_gamma(rgb[i, 2])
+        X = r * 0.664511 + g * 0.154324 + b * 0.162028
+        Y = r * 0.283881 + g * 0.668433 + b * 0.047685
+        Z = r * 0.000088 + g * 0.072310 + b * 0.986039
+        denominator = X + Y + Z
+        xy[i, 0] = X / denominator if denominator > 0 else 0
+        xy[i, 1] = Y / denominator if denominator > 0 else 0
+        brightness[i] = min(255, max(0, int(Y * 255.0)))
+    return xy, brightness
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', '-n',
+        type=int,
+        help='The number of colors to convert per call.',
+        required=False,
+        default=1000000
+    )
+    args = parser.parse_args()
+    colors.compile_kernels()
+    rgb = np.random.randint(0, 256, size=(args.size, 3))
+    # call each kernel once to exclude compilation from the timings
+    table = colors.rgb_to_xy_bri_array(rgb)
+    power = rgb_to_xy_bri_array_pow(rgb)
+    assert np.array_equal(table[0], power[0]) and np.array_equal(table[1], power[1])
+    for name, function in [('table', colors.rgb_to_xy_bri_array), ('pow', rgb_to_xy_bri_array_pow)]:
+        seconds = min(timeit.repeat(lambda: function(rgb), number=1, repeat=5))
+        print(f'{name:<8}{seconds * 1e3:>10.2f} ms for {args.size} colors')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark the startup time of uhue (imports and first render latency)."""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+# the top level of the repository, so that `uhue` is importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Python snippets timed in a fresh interpreter, each prints elapsed seconds
+SNIPPETS = {
+    'import uhue.philips_hue': '''
+import time
+start = time.perf_counter()
+import uhue.philips_hue
+print(time.perf_counter() - start)
+''',
+    'import uhue.app': '''
+import time
+start = time.perf_counter()
+import uhue.app
+print(time.perf_counter() - start)
+''',
+    'first color conversion': '''
+import time
+from uhue.philips_hue.colors import rgb_to_xy_bri, xy_bri_to_rgb
+start = time.perf_counter()
+xy_bri_to_rgb(*rgb_to_xy_bri(255, 128, 0)[0], 128)
+print(time.perf_counter() - start)
+''',
+    'first lights page render': '''
+import time
+from uhue.app import create_app
+from uhue.views import LightView
+light = {
+    'name': 'Light', 'manufacturername': 'Signify', 'productname': 'Hue color lamp',
+    'config': {'archetype': 'sultanbulb'}, 'state': {'on': True, 'bri': 200, 'xy': [0.3, 0.3]},
+}
+with create_app().test_request_context('/lights'):
+    import flask
+    start = time.perf_counter()
+    views = [LightView(light_id, light) for light_id in range(30)]
+    flask.render_template('lights.html', lights=views)
+    print(time.perf_counter() - start)
+''',
+}
+
+
+def measure(snippet: str, repeat: int) -> list:
+    """Return the times measured by a snippet in fresh interpreters."""
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', snippet],
+            cwd=ROOT,
+            check=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return times
+
+
+def main() -> None:
+    """Run the benchmark and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', '-r',
+        type=int,
+        help='The number of fresh interpreters to measure each step in.',
+        required=False,
+        default=5
+    )
+    args = parser.parse_args()
+    print(f'{"step":<28}{"first (ms)":>12}{"median (ms)":>14}')
+    for name, snippet in SNIPPETS.items():
+        # the first run may populate the on-disk compilation cache
+        times = measure(snippet, args.repeat)
+        print(f'{name:<28}{times[0] * 1e3:>12.1f}{statistics.median(times) * 1e3:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,60 @@
 """The web application."""
+import functools
+import gzip
+import json
+import math
 import os
+import uuid
+from typing import TYPE_CHECKING
 import flask
 from . import philips_hue
+from .philips_hue.animation import breathe, colorloop
+from .philips_hue.colors import gamut_of, rgb_to_xy_bri, rgb_to_xy_bri_in_gamut
+from .services import Services
 from .util import hex_to_rgb
+from .views import light_views, group_views, scene_views
+if TYPE_CHECKING:
+    from typing import Callable
 
 
-# create the Flask web server
-app = flask.Flask(__name__)
+# the routes of the web application
+routes = flask.Blueprint('uhue', __name__)
 
 
-# create the connection to the Hue bridge
-bridge = philips_hue.Bridge()
-# check for a configuration file and load it
-if bridge.has_config_file:
-    bridge.load_config_file()
+def create_app(config: dict = None) -> flask.Flask:
+    """
+    Create a new instance of the web application.
+
+    Each instance (e.g., each worker process of a WSGI server) gets its own
+    connection to the bridge and background services, so the factory should
+    be called after the worker processes are forked.
+
+    Args:
+        config: optional configuration values that override the defaults
+
+    Returns:
+        the Flask application
+
+    """
+    # create the Flask web server
+    app = flask.Flask(__name__)
+    # the most requests a single page render may send to the bridge
+    app.config.setdefault('MAX_BRIDGE_REQUESTS_PER_PAGE', 2)
+    # the smallest JSON state response to compress for clients that accept gzip
+    app.config.setdefault('STATE_API_GZIP_MIN_BYTES', 1024)
+    # the fraction of the bridge's capacity that this process may use
+    app.config.setdefault('BRIDGE_SHARE', 1.0)
+    # the most event streams open at once, each holds a server thread
+    app.config.setdefault('MAX_EVENT_STREAMS', 4)
+    app.config.update(config or {})
+    app.extensions['uhue'] = Services(app.config)
+    app.register_blueprint(routes)
+    return app
+
+
+def services() -> Services:
+    """Return the services of the current application."""
+    return flask.current_app.extensions['uhue']
 
 
 # ----------------------------------------------------------------------------
@@ -21,47 +62,47 @@ if bridge.has_config_file:
 # ----------------------------------------------------------------------------
 
 
-@app.route('/site.webmanifest')
+@routes.route('/site.webmanifest')
 def webmanifest():
     """Return the web manifest associated with the application."""
     return flask.send_from_directory(
-        os.path.join(app.root_path, 'static'),
+        os.path.join(flask.current_app.root_path, 'static'),
         'site.webmanifest', mimetype='application/manifest+json'
     )
 
 
-@app.route('/favicon.ico')
+@routes.route('/favicon.ico')
 def favicon():
     """Return the favicon associated with the application."""
     return flask.send_from_directory(
-        os.path.join(app.root_path, 'static'),
+        os.path.join(flask.current_app.root_path, 'static'),
         'favicon.ico', mimetype='image/vnd.microsoft.icon'
     )
 
 
-@app.route('/img/android-chrome-192x192.png')
+@routes.route('/img/android-chrome-192x192.png')
 def icon192():
     """Return the icon associated with the application."""
     return flask.send_from_directory(
-        os.path.join(app.root_path, 'static'),
+        os.path.join(flask.current_app.root_path, 'static'),
         'img/android-chrome-192x192.png', mimetype='image/vnd.microsoft.icon'
     )
 
 
-@app.route('/img/android-chrome-512x512.png')
+@routes.route('/img/android-chrome-512x512.png')
 def icon512():
     """Return the icon associated with the application."""
     return flask.send_from_directory(
-        os.path.join(app.root_path, 'static'),
+        os.path.join(flask.current_app.root_path, 'static'),
         'img/android-chrome-512x512.png', mimetype='image/vnd.microsoft.icon'
     )
 
 
-@app.route('/img/apple-touch-icon.png')
+@routes.route('/img/apple-touch-icon.png')
 def apple_touch_icon():
     """Return the icon associated with the application."""
     return flask.send_from_directory(
-        os.path.join(app.root_path, 'static'),
+        os.path.join(flask.current_app.root_path, 'static'),
         'img/apple-touch-icon.png', mimetype='image/vnd.microsoft.icon'
     )
 
@@ -71,7 +112,43 @@ def apple_touch_icon():
 # ----------------------------------------------------------------------------
 
 
-@app.route("/")
+def bridge_request_budget(route):
+    """
+    Guard a page against sending too many requests to the bridge.
+
+    Renders that exceed MAX_BRIDGE_REQUESTS_PER_PAGE raise an AssertionError
+    when the app is testing and log a warning otherwise.
+
+    Args:
+        route: the page route to guard
+
+    Returns:
+        the guarded page route
+
+    """
+    @functools.wraps(route)
+    def guarded_route(*args, **kwargs):
+        with services().bridge.count_requests() as counter:
+            response = route(*args, **kwargs)
+        count = counter.value
+        limit = flask.current_app.config['MAX_BRIDGE_REQUESTS_PER_PAGE']
+        if count > limit:
+            message = f'{flask.request.path} sent {count} requests to the bridge (limit {limit})'
+            if flask.current_app.testing:
+                raise AssertionError(message)
+            flask.current_app.logger.warning(message)
+        return response
+    return guarded_route
+
+
+@routes.app_errorhandler(philips_hue.PhueBridgeUnavailable)
+def bridge_unavailable(error):
+    """Answer right away while the bridge is down instead of waiting on it."""
+    retry_after = max(1, math.ceil(services().bridge.breaker.retry_after()))
+    return flask.Response(error.message, status=503, mimetype='text/plain', headers={'Retry-After': str(retry_after)})
+
+
+@routes.route("/")
 def home():
     """Return the home page."""
     # TODO: allow setting of different home page
@@ -80,67 +157,218 @@ def home():
 
 def render_register_page():
     """TODO."""
+    bridge = services().bridge
     bridge.ip_address = philips_hue.find_bridge()
     if bridge.ip_address is None:  # TODO: bridge not found page
         return 400
     return flask.render_template("register.html", ip_address=bridge.ip_address)
 
 
-@app.route("/lights")
+@routes.route("/lights")
+@bridge_request_budget
 def lights():
     """Return the lights page."""
+    bridge = services().bridge
     if bridge.can_login:
-        lights_ = sorted(bridge.lights, key=lambda x: x.name)
-        return flask.render_template("lights.html", lights=lights_)
+        return flask.render_template("lights.html", lights=light_views(bridge))
     return render_register_page()
 
 
-@app.route("/groups")
+@routes.route("/groups")
+@bridge_request_budget
 def groups():
     """Return the groups page."""
+    bridge = services().bridge
     if bridge.can_login:
-        groups_ = sorted(bridge.groups, key=lambda x: x.name)
-        return flask.render_template("groups.html", groups=groups_)
+        return flask.render_template("groups.html", groups=group_views(bridge))
     return render_register_page()
 
 
-@app.route("/scenes")
+@routes.route("/scenes")
 def scenes():
     """Return the scenes page."""
+    bridge = services().bridge
     if bridge.can_login:
-        scenes_ = sorted(bridge.scenes, key=lambda x: x.name)
-        return flask.render_template("scenes.html", scenes=scenes_)
+        return flask.render_template("scenes.html", scenes=scene_views(bridge))
     return render_register_page()
 
 
-@app.route("/sensors")
+@routes.route("/sensors")
 def sensors():
     """Return the sensors page."""
+    bridge = services().bridge
     if bridge.can_login:
         sensors_ = sorted(bridge.sensors, key=lambda x: x.name)
         return flask.render_template("sensors.html", sensors=sensors_)
     return render_register_page()
 
 
-@app.route("/animations")
+@routes.route("/animations")
 def animations():
     """Return the animations page."""
-    if bridge.can_login:
-        # TODO: animation design
-        return flask.render_template("animations.html")
+    if services().bridge.can_login:
+        return flask.render_template("animations.html", animations=services().animation_engine.statistics())
     return render_register_page()
 
 
+# ----------------------------------------------------------------------------
+# MARK: State API
+# ----------------------------------------------------------------------------
+
+
+# the collections that the state API serves
+STATE_COLLECTIONS = ('lights', 'groups', 'sensors')
+# a token that keeps ETags from a previous run of the server from matching
+# the restarted version counters
+STATE_EPOCH = uuid.uuid4().hex[:8]
+
+
+def versioned_state(names: tuple) -> tuple:
+    """
+    Return cached collections and a strong ETag of their versions.
+
+    Args:
+        names: the names of the collections to return
+
+    Returns:
+        a tuple of (dictionary of collections keyed by name, ETag string)
+
+    """
+    state = dict()
+    versions = list()
+    for name in names:
+        data, version = services().bridge.cache.get_versioned(name)
+        state[name] = data
+        versions.append(f'{name[0]}{version}')
+    return state, '-'.join([STATE_EPOCH] + versions)
+
+
+def state_response(tag: str, body: 'Callable[[], object]'):
+    """
+    Return a JSON response with a strong ETag, or 304 if the client has it.
+
+    Args:
+        tag: the ETag of the state (without quotes or encoding suffix)
+        body: a callable that returns the JSON data, only called if the
+            encoded body isn't cached
+
+    Returns:
+        the response to send to the client
+
+    """
+    use_gzip = 'gzip' in flask.request.accept_encodings
+    # gzipped and plain bodies are different representations with distinct
+    # strong ETags, but either means the client is up to date
+    if tag in flask.request.if_none_match or f'{tag}-gz' in flask.request.if_none_match:
+        response = flask.Response(status=304)
+        response.set_etag(f'{tag}-gz' if use_gzip and f'{tag}-gz' in flask.request.if_none_match else tag)
+        response.vary.add('Accept-Encoding')
+        return response
+    services_ = services()
+    with services_.encoded_states_lock:
+        encoded = services_.encoded_states.get(tag)
+    if encoded is None:
+        data = json.dumps(body(), separators=(',', ':')).encode('utf-8')
+        compressed = None
+        if len(data) >= flask.current_app.config['STATE_API_GZIP_MIN_BYTES']:
+            compressed = gzip.compress(data, compresslevel=6)
+        encoded = (data, compressed)
+        with services_.encoded_states_lock:
+            services_.encoded_states[tag] = encoded
+            while len(services_.encoded_states) > 64:
+                services_.encoded_states.popitem(last=False)
+    data, compressed = encoded
+    response = flask.Response(data, mimetype='application/json')
+    if use_gzip and compressed is not None:
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(f'{tag}-gz')
+    else:
+        response.set_etag(tag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@routes.route("/hue/state")
+def hue_state():
+    """Return the cached lights, groups, and sensors."""
+    state, tag = versioned_state(STATE_COLLECTIONS)
+    errors = {name: data for name, data in state.items() if not isinstance(data, dict)}
+    if errors:  # the bridge reported an error
+        return flask.jsonify({'error': errors}), 502
+    return state_response(f'state-{tag}', lambda: state)
+
+
+def resource_state(collection: str, resource_id: int = None):
+    """
+    Return a cached collection, or one resource in it.
+
+    Args:
+        collection: the name of the collection (e.g., 'lights')
+        resource_id: the ID of the resource, or None for the collection
+
+    Returns:
+        the response to send to the client
+
+    """
+    state, tag = versioned_state((collection, ))
+    data = state[collection]
+    if not isinstance(data, dict):  # the bridge reported an error
+        return flask.jsonify({'error': data}), 502
+    if resource_id is None:
+        return state_response(f'{collection}-{tag}', lambda: data)
+    if str(resource_id) not in data:
+        return flask.jsonify({'error': f'{collection[:-1]} {resource_id} not found'}), 404
+    return state_response(f'{collection}-{resource_id}-{tag}', lambda: data[str(resource_id)])
+
+
+@routes.route("/hue/lights", methods=['GET'])
+def hue_light_states():
+    """Return the cached state of the lights."""
+    return resource_state('lights')
+
+
+@routes.route("/hue/lights/<int:light_id>", methods=['GET'])
+def hue_light_state(light_id: int):
+    """Return the cached state of a light."""
+    return resource_state('lights', light_id)
+
+
+@routes.route("/hue/groups", methods=['GET'])
+def hue_group_states():
+    """Return the cached state of the groups."""
+    return resource_state('groups')
+
+
+@routes.route("/hue/groups/<int:group_id>", methods=['GET'])
+def hue_group_state(group_id: int):
+    """Return the cached state of a group."""
+    return resource_state('groups', group_id)
+
+
+@routes.route("/hue/sensors", methods=['GET'])
+def hue_sensor_states():
+    """Return the cached state of the sensors."""
+    return resource_state('sensors')
+
+
+@routes.route("/hue/sensors/<int:sensor_id>", methods=['GET'])
+def hue_sensor_state(sensor_id: int):
+    """Return the cached state of a sensor."""
+    return resource_state('sensors', sensor_id)
+
+
 # ----------------------------------------------------------------------------
 # MARK: Hue API
 # ----------------------------------------------------------------------------
 
 
-@app.route("/hue/register", methods=['POST'])
+@routes.route("/hue/register", methods=['POST'])
 def register():
     """Return the home page."""
     try:
-        bridge.register()
+        services().bridge.register()
     except philips_hue.PhueRegistrationException:
         return {'PhueRegistrationException': 0}
     # return {'redirect': '/'}
@@ -148,41 +376,123 @@ def register():
     return flask.redirect('/')
 
 
-@app.route("/hue/lights", methods=['POST'])
-def hue_lights():
-    """Handle a lights endpoint"""
-    data = flask.request.json
+def parse_command(data: dict, gamut=None) -> dict:
+    """
+    Convert a parameter / value pair from the front-end to a command body.
+
+    Args:
+        data: the JSON data posted by the front-end
+        gamut: the optional color gamut of the target to project colors into
+
+    Returns:
+        the body of the command to send to the bridge
+
+    """
     if data['parameter'] == 'color':
         rgb = hex_to_rgb(data['value'].lstrip('#'))
-        bridge.get_light_objects(mode='id')[int(data['light_id'])].color = rgb
-        return 'set value'
+        if gamut is None:
+            xy, bri = rgb_to_xy_bri(*rgb)
+        else:
+            xy, bri = rgb_to_xy_bri_in_gamut(*rgb, gamut)
+        return {'xy': list(xy), 'bri': bri}
     if data['parameter'] == 'on':
-        data['value'] = bool(data['value'])
-    else:
-        data['value'] = int(data['value'])
-    bridge.set_light(int(data['light_id']), data['parameter'], data['value'])
+        return {'on': bool(data['value'])}
+    return {data['parameter']: int(data['value'])}
+
+
+@routes.route("/hue/events")
+def hue_events():
+    """Stream changes of light and group state as server-sent events."""
+    state_poller = services().state_poller
+    subscriber = state_poller.subscribe()
+    if subscriber is None:  # browsers don't reconnect after an error status
+        message = 'Too many open event streams, pages will not update live.'
+        return flask.Response(message, status=503, mimetype='text/plain', headers={'Retry-After': '60'})
+    response = flask.Response(state_poller.stream(subscriber=subscriber),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    # free the stream's slot even if the server closes it before it starts
+    response.call_on_close(lambda: state_poller.unsubscribe(subscriber))
+    return response
+
+
+@routes.route("/hue/lights", methods=['POST'])
+def hue_lights():
+    """Handle a lights endpoint"""
+    data = flask.request.json
+    light = services().bridge.get_light(int(data['light_id']))
+    gamut = gamut_of(light.get('modelid'), light.get('capabilities'))
+    services().commands.put_light(int(data['light_id']), parse_command(data, gamut))
     return 'set value'
 
 
-@app.route("/hue/groups", methods=['POST'])
+@routes.route("/hue/groups", methods=['POST'])
 def hue_groups():
     """Handle a groups endpoint"""
     data = flask.request.json
-    if data['parameter'] == 'color':
-        rgb = hex_to_rgb(data['value'].lstrip('#'))
-        # TODO: map group ID to group objects in the Bridge
-        for group in bridge.groups:
-            if group.group_id == data['group_id']:
-                group.color = rgb
-        return 'set value'
-    if data['parameter'] == 'on':
-        data['value'] = bool(data['value'])
-    else:
-        data['value'] = int(data['value'])
-    bridge.set_group(int(data['group_id']), data['parameter'], data['value'])
+    services().commands.put_group(int(data['group_id']), parse_command(data))
     return 'set value'
 
 
+@routes.route("/hue/scenes", methods=['POST'])
+def hue_scenes():
+    """Handle a scenes endpoint"""
+    data = flask.request.json
+    services().bridge.activate_scene(int(data['group_id']), data['scene_id'])
+    return 'set value'
+
+
+def build_animation(data: dict) -> philips_hue.animation.Animation:
+    """
+    Build an animation from the JSON data posted by the front-end.
+
+    Args:
+        data: the JSON data with the 'animation' type ('colorloop', 'breathe',
+            or 'keyframes') and the 'lights' / 'groups' to animate
+
+    Returns:
+        the animation to play
+
+    """
+    targets = {'lights': data.get('lights', []), 'groups': data.get('groups', [])}
+    if not targets['lights'] and not targets['groups']:
+        targets['lights'] = [int(light_id) for light_id in services().bridge.get_light()]
+    if data['animation'] == 'colorloop':
+        return colorloop(period=float(data.get('period', 10.0)), **targets)
+    if data['animation'] == 'breathe':
+        return breathe(period=float(data.get('period', 4.0)), **targets)
+    if data['animation'] == 'keyframes':
+        return philips_hue.KeyframeAnimation(data['keyframes'], loop=bool(data.get('loop', False)), **targets)
+    raise ValueError(f'unknown animation {repr(data["animation"])}')
+
+
+@routes.route("/hue/animations", methods=['GET'])
+def hue_animation_statistics():
+    """Return the statistics of the playing animations."""
+    return flask.jsonify(services().animation_engine.statistics())
+
+
+@routes.route("/hue/animations", methods=['POST'])
+def hue_animations():
+    """Start, stop, pause, or resume an animation."""
+    data = flask.request.json
+    animation_engine = services().animation_engine
+    try:
+        if data['action'] == 'start':
+            animation_engine.start(data['name'], build_animation(data))
+        elif data['action'] == 'stop':
+            animation_engine.stop(data['name'])
+        elif data['action'] == 'pause':
+            animation_engine.pause(data['name'])
+        elif data['action'] == 'resume':
+            animation_engine.resume(data['name'])
+        else:
+            raise ValueError(f'unknown action {repr(data["action"])}')
+    except (KeyError, ValueError) as error:
+        return flask.jsonify({'error': str(error)}), 400
+    return flask.jsonify(animation_engine.statistics())
+
 
 
 
@@ -197,7 +507,7 @@ def hue_groups():
 #         raise RuntimeError('Not running with the Werkzeug Server')
 #     func()
 
-# @app.route('/shutdown', methods=['GET'])
+# @routes.route('/shutdown', methods=['GET'])
 # def shutdown():
 #     shutdown_server()
 #     return 'Server shutting down...'
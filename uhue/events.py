@@ -0,0 +1,265 @@
+"""A relay that pushes changes of bridge state to browsers."""
+import json
+import queue
+import threading
+from .views import LightView, GroupView
+
+
+# the view-model fields that pages display and that are pushed on change
+FIELDS = ('name', 'on', 'brightness', 'color_hex')
+# the view-models that describe each collection
+VIEWS = {'lights': LightView, 'groups': GroupView}
+
+
+def snapshot(collection: str, data: dict, aggregates: dict = None) -> dict:
+    """
+    Return the displayed fields of every resource in a collection.
+
+    Args:
+        collection: the name of the collection ('lights' or 'groups')
+        data: the collection as returned by the bridge
+        aggregates: the combined state of each group's lights keyed by group
+            ID, used for groups if given (see MembershipIndex.aggregates)
+
+    Returns:
+        a dictionary mapping resource IDs (str) to dictionaries of fields
+
+    """
+    view = VIEWS[collection]
+    fields = dict()
+    for resource_id, resource in data.items():
+        try:
+            if collection == 'groups' and aggregates is not None:
+                resource_view = view(int(resource_id), resource, aggregates.get(resource_id))
+            else:
+                resource_view = view(int(resource_id), resource)
+        except (KeyError, TypeError, ValueError):  # not a renderable resource
+            continue
+        fields[resource_id] = {field: getattr(resource_view, field) for field in FIELDS}
+    return fields
+
+
+def diff(previous: dict, current: dict) -> dict:
+    """
+    Return the fields that changed between two snapshots of a collection.
+
+    Args:
+        previous: the earlier snapshot
+        current: the later snapshot
+
+    Returns:
+        a dictionary mapping resource IDs to the fields that changed. New
+        resources include all their fields
+
+    """
+    changes = dict()
+    for resource_id, fields in current.items():
+        old = previous.get(resource_id, {})
+        changed = {key: value for key, value in fields.items() if old.get(key) != value}
+        if changed:
+            changes[resource_id] = changed
+    return changes
+
+
+def merge(pending: dict, changes: dict) -> dict:
+    """
+    Return two updates combined into one.
+
+    Args:
+        pending: the earlier dictionary of changes keyed by collection name
+        changes: the later dictionary of changes keyed by collection name
+
+    Returns:
+        a new dictionary with the fields of both, the later values win
+
+    """
+    merged = {collection: {resource_id: dict(fields) for resource_id, fields in resources.items()}
+        for collection, resources in pending.items()
+    }
+    for collection, resources in changes.items():
+        merged_resources = merged.setdefault(collection, dict())
+        for resource_id, fields in resources.items():
+            merged_resources.setdefault(resource_id, dict()).update(fields)
+    return merged
+
+
+class StatePoller:
+    """A relay of polled bridge changes shared by every subscriber."""
+
+    def __init__(self, polling, max_backlog: int = 32, max_subscribers: int = None) -> None:
+        """
+        Initialize a new state poller.
+
+        Args:
+            polling: the PollingService that watches the bridge
+            max_backlog: the number of undelivered updates a subscriber may
+                queue before they are merged into one
+            max_subscribers: the most subscribers at once (each open event
+                stream holds a server thread), or None for no limit
+
+        Returns:
+            None
+
+        """
+        self.polling = polling
+        self.bridge = polling.bridge
+        self.max_backlog = max_backlog
+        self.max_subscribers = max_subscribers
+        # the latest snapshot of each collection
+        self._snapshots = dict()
+        # the queues of the connected subscribers
+        self._subscribers = set()
+        # the handles of the subscriptions to the polling service
+        self._handles = list()
+        self._lock = threading.Lock()
+        # serializes publishers so a merged backlog always fits the queue
+        self._publish_lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(subscribers={len(self._subscribers)})'
+
+    def subscribe(self) -> queue.Queue:
+        """
+        Register a new subscriber and start watching if it is the first.
+
+        Returns:
+            a queue that receives dictionaries of changes keyed by collection
+            name. The first item is the latest snapshot, if there is one.
+            None if max_subscribers are already subscribed
+
+        """
+        subscriber = queue.Queue(self.max_backlog)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                return None
+            if self._snapshots:
+                subscriber.put(dict(self._snapshots))
+            self._subscribers.add(subscriber)
+            if not self._handles:
+                # start from whatever is cached so that the first change only
+                # pushes the fields that differ
+                aggregates = self.bridge.memberships.aggregates(cached_only=True)
+                for collection in VIEWS:
+                    data = self.bridge.cache.peek(collection)
+                    if isinstance(data, dict):
+                        self._snapshots[collection] = snapshot(collection, data, aggregates)
+                self._handles = [self.polling.subscribe(self._on_change, collection) for collection in VIEWS]
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        """
+        Remove a subscriber, watching stops when the last one leaves.
+
+        Args:
+            subscriber: the queue returned by subscribe, removing it again
+                has no effect
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.discard(subscriber)
+            if self._subscribers:
+                return
+            handles, self._handles = self._handles, list()
+            # the snapshots go stale without updates, rebuild them next time
+            self._snapshots.clear()
+        for handle in handles:
+            self.polling.unsubscribe(handle)
+
+    def publish(self, changes: dict) -> None:
+        """
+        Send changes to every subscriber, merging the backlog of slow ones.
+
+        Updates only hold the fields that changed, so none can be dropped.
+        When a subscriber falls behind, its queued updates and the changes
+        are merged into a single update instead.
+
+        Args:
+            changes: a dictionary of changes keyed by collection name
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        with self._publish_lock:
+            for subscriber in subscribers:
+                try:
+                    subscriber.put_nowait(changes)
+                    continue
+                except queue.Full:  # a slow client, merge its backlog
+                    pass
+                pending = dict()
+                while True:
+                    try:
+                        pending = merge(pending, subscriber.get_nowait())
+                    except queue.Empty:
+                        break
+                subscriber.put_nowait(merge(pending, changes))
+
+    def _on_change(self, collection: str, changes: dict) -> None:
+        """Publish the displayed fields of resources that the poller saw change."""
+        if not isinstance(self.bridge.cache.peek(collection), dict):
+            return
+        changed_ids = {collection: set(changes)}
+        if collection == 'lights':
+            # groups show the combined state of their lights, so the groups
+            # of changed lights change too
+            changed_ids['groups'] = {group_id for light_id in changes for group_id in self.bridge.memberships.groups_of(light_id)}
+        aggregates = self.bridge.memberships.aggregates(cached_only=True)
+        published = dict()
+        for name, resource_ids in changed_ids.items():
+            data = self.bridge.cache.peek(name)
+            if not isinstance(data, dict):
+                continue
+            current = snapshot(name, {resource_id: data[resource_id] for resource_id in resource_ids if resource_id in data}, aggregates)
+            with self._lock:
+                previous = self._snapshots.setdefault(name, dict())
+                changed = diff(previous, current)
+                previous.update(current)
+                for resource_id in [resource_id for resource_id in resource_ids if resource_id not in data]:
+                    previous.pop(resource_id, None)
+            if changed:
+                published[name] = changed
+        if published:
+            self.publish(published)
+
+    def stream(self, keepalive: float = 15.0, subscriber: queue.Queue = None):
+        """
+        Yield server-sent events with the changes for one subscriber.
+
+        Args:
+            keepalive: the number of idle seconds between comment lines that
+                keep proxies from closing the connection
+            subscriber: the queue returned by subscribe, or None to subscribe
+                when the stream starts (the stream is empty if that fails)
+
+        Returns:
+            a generator of server-sent event strings
+
+        """
+        if subscriber is None:
+            subscriber = self.subscribe()
+            if subscriber is None:
+                return
+        try:
+            # send the headers right away instead of with the first change
+            yield ': connected\n\n'
+            while True:
+                try:
+                    changes = subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'data: {json.dumps(changes)}\n\n'
+        finally:
+            self.unsubscribe(subscriber)
+
+
+# explicitly define the outward facing API of this module
+__all__ = [StatePoller.__name__]
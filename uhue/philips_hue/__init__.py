@@ -1,4 +1,8 @@
 """The phue project, forked and turned into a package of modules."""
+from .animation import AnimationEngine, KeyframeAnimation, ProceduralAnimation
 from .bridge import Bridge
+from .async_bridge import AsyncBridge
+from .commands import CommandQueue
+from .polling import PollingService
 from .upnp import find_bridge
-from .exceptions import PhueRegistrationException
+from .exceptions import PhueBridgeUnavailable, PhueRegistrationException
@@ -0,0 +1,509 @@
+"""An engine that plays animations over lights and groups."""
+import colorsys
+import math
+import threading
+import time
+from typing import TYPE_CHECKING
+from .colors import rgb_to_xy_bri
+from .logger import logger
+from .scheduler import BACKGROUND
+if TYPE_CHECKING:
+    from typing import Callable
+
+
+class Animation:
+    """An abstract base class for animations of lights and groups."""
+
+    def __init__(self, lights: list = (), groups: list = (), duration: float = None) -> None:
+        """
+        Initialize a new animation.
+
+        Args:
+            lights: the IDs of the lights to animate
+            groups: the IDs of the groups to animate
+            duration: the length of the animation in seconds or None to play
+                until stopped
+
+        Returns:
+            None
+
+        """
+        self.targets = [('lights', int(x)) for x in lights] + [('groups', int(x)) for x in groups]
+        self.duration = duration
+
+    def __repr__(self):
+        return f'<{self.__class__.__module__}.{self.__class__.__name__} targets={self.targets} duration={self.duration}>'
+
+    def state(self, t: float, index: int, target: tuple) -> dict:
+        """
+        Return the state of a target at a point in time.
+
+        Args:
+            t: the number of seconds since the animation started
+            index: the index of the target in the targets list
+            target: the (resource type, ID) tuple of the target
+
+        Returns:
+            the state to send to the target (e.g., {'xy': [x, y], 'bri': b})
+
+        """
+        raise NotImplementedError
+
+    def frame(self, t: float) -> dict:
+        """
+        Return the state of every target at a point in time.
+
+        Args:
+            t: the number of seconds since the animation started
+
+        Returns:
+            a dictionary mapping (resource type, ID) tuples to states
+
+        """
+        return {target: self.state(t, index, target) for index, target in enumerate(self.targets)}
+
+
+class KeyframeAnimation(Animation):
+    """An animation that interpolates between keyframes in xy/bri space."""
+
+    def __init__(self,
+        keyframes: list,
+        lights: list = (),
+        groups: list = (),
+        loop: bool = False
+    ) -> None:
+        """
+        Initialize a new keyframe animation.
+
+        Args:
+            keyframes: a list of (time in seconds, state) pairs sorted by time.
+                States may define 'xy', 'bri', and other attributes (e.g.,
+                'on') that are held until the next keyframe
+            lights: the IDs of the lights to animate
+            groups: the IDs of the groups to animate
+            loop: whether to repeat the keyframes until stopped
+
+        Returns:
+            None
+
+        """
+        if not keyframes:
+            raise ValueError('keyframes must not be empty')
+        self.keyframes = sorted(((float(t), dict(state)) for t, state in keyframes), key=lambda x: x[0])
+        self.loop = loop
+        super().__init__(lights, groups, None if loop else self.keyframes[-1][0])
+
+    def state(self, t: float, index: int, target: tuple) -> dict:
+        if self.loop and self.keyframes[-1][0] > 0:
+            t = t % self.keyframes[-1][0]
+        # find the keyframes before and after the time
+        previous = self.keyframes[0]
+        for keyframe in self.keyframes:
+            if keyframe[0] > t:
+                break
+            previous = keyframe
+        else:
+            return dict(previous[1])
+        if keyframe is previous:  # before the first keyframe
+            return dict(previous[1])
+        progress = (t - previous[0]) / (keyframe[0] - previous[0])
+        state = dict(previous[1])
+        if 'xy' in previous[1] and 'xy' in keyframe[1]:
+            state['xy'] = [a + (b - a) * progress for a, b in zip(previous[1]['xy'], keyframe[1]['xy'])]
+        if 'bri' in previous[1] and 'bri' in keyframe[1]:
+            state['bri'] = int(round(previous[1]['bri'] + (keyframe[1]['bri'] - previous[1]['bri']) * progress))
+        return state
+
+
+class ProceduralAnimation(Animation):
+    """An animation that computes states with a function of time."""
+
+    def __init__(self,
+        function: 'Callable[[float, int, tuple], dict]',
+        lights: list = (),
+        groups: list = (),
+        duration: float = None
+    ) -> None:
+        """
+        Initialize a new procedural animation.
+
+        Args:
+            function: a callable of (time in seconds, target index, target)
+                that returns the state of the target
+            lights: the IDs of the lights to animate
+            groups: the IDs of the groups to animate
+            duration: the length of the animation in seconds or None to play
+                until stopped
+
+        Returns:
+            None
+
+        """
+        super().__init__(lights, groups, duration)
+        self.function = function
+
+    def state(self, t: float, index: int, target: tuple) -> dict:
+        return self.function(t, index, target)
+
+
+def colorloop(lights: list = (), groups: list = (), period: float = 10.0, bri: int = 254) -> ProceduralAnimation:
+    """
+    Return an animation that cycles targets through the hues with offsets.
+
+    Args:
+        lights: the IDs of the lights to animate
+        groups: the IDs of the groups to animate
+        period: the number of seconds for one cycle through the hues
+        bri: the brightness of the targets
+
+    Returns:
+        a procedural animation
+
+    """
+    count = max(1, len(lights) + len(groups))
+
+    def state(t, index, target):
+        hue = (t / period + index / count) % 1.0
+        rgb = [int(255 * channel) for channel in colorsys.hsv_to_rgb(hue, 1.0, 1.0)]
+        return {'xy': list(rgb_to_xy_bri(*rgb)[0]), 'bri': bri}
+
+    return ProceduralAnimation(state, lights, groups)
+
+
+def breathe(lights: list = (), groups: list = (), period: float = 4.0, low: int = 20, high: int = 254) -> ProceduralAnimation:
+    """
+    Return an animation that fades the brightness of targets up and down.
+
+    Args:
+        lights: the IDs of the lights to animate
+        groups: the IDs of the groups to animate
+        period: the number of seconds for one breath
+        low: the lowest brightness
+        high: the highest brightness
+
+    Returns:
+        a procedural animation
+
+    """
+    def state(t, index, target):
+        level = 0.5 - 0.5 * math.cos(2 * math.pi * t / period)
+        return {'bri': int(round(low + (high - low) * level))}
+
+    return ProceduralAnimation(state, lights, groups)
+
+
+class PlaybackStatistics:
+    """Frame-time and dropped-frame statistics for one playing animation."""
+
+    def __init__(self) -> None:
+        """Initialize new empty statistics."""
+        self.frames = 0
+        self.dropped_frames = 0
+        self.total_frame_time = 0.0
+        self.max_frame_time = 0.0
+        self.commands_sent = 0
+        self.commands_unchanged = 0
+        self.commands_over_budget = 0
+        self.commands_failed = 0
+
+    def as_dict(self) -> dict:
+        """Return the statistics as a dictionary."""
+        return {
+            'frames': self.frames,
+            'dropped_frames': self.dropped_frames,
+            'mean_frame_time': self.total_frame_time / self.frames if self.frames else 0.0,
+            'max_frame_time': self.max_frame_time,
+            'commands_sent': self.commands_sent,
+            'commands_unchanged': self.commands_unchanged,
+            'commands_over_budget': self.commands_over_budget,
+            'commands_failed': self.commands_failed,
+        }
+
+
+class Playback:
+    """The playback state of an animation in the engine."""
+
+    def __init__(self, animation: Animation, started: float) -> None:
+        """
+        Initialize a new playback.
+
+        Args:
+            animation: the animation to play
+            started: the monotonic time the playback started at
+
+        Returns:
+            None
+
+        """
+        self.animation = animation
+        self.started = started
+        self.paused_at = None
+        self.statistics = PlaybackStatistics()
+        # the last state sent to each (resource type, ID) target and when.
+        # Kept per playback so a restarted animation sends its first frame
+        # in full, whatever the targets were set to in the meantime
+        self.sent = dict()
+
+    @property
+    def paused(self) -> bool:
+        """Return True if the playback is paused."""
+        return self.paused_at is not None
+
+    def elapsed(self, now: float) -> float:
+        """Return the animation time at a monotonic time."""
+        return (self.paused_at or now) - self.started
+
+    def as_dict(self, now: float) -> dict:
+        """Return a summary of the playback as a dictionary."""
+        return dict(self.statistics.as_dict(),
+            animation=self.animation.__class__.__name__,
+            elapsed=self.elapsed(now),
+            paused=self.paused,
+        )
+
+
+def accepted(result) -> bool:
+    """
+    Return True if the bridge accepted a command to lights or groups.
+
+    Args:
+        result: the result of Bridge.set_light or Bridge.set_group, a list
+            of the responses of each target
+
+    Returns:
+        whether every response holds no errors
+
+    """
+    if not isinstance(result, list):
+        return False
+    for response in result:
+        if not isinstance(response, list) or any('error' in item for item in response):
+            return False
+    return True
+
+
+class AnimationEngine:
+    """Plays animations on a dedicated thread at a fixed tick rate."""
+
+    def __init__(self,
+        bridge,
+        fps: float = 10.0,
+        light_rate: float = 10.0,
+        group_rate: float = 1.0
+    ) -> None:
+        """
+        Initialize a new animation engine.
+
+        Args:
+            bridge: the bridge to send frames to
+            fps: the number of frames per second to render
+            light_rate: the most light commands per second to send
+            group_rate: the most group commands per second to send
+
+        Returns:
+            None
+
+        """
+        if fps <= 0:
+            raise ValueError(f'fps must be positive, got {fps}')
+        self.bridge = bridge
+        self.fps = fps
+        self.rates = {'lights': light_rate, 'groups': group_rate}
+        # the number of commands each resource type may send this tick
+        self._budget = {kind: 1.0 for kind in self.rates}
+        # the playing animations by name
+        self._playbacks = dict()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(fps={self.fps}, rates={self.rates})'
+
+    @property
+    def names(self) -> list:
+        """Return the names of the playing (or paused) animations."""
+        with self._condition:
+            return sorted(self._playbacks)
+
+    def start(self, name: str, animation: Animation) -> None:
+        """
+        Start playing an animation, replacing any animation with the name.
+
+        Args:
+            name: the name to control the animation with
+            animation: the animation to play
+
+        Returns:
+            None
+
+        """
+        with self._condition:
+            self._playbacks[name] = Playback(animation, time.monotonic())
+            if not self._running:
+                self._running = True
+                self._thread = threading.Thread(target=self._run, name='AnimationEngine', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def stop(self, name: str) -> None:
+        """Stop playing an animation by name."""
+        with self._condition:
+            playback = self._playbacks.pop(name, None)
+        if playback is None:
+            raise KeyError(f'no animation named {repr(name)}')
+
+    def pause(self, name: str) -> None:
+        """Pause an animation by name, holding its targets at the last frame."""
+        with self._condition:
+            playback = self._playbacks[name]
+            if not playback.paused:
+                playback.paused_at = time.monotonic()
+
+    def resume(self, name: str) -> None:
+        """Resume a paused animation by name from where it was paused."""
+        with self._condition:
+            playback = self._playbacks[name]
+            if playback.paused:
+                playback.started += time.monotonic() - playback.paused_at
+                playback.paused_at = None
+                # the targets may have changed while the animation was paused
+                playback.sent.clear()
+            self._condition.notify()
+
+    def shutdown(self) -> None:
+        """Stop every animation and the engine thread."""
+        with self._condition:
+            self._playbacks.clear()
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def statistics(self) -> dict:
+        """Return the frame statistics of each animation by name."""
+        now = time.monotonic()
+        with self._condition:
+            return {name: playback.as_dict(now) for name, playback in self._playbacks.items()}
+
+    def _run(self) -> None:
+        """Render frames at the tick rate until the engine shuts down."""
+        interval = 1.0 / self.fps
+        next_tick = time.monotonic()
+        with self.bridge.scheduler.priority(BACKGROUND):
+            while True:
+                with self._condition:
+                    if self._running and all(playback.paused for playback in self._playbacks.values()):
+                        # nothing to render, sleep until an animation starts
+                        # or resumes instead of ticking idle
+                        while self._running and all(playback.paused for playback in self._playbacks.values()):
+                            self._condition.wait()
+                        next_tick = time.monotonic()
+                    while self._running and time.monotonic() < next_tick:
+                        self._condition.wait(next_tick - time.monotonic())
+                    if not self._running:
+                        return
+                now = time.monotonic()
+                # count the ticks that passed while the last frame was sent
+                missed = int((now - next_tick) / interval)
+                next_tick += (missed + 1) * interval
+                try:
+                    self._tick(now, missed)
+                except Exception:  # keep the engine alive for later frames
+                    logger.exception('Failed to render an animation frame')
+
+    def _tick(self, now: float, missed: int) -> None:
+        """Render and send one frame of every playing animation."""
+        for kind, rate in self.rates.items():
+            # allow a burst of up to one second of commands
+            self._budget[kind] = min(rate, self._budget[kind] + rate / self.fps)
+        with self._condition:
+            playbacks = list(self._playbacks.items())
+        for name, playback in playbacks:
+            if playback.paused:
+                continue
+            start = time.perf_counter()
+            statistics = playback.statistics
+            statistics.dropped_frames += missed
+            t = playback.elapsed(now)
+            duration = playback.animation.duration
+            finished = duration is not None and t >= duration
+            try:
+                frame = playback.animation.frame(min(t, duration) if finished else t)
+            except Exception:  # render the other animations of the tick
+                logger.exception('Failed to render a frame of animation %s', name)
+                continue
+            skipped = self._send(frame, playback)
+            if finished and not skipped:
+                with self._condition:
+                    # the final frame went out in full, remove the animation
+                    if self._playbacks.get(name) is playback:
+                        del self._playbacks[name]
+            elapsed = time.perf_counter() - start
+            statistics.frames += 1
+            statistics.total_frame_time += elapsed
+            statistics.max_frame_time = max(statistics.max_frame_time, elapsed)
+
+    def _send(self, frame: dict, playback: Playback) -> int:
+        """
+        Send the changed states of a frame within the command budget.
+
+        Args:
+            frame: a dictionary mapping (resource type, ID) tuples to states
+            playback: the playback the frame belongs to
+
+        Returns:
+            the number of changed states skipped for exceeding the budget or
+            refused by the bridge
+
+        """
+        statistics = playback.statistics
+        skipped = 0
+        changed = []
+        for target, state in frame.items():
+            # quantize to what the bridge can represent to detect changes
+            if 'xy' in state:
+                state['xy'] = [round(value, 4) for value in state['xy']]
+            previous = playback.sent.get(target)
+            if previous is not None and previous[1] == state:
+                statistics.commands_unchanged += 1
+                continue
+            changed.append((previous[0] if previous else 0.0, target, state))
+        # send the targets that have waited the longest first
+        transitiontime = max(0, int(round(10 / self.fps)))
+        for _, target, state in sorted(changed, key=lambda x: x[0]):
+            kind, target_id = target
+            if self._budget[kind] < 1:
+                statistics.commands_over_budget += 1
+                skipped += 1
+                continue
+            self._budget[kind] -= 1
+            data = dict(state, transitiontime=transitiontime)
+            try:
+                if kind == 'lights':
+                    result = self.bridge.set_light(target_id, data)
+                else:
+                    result = self.bridge.set_group(target_id, data)
+            except Exception:  # send the other targets of the frame
+                logger.exception('Failed to send %s to %s %s', data, kind, target_id)
+                result = None
+            statistics.commands_sent += 1
+            if not accepted(result):
+                # send the state again with the next frame
+                statistics.commands_failed += 1
+                skipped += 1
+                continue
+            playback.sent[target] = (time.monotonic(), state)
+        return skipped
+
+
+# explicitly define the outward facing API of this module
+__all__ = [
+    Animation.__name__,
+    KeyframeAnimation.__name__,
+    ProceduralAnimation.__name__,
+    colorloop.__name__,
+    breathe.__name__,
+    AnimationEngine.__name__,
+]
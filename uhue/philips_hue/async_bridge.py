@@ -0,0 +1,627 @@
+"""An asyncio interface to the Hue ZigBee bridge."""
+import asyncio
+import collections
+import json
+import threading
+import time
+from typing import TYPE_CHECKING
+from .bridge import read_config_file, unwrap_config_file_path
+from .exceptions import PhueRequestTimeout
+from .logger import logger
+from .scene import Scene
+from .scheduler import DEFAULT_RATE_LIMITS, RequestScheduler, TokenBucket
+if TYPE_CHECKING:
+    from typing import Awaitable
+
+
+# errors that indicate a kept-alive stream was closed by the bridge
+STALE_STREAM_ERRORS = (
+    ConnectionError,
+    asyncio.IncompleteReadError,
+)
+
+
+class AsyncConnectionPool:
+    """A pool of HTTP/1.1 keep-alive streams to one host for one event loop."""
+
+    def __init__(self,
+        host: str,
+        size: int = 4,
+        idle_timeout: float = 30.0
+    ) -> None:
+        """
+        Initialize a new connection pool.
+
+        Args:
+            host: the host name or IP address (optionally with a port)
+            size: the maximum number of requests in flight at once
+            idle_timeout: the number of seconds an unused stream may sit in
+                the pool before it is considered stale and closed
+
+        Returns:
+            None
+
+        """
+        if size < 1:
+            raise ValueError(f'size must be at least 1, got {size}')
+        self.host = host
+        self.size = size
+        self.idle_timeout = idle_timeout
+        # the idle streams as (reader, writer, time of last use) tuples
+        self._idle = collections.deque()
+        self._slots = asyncio.Semaphore(size)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(host={self.host!r}, size={self.size}, idle_timeout={self.idle_timeout})'
+
+    async def _open(self) -> tuple:
+        """Open a new stream to the host."""
+        host, _, port = self.host.partition(':')
+        return await asyncio.open_connection(host, int(port or 80))
+
+    def _pop_idle(self) -> tuple:
+        """Return a fresh idle stream or None if there isn't one."""
+        now = time.monotonic()
+        while self._idle:
+            reader, writer, last_used = self._idle.pop()
+            if now - last_used < self.idle_timeout and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    async def request(self,
+        method: str,
+        endpoint: str,
+        body: bytes = None,
+        timeout: float = 10
+    ) -> bytes:
+        """
+        Send a request over a pooled stream and return the response.
+
+        Args:
+            method: the HTTP method to use (e.g., GET)
+            endpoint: the path to send the request to
+            body: the optional encoded body of the request
+            timeout: the timeout for the request in seconds
+
+        Returns:
+            the raw body of the response
+
+        """
+        async with self._slots:
+            stream = self._pop_idle()
+            reused = stream is not None
+            if stream is None:
+                stream = await asyncio.wait_for(self._open(), timeout)
+            try:
+                try:
+                    data, keep_alive = await asyncio.wait_for(self._exchange(*stream, method, endpoint, body), timeout)
+                except STALE_STREAM_ERRORS:
+                    if not reused:
+                        raise
+                    # the kept-alive stream went stale, reconnect and try again
+                    logger.debug('Reconnecting stale stream to %s', self.host)
+                    stream[1].close()
+                    stream = await asyncio.wait_for(self._open(), timeout)
+                    data, keep_alive = await asyncio.wait_for(self._exchange(*stream, method, endpoint, body), timeout)
+            except BaseException:
+                stream[1].close()
+                raise
+            if keep_alive:
+                self._idle.append((*stream, time.monotonic()))
+            else:
+                stream[1].close()
+            return data
+
+    async def _exchange(self, reader, writer, method: str, endpoint: str, body: bytes) -> tuple:
+        """
+        Send a request on a stream and read the response.
+
+        Returns:
+            a tuple of (response body, whether the stream can be reused)
+
+        """
+        head = f'{method} {endpoint} HTTP/1.1\r\nHost: {self.host}\r\nConnection: keep-alive\r\n'
+        if body is not None:
+            head += f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+        writer.write(head.encode('latin-1') + b'\r\n' + (body or b''))
+        await writer.drain()
+        # read the status line and the headers
+        status = await reader.readline()
+        if not status:
+            raise ConnectionResetError(f'{self.host} closed the connection')
+        headers = dict()
+        while True:
+            line = await reader.readline()
+            if line in {b'\r\n', b'\n', b''}:
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip().lower()
+        keep_alive = status.startswith(b'HTTP/1.1') and headers.get('connection') != 'close'
+        # read the body
+        if headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # skip the trailer section
+                    while (await reader.readline()) not in {b'\r\n', b'\n', b''}:
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            return b''.join(chunks), keep_alive
+        if 'content-length' in headers:
+            return await reader.readexactly(int(headers['content-length'])), keep_alive
+        return await reader.read(), False
+
+    def close(self) -> None:
+        """Close all the idle streams in the pool."""
+        while self._idle:
+            self._idle.pop()[1].close()
+
+    async def aclose(self) -> None:
+        """Close all the idle streams in the pool and wait for them to close."""
+        writers = [writer for _, writer, _ in self._idle]
+        self.close()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except OSError:  # the bridge closed it first
+                pass
+
+
+class AsyncBridge:
+    """
+    An asyncio interface to the Philips Hue ZigBee bridge.
+
+    Example:
+
+        >>> bridge = AsyncBridge()
+        >>> bridge.load_config_file()
+        >>> await bridge.set_light([1, 2, 3], 'on', True)  # sent concurrently
+        >>> lights = await bridge.get_light()
+
+    Requests from any event loop run on one background loop that owns the
+    keep-alive streams, so the same AsyncBridge can serve async Flask views,
+    which run a loop per request, and reuse its connections across them.
+    Call aclose to close the streams and stop the background loop.
+
+    """
+
+    def __init__(self,
+        ip_address: str = None,
+        username: str = None,
+        config_file_path: str = None,
+        concurrency: int = 4,
+        idle_timeout: float = 30.0,
+        rate_limits: dict = None
+    ) -> None:
+        """
+        Initialize a connection to a Hue bridge.
+
+        Args:
+            ip_address: string IP address as dotted quad
+            username: string, the username for the bridge
+            config_file_path: string, the path to the configuration file
+            concurrency: the maximum number of requests in flight at once
+            idle_timeout: the number of seconds before an idle keep-alive
+                stream is considered stale and re-opened
+            rate_limits: a dictionary mapping the request lanes ('lights',
+                'groups', 'reads') to (rate per second, burst size) tuples,
+                or None to disable pacing for a lane
+
+        Returns:
+            None
+
+        """
+        self.ip_address = ip_address
+        self.username = username
+        self.config_file_path = unwrap_config_file_path(config_file_path)
+        self.concurrency = concurrency
+        self.idle_timeout = idle_timeout
+        rate_limits = dict(DEFAULT_RATE_LIMITS, **(rate_limits or {}))
+        self.buckets = {lane: TokenBucket(*limit) for lane, limit in rate_limits.items() if limit is not None}
+        # the background event loop that sends every request, and its pool
+        # and lane locks (only used on that loop)
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._pool = None
+        self._locks = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(ip_address={self.ip_address!r}, concurrency={self.concurrency})'
+
+    #
+    # MARK: Bridge
+    #
+
+    def load_config_file(self) -> None:
+        """Load the bridge credentials from the configuration file."""
+        self.ip_address, self.username = read_config_file(self.config_file_path)
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the background event loop, starting it if needed."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._run_loop, args=(self._loop,), name='AsyncBridge', daemon=True).start()
+            return self._loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+        """Run a background event loop until it is stopped."""
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _on_background_loop(self, coroutine) -> object:
+        """Run a coroutine on the background loop and return its result."""
+        loop = self._background_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coroutine
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
+
+    def _connection_pool(self) -> AsyncConnectionPool:
+        """Return the pool of streams to the current IP address (on the background loop)."""
+        # the IP address may change after loading the configuration
+        if self._pool is None or self._pool.host != self.ip_address:
+            if self._pool is not None:
+                self._pool.close()
+            self._pool = AsyncConnectionPool(self.ip_address, size=self.concurrency, idle_timeout=self.idle_timeout)
+            self._locks = {lane: asyncio.Lock() for lane in self.buckets}
+        return self._pool
+
+    async def _pace(self, lane: str) -> None:
+        """Wait for the bridge to have capacity for a request in a lane."""
+        if lane not in self.buckets:
+            return
+        # the lock keeps the requests of a lane in order, the bucket itself
+        # is safe to share with other threads
+        async with self._locks[lane]:
+            while True:
+                delay = self.buckets[lane].try_take(time.monotonic())
+                if delay <= 0:
+                    return
+                await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        """Close the idle streams to the bridge and stop the background loop."""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        async def close():
+            if self._pool is not None:
+                await self._pool.aclose()
+            self._pool = self._locks = None
+
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(close(), loop))
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def request(self,
+        mode: str = 'GET',
+        endpoint: str = None,
+        data: dict = None,
+        timeout: int = 10
+    ) -> dict:
+        """
+        Perform an HTTP GET/PUT requests on the API.
+
+        Args:
+            mode: the HTTP mode to use (e.g., GET)
+            endpoint: the address to send the message to
+            data: the JSON data to send in the message
+            timeout: the timeout for the request
+
+        Returns:
+            the response data as a dictionary
+
+        """
+        return await self._on_background_loop(self._request(mode, endpoint, data, timeout))
+
+    async def _request(self, mode: str, endpoint: str, data: dict, timeout: int) -> dict:
+        """Send a request from the background loop (see request)."""
+        pool = self._connection_pool()
+        await self._pace(RequestScheduler.classify(mode, endpoint))
+        body = None
+        if mode in {'PUT', 'POST'}:
+            body = json.dumps(data).encode('utf-8')
+        try:
+            response = await pool.request(mode, endpoint, body, timeout=timeout)
+            logger.debug("%s %s %s", mode, endpoint, str(data))
+        except asyncio.TimeoutError:
+            error = f"{mode} Request to {self.ip_address}{endpoint} timed out."
+            logger.exception(error)
+            raise PhueRequestTimeout(None, error)
+        response = response.decode('utf-8')
+        logger.debug(response)
+        return json.loads(response)
+
+    async def gather(self, *requests) -> list:
+        """
+        Send several requests concurrently.
+
+        Args:
+            requests: (mode, endpoint, data) tuples
+
+        Returns:
+            the responses in the order of the requests
+
+        """
+        return list(await asyncio.gather(*[self.request(*request) for request in requests]))
+
+    @property
+    def api(self) -> 'Awaitable[dict]':
+        """Return an awaitable of the full api dictionary."""
+        return self.request('GET', f'/api/{self.username}')
+
+    async def get_config(self) -> dict:
+        """Return the configuration of the bridge."""
+        return await self.request('GET', f'/api/{self.username}/config')
+
+    async def _resolve(self, collection: str, targets: list) -> list:
+        """Convert names in a list of targets to IDs with at most one GET."""
+        if not any(isinstance(target, str) for target in targets):
+            return targets
+        resources = await self.request('GET', f'/api/{self.username}/{collection}')
+        ids_by_name = {info['name']: id_ for id_, info in resources.items()}
+        return [ids_by_name.get(target, False) if isinstance(target, str) else target for target in targets]
+
+    @staticmethod
+    def _body(parameter, value=None, transitiontime=None) -> dict:
+        """Return the body of a set command from a parameter/value pair."""
+        data = dict(parameter) if isinstance(parameter, dict) else {parameter: value}
+        if transitiontime is not None:
+            data['transitiontime'] = int(round(transitiontime))
+        return data
+
+    #
+    # MARK: Lights
+    #
+
+    async def get_light(self, light_id=None, parameter=None):
+        """
+        Return the state of one, several, or all lights.
+
+        Args:
+            light_id: the ID or name of a light, a list of them (fetched
+                concurrently), or None for all lights
+            parameter: the optional attribute to return for each light
+
+        Returns:
+            the light data (a list if light_id is a list)
+
+        """
+        if light_id is None:
+            return await self.request('GET', f'/api/{self.username}/lights')
+        if isinstance(light_id, (list, tuple)):
+            return list(await asyncio.gather(*[self.get_light(id_, parameter) for id_ in light_id]))
+        light_id, = await self._resolve('lights', [light_id])
+        state = await self.request('GET', f'/api/{self.username}/lights/{light_id}')
+        if parameter is None:
+            return state
+        if parameter in state:
+            return state[parameter]
+        return state['state'][parameter]
+
+    async def get_light_id_by_name(self, name: str):
+        """ Lookup a light id based on string name. Case-sensitive. """
+        light_id, = await self._resolve('lights', [name])
+        return light_id
+
+    async def set_light(self, light_id, parameter, value=None, transitiontime=None) -> list:
+        """
+        Adjust properties of one or more lights concurrently.
+
+        Args:
+            light_id: the ID or name of a light or a list of them
+            parameter: the attribute to set (e.g., 'bri') or a dictionary of
+                attributes to values
+            value: the value of the attribute if parameter is a string
+            transitiontime: the optional transition time in deciseconds
+
+        Returns:
+            the responses of the bridge in the order of the lights
+
+        """
+        data = self._body(parameter, value, transitiontime)
+        lights = [light_id] if isinstance(light_id, (int, str)) else list(light_id)
+        lights = await self._resolve('lights', lights)
+        suffix = '' if parameter == 'name' else '/state'
+        return await self.gather(*[('PUT', f'/api/{self.username}/lights/{light}{suffix}', data) for light in lights])
+
+    #
+    # MARK: Groups
+    #
+
+    async def get_group(self, group_id=None, parameter=None):
+        """
+        Return the state of one, several, or all groups.
+
+        Args:
+            group_id: the ID or name of a group, a list of them (fetched
+                concurrently), or None for all groups
+            parameter: the optional attribute to return for each group
+
+        Returns:
+            the group data (a list if group_id is a list)
+
+        """
+        if group_id is None:
+            return await self.request('GET', f'/api/{self.username}/groups')
+        if isinstance(group_id, (list, tuple)):
+            return list(await asyncio.gather(*[self.get_group(id_, parameter) for id_ in group_id]))
+        group_id, = await self._resolve('groups', [group_id])
+        state = await self.request('GET', f'/api/{self.username}/groups/{group_id}')
+        if parameter is None:
+            return state
+        if parameter in {'name', 'lights'}:
+            return state[parameter]
+        return state['action'][parameter]
+
+    async def get_group_id_by_name(self, name: str):
+        """ Lookup a group id based on string name. Case-sensitive. """
+        group_id, = await self._resolve('groups', [name])
+        return group_id if group_id is False else int(group_id)
+
+    async def set_group(self, group_id, parameter, value=None, transitiontime=None) -> list:
+        """
+        Adjust properties of one or more groups concurrently.
+
+        Args:
+            group_id: the ID or name of a group or a list of them
+            parameter: the attribute to set (e.g., 'bri') or a dictionary of
+                attributes to values
+            value: the value of the attribute if parameter is a string
+            transitiontime: the optional transition time in deciseconds
+
+        Returns:
+            the responses of the bridge in the order of the groups
+
+        """
+        if parameter == 'lights' and isinstance(value, (list, int)):
+            value = [str(x) for x in (value if isinstance(value, list) else [value])]
+        data = self._body(parameter, value, transitiontime)
+        groups = [group_id] if isinstance(group_id, (int, str)) else list(group_id)
+        groups = await self._resolve('groups', groups)
+        suffix = '' if {'name', 'lights'}.intersection(data) else '/action'
+        return await self.gather(*[('PUT', f'/api/{self.username}/groups/{group}{suffix}', data) for group in groups])
+
+    async def create_group(self, name: str, lights: list = None) -> list:
+        """Create a group of lights with a name."""
+        data = {'lights': [str(x) for x in lights or []], 'name': name}
+        return await self.request('POST', f'/api/{self.username}/groups', data)
+
+    async def delete_group(self, group_id) -> list:
+        """Delete a group by ID."""
+        return await self.request('DELETE', f'/api/{self.username}/groups/{group_id}')
+
+    #
+    # MARK: Scenes
+    #
+
+    async def get_scene(self, scene_id: str = None) -> dict:
+        """Return all scenes or the full state of one scene."""
+        if scene_id is None:
+            return await self.request('GET', f'/api/{self.username}/scenes')
+        return await self.request('GET', f'/api/{self.username}/scenes/{scene_id}')
+
+    async def get_scenes(self) -> list:
+        """Return the scenes as a list of Scene objects."""
+        return [Scene(k, **v) for k, v in (await self.get_scene()).items()]
+
+    async def activate_scene(self, group_id, scene_id: str, transition_time: int = 4) -> list:
+        """Activate a scene on a group."""
+        return await self.request('PUT', f'/api/{self.username}/groups/{group_id}/action', {
+            "scene": scene_id,
+            "transitiontime": transition_time
+        })
+
+    async def delete_scene(self, scene_id: str) -> list:
+        """Delete a scene by ID."""
+        return await self.request('DELETE', f'/api/{self.username}/scenes/{scene_id}')
+
+    #
+    # MARK: Sensors
+    #
+
+    async def get_sensor(self, sensor_id=None, parameter=None):
+        """
+        Return the state of one, several, or all sensors.
+
+        Args:
+            sensor_id: the ID or name of a sensor, a list of them (fetched
+                concurrently), or None for all sensors
+            parameter: the optional attribute to return for each sensor
+
+        Returns:
+            the sensor data (a list if sensor_id is a list)
+
+        """
+        if sensor_id is None:
+            return await self.request('GET', f'/api/{self.username}/sensors')
+        if isinstance(sensor_id, (list, tuple)):
+            return list(await asyncio.gather(*[self.get_sensor(id_, parameter) for id_ in sensor_id]))
+        sensor_id, = await self._resolve('sensors', [sensor_id])
+        data = await self.request('GET', f'/api/{self.username}/sensors/{sensor_id}')
+        if isinstance(data, list):
+            logger.debug("Unable to read sensor with ID %s: %s", sensor_id, repr(data))
+            return None
+        return data if parameter is None else data[parameter]
+
+    async def set_sensor(self, sensor_id, parameter, value=None) -> list:
+        """Adjust the attributes (e.g., 'name') of a sensor."""
+        return await self.request('PUT', f'/api/{self.username}/sensors/{sensor_id}', self._body(parameter, value))
+
+    async def set_sensor_content(self, sensor_id, parameter, value=None, structure: str = 'state') -> list:
+        """Adjust the "state" or "config" structures of a sensor."""
+        if structure not in {'state', 'config'}:
+            raise ValueError(f"structure must be 'state' or 'config', got {repr(structure)}")
+        data = self._body(parameter, value)
+        # attempting to set this causes an error
+        data.pop('lastupdated', None)
+        return await self.request('PUT', f'/api/{self.username}/sensors/{sensor_id}/{structure}', data)
+
+    async def set_sensor_state(self, sensor_id, parameter, value=None) -> list:
+        """Adjust the "state" object of a sensor."""
+        return await self.set_sensor_content(sensor_id, parameter, value, 'state')
+
+    async def set_sensor_config(self, sensor_id, parameter, value=None) -> list:
+        """Adjust the "config" object of a sensor."""
+        return await self.set_sensor_content(sensor_id, parameter, value, 'config')
+
+    async def delete_sensor(self, sensor_id) -> list:
+        """Delete a sensor by ID."""
+        return await self.request('DELETE', f'/api/{self.username}/sensors/{sensor_id}')
+
+    #
+    # MARK: Schedules
+    #
+
+    async def create_schedule(self, name, time, light_id, data, description=' ') -> list:
+        """Create a schedule that sends a command to a light."""
+        return await self.request('POST', f'/api/{self.username}/schedules', {
+            'name': name,
+            'localtime': time,
+            'description': description,
+            'command': {
+                'method': 'PUT',
+                'address': f'/api/{self.username}/lights/{light_id}/state',
+                'body': data
+            }
+        })
+
+    async def create_group_schedule(self, name, time, group_id, data, description=' ') -> list:
+        """Create a schedule that sends a command to a group."""
+        return await self.request('POST', f'/api/{self.username}/schedules', {
+            'name': name,
+            'localtime': time,
+            'description': description,
+            'command': {
+                'method': 'PUT',
+                'address': f'/api/{self.username}/groups/{group_id}/action',
+                'body': data
+            }
+        })
+
+    async def get_schedule(self, schedule_id=None) -> dict:
+        """Return all schedules or one schedule by ID."""
+        if schedule_id is None:
+            return await self.request('GET', f'/api/{self.username}/schedules')
+        return await self.request('GET', f'/api/{self.username}/schedules/{schedule_id}')
+
+    async def set_schedule_attributes(self, schedule_id, attributes: dict) -> list:
+        """Update the attributes of a schedule."""
+        return await self.request('PUT', f'/api/{self.username}/schedules/{schedule_id}', attributes)
+
+    async def delete_schedule(self, schedule_id) -> list:
+        """Delete a schedule by ID."""
+        return await self.request('DELETE', f'/api/{self.username}/schedules/{schedule_id}')
+
+
+# explicitly define the outward facing API of this module
+__all__ = [AsyncBridge.__name__]
@@ -0,0 +1,111 @@
+"""A circuit breaker that stops requests to a bridge that is down."""
+import random
+import threading
+import time
+
+
+# the states of a circuit breaker
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+def backoff_delay(attempt: int, base: float = 0.1, cap: float = 1.0) -> float:
+    """
+    Return a random delay before retrying a failed request.
+
+    The delay is drawn uniformly from zero up to an exponentially growing
+    bound ("full jitter"), so clients that failed together don't retry
+    together.
+
+    Args:
+        attempt: the number of the retry, starting at 0
+        base: the bound of the first retry in seconds
+        cap: the largest bound in seconds
+
+    Returns:
+        the number of seconds to wait
+
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """A breaker that fails fast after repeated failures and probes for recovery."""
+
+    def __init__(self, failure_threshold: int = 3, recovery_timeout: float = 5.0) -> None:
+        """
+        Initialize a new closed circuit breaker.
+
+        Args:
+            failure_threshold: the number of failures in a row that open the
+                breaker
+            recovery_timeout: the number of seconds the breaker stays open
+                before a single probe request is let through
+
+        Returns:
+            None
+
+        """
+        if failure_threshold < 1:
+            raise ValueError(f'failure_threshold must be at least 1, got {failure_threshold}')
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self.failures = 0
+        # the time the breaker last opened at
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(state={self.state!r}, failures={self.failures})'
+
+    def allow(self) -> bool:
+        """
+        Return True if a request may be sent.
+
+        While the breaker is open every request is refused. Once the recovery
+        timeout passes, the breaker turns half-open and lets exactly one
+        request through as a probe; the others are refused until it settles.
+        A probe that never settles is replaced by another one after the
+        recovery timeout passes again.
+
+        Returns:
+            whether to send the request
+
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.recovery_timeout:
+                self.state = HALF_OPEN
+                # the time the probe was let through at
+                self.opened_at = now
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """Return the number of seconds until the breaker lets a probe through."""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    def record_success(self) -> None:
+        """Close the breaker after a request reached the bridge."""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        """Count a request that couldn't reach the bridge, opening the breaker if needed."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+# explicitly define the outward facing API of this module
+__all__ = [CircuitBreaker.__name__, backoff_delay.__name__]
@@ -1,19 +1,60 @@
 """An interface to the Hue ZigBee bridge."""
+import contextlib
+import contextvars
 import os
 import json
 import platform
 import socket
-from http.client import HTTPConnection
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from typing import TYPE_CHECKING
+from .breaker import CircuitBreaker, backoff_delay
+from .cache import StateCache
+from .connection import ConnectFailed, ConnectionPool
+from .index import NameIndex
 from .logger import logger
-from .exceptions import PhueException, PhueRegistrationException, PhueRequestTimeout
+from .membership import MembershipIndex
+from .optimistic import expect_attributes, expect_state
+from .planner import CommandPlanner
+from .registry import ObjectRegistry
+from .scene_registry import SceneRegistry
+from .scheduler import RequestScheduler
+from .singleflight import SingleFlight
+from .tracker import StateTracker
+from .exceptions import PhueException, PhueBridgeUnavailable, PhueRegistrationException, PhueRequestTimeout
 from .group import Group
 from .light import Light
-from .scene import Scene
 from .sensor import Sensor
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from typing import Callable, Union
+    from .optimistic import OptimisticUpdate
 
 
 # the default name for the configuration file
 CONFIG_FILE_NAME = '.python_hue'
+# the counters of requests sent in the current context (see
+# Bridge.count_requests), copied into the threads that send on its behalf
+REQUEST_COUNTERS = contextvars.ContextVar('REQUEST_COUNTERS', default=())
+
+
+class RequestCounter:
+    """A thread-safe count of requests sent to the bridge."""
+
+    def __init__(self) -> None:
+        """Initialize a new counter at zero."""
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(value={self.value})'
+
+    def increment(self) -> None:
+        """Count one request."""
+        with self._lock:
+            self.value += 1
 
 
 def unwrap_config_file_path(config_file_path: str = None):
@@ -42,13 +83,52 @@ def unwrap_config_file_path(config_file_path: str = None):
     return os.path.join(os.getcwd(), CONFIG_FILE_NAME)
 
 
+def read_config_file(config_file_path: str) -> tuple:
+    """
+    Read the bridge credentials from a configuration file.
+
+    Args:
+        config_file_path: the path to the configuration file
+
+    Returns:
+        a tuple of (IP address, username)
+
+    """
+    logger.info('Loading bridge credentials from "%s"', config_file_path)
+    # check for existence of the file
+    if not os.path.exists(config_file_path):
+        raise RuntimeError("No configuration found. run register")
+    # load the file into a JSON object
+    with open(config_file_path, 'r') as config_file:
+        config = json.loads(config_file.read())
+    # setup the IP address
+    ip_address = list(config.keys())[0]
+    logger.info('Using ip from config: %s', ip_address)
+    # setup the username
+    username = config[ip_address]['username']
+    logger.info('Using username from config: %s', username)
+    return ip_address, username
+
+
 class Bridge:
     """An interface to the Philips Hue ZigBee bridge."""
 
     def __init__(self,
         ip_address: str = None,
         username: str = None,
-        config_file_path: str = None
+        config_file_path: str = None,
+        pool_size: int = 4,
+        idle_timeout: float = 30.0,
+        cache_ttl: float = 2.0,
+        rate_limits: dict = None,
+        max_workers: int = None,
+        plan_commands: bool = True,
+        scratch_groups: int = 0,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 5.0,
+        retries: int = 2,
+        failure_threshold: int = 3,
+        recovery_timeout: float = 5.0
     ) -> None:
         """
         Initialize a connection to a Hue bridge.
@@ -57,6 +137,34 @@ class Bridge:
             ip_address: string IP address as dotted quad
             username: string, the username for the bridge
             config_file_path: string, the path to the configuration file
+            pool_size: the maximum number of keep-alive connections to open
+            idle_timeout: the number of seconds before an idle keep-alive
+                connection is considered stale and re-opened
+            cache_ttl: the number of seconds that cached light, group, and
+                sensor state is served before it is fetched again. Use None
+                to only refresh explicitly or 0 to disable the cache
+            rate_limits: a dictionary mapping the request lanes ('lights',
+                'groups', 'reads') to (rate per second, burst size) tuples,
+                or None to disable pacing for a lane
+            max_workers: the number of threads used to send commands to
+                several lights or groups at once, or None to send them one
+                after another
+            plan_commands: whether to send one group action instead of a
+                command per light when the lights match the members of a group
+            scratch_groups: the number of groups the command planner may
+                create for frequently commanded sets of lights that match no
+                existing group
+            connect_timeout: the number of seconds to wait for a connection
+                to the bridge to open
+            read_timeout: the number of seconds to wait for the bridge to
+                respond to a request
+            retries: the number of times a request that failed to reach the
+                bridge is retried (GET requests, and requests that failed
+                before they were sent)
+            failure_threshold: the number of failed requests in a row after
+                which requests fail immediately instead of waiting to time out
+            recovery_timeout: the number of seconds between attempts to reach
+                a bridge that is down
 
         Returns:
             None
@@ -65,15 +173,45 @@ class Bridge:
         self.ip_address = ip_address
         self.username = username
         self.config_file_path = unwrap_config_file_path(config_file_path)
-        # setup structure for light objects
-        self.lights_by_id = dict()
-        self.lights_by_name = dict()
-        # setup structures for sensor objects
-        self.sensors_by_id = dict()
-        self.sensors_by_name = dict()
-        # setup structures for group objects
-        self.groups_by_id = dict()
-        self.groups_by_name = dict()
+        # setup the pool of keep-alive connections to the bridge
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # setup the cache of resource collections (lights, groups, ...)
+        self.cache = StateCache(self._fetch_collection, ttl=cache_ttl)
+        # setup the two-way indexes between resource names and IDs
+        self.light_names = NameIndex(self.cache, 'lights')
+        self.group_names = NameIndex(self.cache, 'groups')
+        self.sensor_names = NameIndex(self.cache, 'sensors')
+        # setup the two-way index between groups and their lights
+        self.memberships = MembershipIndex(self.cache)
+        # setup the tracker of acknowledged light and group states used to
+        # strip unchanged attributes from commands
+        self.tracker = StateTracker()
+        self.cache.subscribe(self.tracker.reconcile)
+        # setup the planner that turns multi-light commands into group actions
+        self.planner = CommandPlanner(self, scratch_groups=scratch_groups) if plan_commands else None
+        # setup the optional thread pool for multi-target commands
+        self.max_workers = max_workers
+        self._executor = None
+        # setup the scheduler that paces requests to the bridge
+        self.scheduler = RequestScheduler(rate_limits)
+        # setup request accounting
+        self._requests_sent = RequestCounter()
+        # setup the coalescing of identical concurrent reads
+        self.reads_in_flight = SingleFlight()
+        # setup the timeouts, retries, and circuit breaker of requests
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        # setup the thread-safe registries of light, group, and sensor objects
+        self.light_registry = ObjectRegistry('lights')
+        self.group_registry = ObjectRegistry('groups')
+        self.sensor_registry = ObjectRegistry('sensors')
+        # setup the registry of scenes indexed by name and group
+        self.scene_registry = SceneRegistry(self)
 
         # setup local data containers
         self._name = None
@@ -115,61 +253,280 @@ class Bridge:
 
     def load_config_file(self) -> None:
         """Connect to the Hue bridge."""
-        logger.info('Loading bridge credentials from "%s"', self.config_file_path)
-        # check for existence of the file
-        if not self.has_config_file:
-            raise RuntimeError("No configuration found. run register")
-        # load the file into a JSON object
-        with open(self.config_file_path, 'r') as config_file:
-            config = json.loads(config_file.read())
-        # setup the IP address
-        self.ip_address = list(config.keys())[0]
-        logger.info('Using ip from config: %s', self.ip_address)
-        # setup the username
-        self.username = config[self.ip_address]['username']
-        logger.info('Using username from config: %s', self.username)
+        self.ip_address, self.username = read_config_file(self.config_file_path)
+
+    @property
+    def connection_pool(self) -> ConnectionPool:
+        """Return the pool of connections to the current IP address."""
+        with self._pool_lock:
+            # the IP address may change after discovery or registration
+            if self._pool is None or self._pool.host != self.ip_address:
+                if self._pool is not None:
+                    self._pool.close()
+                self._pool = ConnectionPool(self.ip_address,
+                    size=self.pool_size,
+                    idle_timeout=self.idle_timeout,
+                )
+            return self._pool
+
+    def _fan_out(self, send: 'Callable', targets: list) -> list:
+        """
+        Send a command to each target, concurrently if fan-out is enabled.
+
+        Args:
+            send: a callable that sends the command to one target
+            targets: the targets (e.g., light IDs) to send the command to
+
+        Returns:
+            the results of each call in the order of the targets
+
+        """
+        if self.max_workers is None or len(targets) < 2:
+            return [send(target) for target in targets]
+        with self._pool_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='Bridge')
+        return self._map_concurrently(self._executor, send, targets)
+
+    def _map_concurrently(self, executor: 'Executor', send: 'Callable', targets: list) -> list:
+        """
+        Call a function for each target on the threads of an executor.
+
+        Args:
+            executor: the executor to call the function on
+            send: a callable that sends a request for one target
+            targets: the targets to send requests for
+
+        Returns:
+            the results of each call in the order of the targets
+
+        """
+        # the worker threads send at the priority of the calling thread
+        priority = self.scheduler.current_priority
+
+        def send_at_priority(target):
+            with self.scheduler.priority(priority):
+                return send(target)
+
+        # the worker threads count requests in the context of the caller
+        contexts = [contextvars.copy_context() for _ in targets]
+        return list(executor.map(lambda context, target: context.run(send_at_priority, target), contexts, targets))
+
+    @property
+    def requests_sent(self) -> int:
+        """Return the number of requests sent to the bridge."""
+        return self._requests_sent.value
+
+    @contextlib.contextmanager
+    def count_requests(self):
+        """
+        Count the requests sent to the bridge within a block.
+
+        Requests are counted for the current context, so requests sent by
+        other threads at the same time are excluded, and requests that
+        threads send on behalf of the block (e.g., fan-out) are included.
+
+        Returns:
+            a context manager that yields a RequestCounter
+
+        """
+        counter = RequestCounter()
+        token = REQUEST_COUNTERS.set(REQUEST_COUNTERS.get() + (counter,))
+        try:
+            yield counter
+        finally:
+            REQUEST_COUNTERS.reset(token)
 
     def request(self,
         mode: str = 'GET',
         endpoint: str = None,
         data: dict = None,
-        timeout: int = 10
+        timeout: float = None
     ) -> dict:
         """
         Perform an HTTP GET/PUT requests on the API.
 
+        Concurrent GET requests for the same endpoint share one request to
+        the bridge, and every caller receives the same parsed response. The
+        response must be treated as read-only.
+
+        Requests that fail to reach the bridge are retried after a short
+        random delay if repeating them is safe (GET requests, and any request
+        that failed before it was sent). After repeated failures requests fail
+        immediately until a periodic probe finds the bridge again.
+
         Args:
             mode: the HTTP mode to use (e.g., GET)
             endpoint: the address to send the message to
             data: the JSON data to send in the message
-            timeout: the timeout for the request
+            timeout: the read timeout for the request, defaults to the
+                read_timeout of the bridge
 
         Returns:
             the response data as a dictionary
 
+        Raises:
+            PhueRequestTimeout: if the bridge didn't respond in time
+            PhueBridgeUnavailable: if the bridge couldn't be reached
+
         """
-        # create the HTTP connection
-        connection = HTTPConnection(self.ip_address, timeout=timeout)
-        # make the request using the given mode
-        try:
-            if mode in {'GET', 'DELETE'}:
-                connection.request(mode, endpoint)
-            if mode in {'PUT', 'POST'}:
-                connection.request(mode, endpoint, json.dumps(data))
-            logger.debug("%s %s %s", mode, endpoint, str(data))
-        except socket.timeout:  # handle a socket timeout
-            error = f"{mode} Request to {self.ip_address}{endpoint} timed out."
-            logger.exception(error)
-            raise PhueRequestTimeout(None, error)
-        # parse the response data and close the connection
-        result = connection.getresponse()
-        response = result.read()
-        connection.close()
+        timeout = self.read_timeout if timeout is None else timeout
+        if mode == 'GET':
+            key = (self.ip_address, endpoint)
+            return self.reads_in_flight.do(key, lambda: self._send_with_retries(mode, endpoint, data, timeout))
+        return self._send_with_retries(mode, endpoint, data, timeout)
+
+    def _send_with_retries(self, mode: str, endpoint: str, data: dict, timeout: float) -> dict:
+        """Send a request, retrying failures that are safe to repeat (see request)."""
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                error = f"The bridge at {self.ip_address} is unavailable, trying again in {self.breaker.retry_after():.1f}s."
+                raise PhueBridgeUnavailable(None, error)
+            try:
+                response = self._send(mode, endpoint, data, timeout)
+            except (OSError, HTTPException) as exception:
+                self.breaker.record_failure()
+                # a request that never reached the bridge can't have been applied
+                if attempt < self.retries and (mode == 'GET' or isinstance(exception, ConnectFailed)):
+                    delay = backoff_delay(attempt)
+                    logger.debug("Retrying %s %s in %.2fs after %r", mode, endpoint, delay, exception)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                if isinstance(exception, socket.timeout):  # handle a socket timeout
+                    error = f"{mode} Request to {self.ip_address}{endpoint} timed out."
+                    logger.exception(error)
+                    raise PhueRequestTimeout(None, error) from exception
+                error = f"{mode} Request to {self.ip_address}{endpoint} failed: {exception}"
+                logger.exception(error)
+                raise PhueBridgeUnavailable(None, error) from exception
+            except Exception:
+                # a garbled response (e.g., a body that isn't JSON) is a failure
+                # too, otherwise a probe of a half-open breaker never settles
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return response
+
+    def _send(self, mode: str, endpoint: str, data: dict, timeout: float) -> dict:
+        """Send one request to the bridge and parse the response (see request)."""
+        # wait for the bridge to have capacity for this type of request
+        self.scheduler.acquire(self.scheduler.classify(mode, endpoint))
+        self._requests_sent.increment()
+        for counter in REQUEST_COUNTERS.get():
+            counter.increment()
+        # encode the JSON body for requests that carry data
+        body = None
+        if mode in {'PUT', 'POST'}:
+            body = json.dumps(data)
+        # make the request over a pooled keep-alive connection
+        response = self.connection_pool.request(mode, endpoint, body,
+            timeout=timeout,
+            connect_timeout=self.connect_timeout,
+        )
+        logger.debug("%s %s %s", mode, endpoint, str(data))
         response = response.decode('utf-8')
         logger.debug(response)
         # parse the JSON data into a dictionary
         return json.loads(response)
 
+    def _put_tracked(self, kind: str, target_id, endpoint: str, data: dict) -> list:
+        """
+        Send a state command and record the attributes the bridge accepted.
+
+        Args:
+            kind: the resource type of the target ('lights' or 'groups')
+            target_id: the ID of the light or group
+            endpoint: the address to send the command to
+            data: the attributes to set
+
+        Returns:
+            the response of the bridge
+
+        """
+        update = expect_state(self.cache, kind, target_id, data)
+        try:
+            response = self._put_optimistic(update, endpoint, data)
+        except Exception:  # the command may or may not have been applied
+            self.tracker.forget(kind, target_id)
+            raise
+        members = None
+        if kind == 'groups' and str(target_id) != '0':
+            group = (self.cache.peek('groups') or {}).get(str(target_id))
+            members = group['lights'] if group else None
+        self.tracker.acknowledge(kind, target_id, response, members)
+        return response
+
+    def _put_optimistic(self, update: 'OptimisticUpdate', endpoint: str, data: dict) -> list:
+        """
+        Send a command, applying its changes to the cache ahead of the bridge.
+
+        Cached state reflects the command while it is in flight. Values the
+        bridge confirms are kept, values it refuses are rolled back, and
+        everything the command touched is invalidated if it fails outright.
+
+        Args:
+            update: the OptimisticUpdate with the changes of the command
+            endpoint: the address to send the command to
+            data: the attributes to set
+
+        Returns:
+            the response of the bridge
+
+        """
+        update.apply()
+        try:
+            response = self.request('PUT', endpoint, data)
+        except Exception:
+            update.abandon()
+            raise
+        update.settle(response)
+        return response
+
+    def _fetch_collection(self, collection: str) -> dict:
+        """Download a resource collection (e.g., 'lights') from the bridge."""
+        return self.request('GET', f'/api/{self.username}/{collection}')
+
+    def _fetch_resource(self, collection: str, resource_id) -> dict:
+        """
+        Return one resource (e.g., a light) from its cached collection.
+
+        Args:
+            collection: the collection of the resource (e.g., 'lights')
+            resource_id: the ID of the resource
+
+        Returns:
+            the resource as a dictionary, or the error response of the bridge
+
+        """
+        # without a cache, only download the resource instead of everything
+        if self.cache.ttl != 0:
+            data = self.cache.get(collection)
+            data = data.get(str(resource_id)) if isinstance(data, dict) else None
+            if data is not None:
+                return data
+        # not in the cache (e.g., group 0 or an error response), let the
+        # bridge report errors
+        return self.request('GET', f'/api/{self.username}/{collection}/{resource_id}')
+
+    def refresh(self, collection: str = None) -> None:
+        """
+        Refresh the cached state of the bridge.
+
+        Args:
+            collection: the name of the collection to refresh (e.g.,
+                'lights'). The full state is fetched in one request if None
+
+        Returns:
+            None
+
+        """
+        if collection is None:
+            self.cache.load(self.request('GET', f'/api/{self.username}'))
+        else:
+            self.cache.refresh(collection)
+
     @property
     def name(self) -> str:
         """Return the name of the bridge."""
@@ -186,7 +543,9 @@ class Bridge:
     @property
     def api(self):
         """ Returns the full api dictionary """
-        return self.request('GET', f'/api/{self.username}')
+        api = self.request('GET', f'/api/{self.username}')
+        self.cache.load(api)
+        return api
 
     #
     # MARK: Lights
@@ -207,20 +566,28 @@ class Bridge:
             - a dict keyed by light name (str) id in 'name' mode
 
         """
-        if not self.lights_by_id:  # the lights have not been loaded
-            # load the lights from the API
-            lights = self.request('GET', f'/api/{self.username}/lights/')
-            for light in lights:  # create the light objects and pointers
-                self.lights_by_id[int(light)] = Light(self, int(light))
-                self.lights_by_name[lights[light]['name']] = self.lights_by_id[int(light)]
+        # load the lights from the API the first time they are used
+        self.light_registry.load(lambda: self.cache.get('lights'), lambda light_id: Light(self, light_id))
+        registry = self.light_registry
         # return the lights based on data structure
         if mode == 'id':
-            return self.lights_by_id
+            return registry.by_id
         if mode == 'name':
-            return self.lights_by_name
+            return registry.by_name
         if mode == 'list':
             # return lights in sorted id order, dicts have no natural order
-            return [self.lights_by_id[id_] for id_ in sorted(self.lights_by_id)]
+            by_id = registry.by_id
+            return [by_id[id_] for id_ in sorted(by_id)]
+
+    @property
+    def lights_by_id(self) -> dict:
+        """Return the light objects keyed by ID, do not modify the dictionary."""
+        return self.get_light_objects('id')
+
+    @property
+    def lights_by_name(self) -> dict:
+        """Return the light objects keyed by name, do not modify the dictionary."""
+        return self.get_light_objects('name')
 
     @property
     def lights(self):
@@ -232,9 +599,8 @@ class Bridge:
         if isinstance(light_id, str):
             light_id = self.get_light_id_by_name(light_id)
         if light_id is None:
-            return self.request('GET', f'/api/{self.username}/lights/')
-        state = self.request(
-            'GET', f'/api/{self.username}/lights/{light_id}')
+            return self.cache.get('lights')
+        state = self._fetch_resource('lights', light_id)
         if parameter is None:
             return state
         if parameter in ['swupdate', 'type', 'name', 'modelid', 'manufacturername', 'productname', 'capabilities', 'config', 'uniqueid', 'swversion']:
@@ -248,13 +614,10 @@ class Bridge:
 
     def get_light_id_by_name(self, name: str):
         """ Lookup a light id based on string name. Case-sensitive. """
-        lights = self.get_light()
-        for light_id in lights:
-            if name == lights[light_id]['name']:
-                return light_id
-        return False
+        light_id = self.light_names.id_of(name)
+        return False if light_id is None else light_id
 
-    def set_light(self, light_id, parameter, value=None, transitiontime=None):
+    def set_light(self, light_id, parameter, value=None, transitiontime=None, force=False):
         """ Adjust properties of one or more lights.
 
         light_id can be a single lamp or an array of lamps
@@ -265,6 +628,13 @@ class Bridge:
                          command, it is not saved as a setting for use in the future!
                          Use the Light class' transitiontime attribute if you want
                          persistent time settings.
+        force : send every attribute, even those the bridge already acknowledged.
+                By default unchanged attributes are stripped and a light whose
+                command would change nothing is skipped (an empty response)
+
+        When several lights are set to the same state and they are exactly the
+        members of a group (or all lights), one group action is sent instead and
+        each light gets the response of the group action.
 
         """
         if isinstance(parameter, dict):
@@ -278,19 +648,44 @@ class Bridge:
         light_id_array = light_id
         if isinstance(light_id, int) or isinstance(light_id, str):
             light_id_array = [light_id]
-        result = []
-        for light in light_id_array:
+
+        def convert(light):
+            return self.get_light_id_by_name(light) if isinstance(light, str) else light
+
+        if parameter != 'name' and self.planner is not None and len(light_id_array) > 1:
+            converted_lights = [convert(light) for light in light_id_array]
+            if False not in converted_lights:
+                # lights already in the state don't need to be part of the plan
+                diffs = {light: data if force else self.tracker.diff('lights', light, data) for light in converted_lights}
+                pending = [light for light in converted_lights if diffs[light] is not None]
+                group = self.planner.group_for(pending)
+                if group is not None:
+                    # the plan decided what to send, the group action carries
+                    # every attribute that any of the lights needs
+                    keys = set().union(*(diffs[light] for light in pending))
+                    body = {key: value for key, value in data.items() if key in keys}
+                    logger.debug('Sending %s to lights %s as group %s', body, pending, group)
+                    response = self.set_group(group, body, force=True)[0]
+                    return [response if light in pending else [] for light in converted_lights]
+
+        def send(light):
             logger.debug(str(data))
+            converted_light = convert(light)
             if parameter == 'name':
-                result.append(self.request('PUT', f'/api/{self.username}/lights/{light_id}', data))
+                update = expect_attributes(self.cache, 'lights', converted_light, data)
+                response = self._put_optimistic(update, f'/api/{self.username}/lights/{converted_light}', data)
+                if 'success' in response[0]:
+                    self.light_names.rename(converted_light, value)
             else:
-                if isinstance(light, str):
-                    converted_light = self.get_light_id_by_name(light)
-                else:
-                    converted_light = light
-                result.append(self.request('PUT', f'/api/{self.username}/lights/{converted_light}/state', data))
-            if 'error' in list(result[-1][0].keys()):
-                logger.warning("ERROR: %s for light %d", result[-1][0]['error']['description'], light)
+                body = data if force else self.tracker.diff('lights', converted_light, data)
+                if body is None:  # the light is already in this state
+                    return []
+                response = self._put_tracked('lights', converted_light, f'/api/{self.username}/lights/{converted_light}/state', body)
+            if response and 'error' in list(response[0].keys()):
+                logger.warning("ERROR: %s for light %s", response[0]['error']['description'], light)
+            return response
+
+        result = self._fan_out(send, light_id_array)
 
         logger.debug(result)
         return result
@@ -311,7 +706,14 @@ class Bridge:
 
         """
         data = {'lights': [str(x) for x in lights], 'name': name}
-        return self.request('POST', f'/api/{self.username}/groups/', data)
+        result = self.request('POST', f'/api/{self.username}/groups/', data)
+        if 'success' in result[0]:
+            new_id = result[0]['success']['id']
+            self.group_names.add(new_id, name)
+            if self.group_registry.loaded:
+                self.group_registry.add(int(new_id), name, Group(self, int(new_id)))
+        self.cache.invalidate('groups')
+        return result
 
     # TODO: duplicate code with get_light_objects?
     def get_group_objects(self, mode: str = 'list') -> 'Union[list,dict]':
@@ -329,20 +731,28 @@ class Bridge:
             - a dict keyed by groups name (str) id in 'name' mode
 
         """
-        if not self.groups_by_id:  # the groups have not been loaded
-            # load the groups from the API
-            groups = self.request('GET', f'/api/{self.username}/groups/')
-            for group in groups:  # create the group objects and pointers
-                self.groups_by_id[int(group)] = Group(self, int(group))
-                self.groups_by_name[groups[group]['name']] = self.groups_by_id[int(group)]
+        # load the groups from the API the first time they are used
+        self.group_registry.load(lambda: self.cache.get('groups'), lambda group_id: Group(self, group_id))
+        registry = self.group_registry
         # return the groups based on data structure
         if mode == 'id':
-            return self.groups_by_id
+            return registry.by_id
         if mode == 'name':
-            return self.groups_by_name
+            return registry.by_name
         if mode == 'list':
             # return groups in sorted id order, dicts have no natural order
-            return [self.groups_by_id[id_] for id_ in sorted(self.groups_by_id)]
+            by_id = registry.by_id
+            return [by_id[id_] for id_ in sorted(by_id)]
+
+    @property
+    def groups_by_id(self) -> dict:
+        """Return the group objects keyed by ID, do not modify the dictionary."""
+        return self.get_group_objects('id')
+
+    @property
+    def groups_by_name(self) -> dict:
+        """Return the group objects keyed by name, do not modify the dictionary."""
+        return self.get_group_objects('name')
 
     @property
     def groups(self):
@@ -356,27 +766,82 @@ class Bridge:
             logger.error('Group name does not exist')
             return
         if group_id is None:
-            return self.request('GET', f'/api/{self.username}/groups/')
+            return self.cache.get('groups')
+        state = self._fetch_resource('groups', group_id)
         if parameter is None:
-            return self.request('GET', f'/api/{self.username}/groups/{group_id}')
+            return state
         if parameter in {'name', 'lights'}:
-            return self.request('GET', f'/api/{self.username}/groups/{group_id}')[parameter]
-        return self.request('GET', f'/api/{self.username}/groups/{group_id}')['action'][parameter]
+            return state[parameter]
+        return state['action'][parameter]
 
     def get_group_id_by_name(self, name):
         """ Lookup a group id based on string name. Case-sensitive. """
-        groups = self.get_group()
-        for group_id in groups:
-            if name == groups[group_id]['name']:
-                return int(group_id)
-        return False
+        group_id = self.group_names.id_of(name)
+        return False if group_id is None else int(group_id)
+
+    def get_group_ids_by_light(self, light_id) -> list:
+        """
+        Return the IDs of the groups that contain a light.
+
+        Args:
+            light_id: the ID or name of the light
+
+        Returns:
+            a list of group IDs (int) from the cached groups
 
-    def set_group(self, group_id, parameter, value=None, transitiontime=None):
+        """
+        if isinstance(light_id, str):
+            light_id = self.get_light_id_by_name(light_id)
+        return [int(group_id) for group_id in self.memberships.groups_of(light_id)]
+
+    def get_group_aggregate(self, group_id=None):
+        """
+        Return the combined state of groups computed from their cached lights.
+
+        Args:
+            group_id: the ID or name of a group, 0 for all lights, or None for
+                every group
+
+        Returns:
+            a dictionary with 'any_on', 'all_on', 'bri', and 'rgb' (see
+            membership.group_aggregates), or a dictionary of those keyed by
+            group ID (str) if group_id is None. Do not modify either
+
+        """
+        if isinstance(group_id, str):
+            group_id = self.get_group_id_by_name(group_id)
+        aggregates = self.memberships.aggregates()
+        if group_id is None:
+            return aggregates
+        return aggregates[str(group_id)]
+
+    def _member_states(self, group_id) -> list:
+        """
+        Return the current states of the lights in a group.
+
+        Args:
+            group_id: the ID of the group, 0 for all lights
+
+        Returns:
+            a list of the "state" dictionaries of the lights in the group
+            from the cached lights (shared with the cache, do not modify)
+
+        """
+        lights = self.cache.get('lights')
+        if not isinstance(lights, dict):
+            return []
+        light_ids = list(lights) if str(group_id) == '0' else self.memberships.lights_of(group_id)
+        return [lights[light_id]['state'] for light_id in light_ids if 'state' in lights.get(light_id, {})]
+
+    def set_group(self, group_id, parameter, value=None, transitiontime=None, force=False):
         """ Change light settings for a group
 
         group_id : int, id number for group
         parameter : 'name' or 'lights'
         value: string, or list of light IDs if you're setting the lights
+        force : send every attribute of an action, even those every light in the
+                group already has. By default unchanged attributes are stripped
+                and a group whose action would change nothing is skipped
 
         """
 
@@ -396,49 +861,70 @@ class Bridge:
         group_id_array = group_id
         if isinstance(group_id, (int, str)):
             group_id_array = [group_id]
-        result = []
+        converted_groups = []
         for group in group_id_array:
-            logger.debug(str(data))
             if isinstance(group, str):
-                converted_group = self.get_group_id_by_name(group)
-            else:
-                converted_group = group
-            if converted_group is False:
+                group = self.get_group_id_by_name(group)
+            if group is False:
                 logger.error('Group name does not exist')
                 return
-            if parameter in {'name', 'lights'}:
-                result.append(self.request('PUT', f'/api/{self.username}/groups/{converted_group}', data))
+            converted_groups.append(group)
+
+        def send(group):
+            logger.debug(str(data))
+            if {'name', 'lights'}.intersection(data):
+                update = expect_attributes(self.cache, 'groups', group, data)
+                response = self._put_optimistic(update, f'/api/{self.username}/groups/{group}', data)
+                if 'name' in data and 'success' in response[0]:
+                    self.group_names.rename(group, data['name'])
             else:
-                result.append(self.request('PUT', f'/api/{self.username}/groups/{converted_group}/action', data))
+                body = data if force else self.tracker.diff('groups', group, data, self._member_states(group))
+                if body is None:  # the group is already in this state
+                    return []
+                response = self._put_tracked('groups', group, f'/api/{self.username}/groups/{group}/action', body)
+            if response and 'error' in list(response[0].keys()):
+                logger.warning("ERROR: %s for group %s", response[0]['error']['description'], group)
+            return response
 
-        if 'error' in list(result[-1][0].keys()):
-            logger.warning("ERROR: %s for group %d", result[-1][0]['error']['description'], group)
+        result = self._fan_out(send, converted_groups)
 
         logger.debug(result)
         return result
 
     def delete_group(self, group_id):
-        return self.request('DELETE', f'/api/{self.username}/groups/{group_id}')
+        result = self.request('DELETE', f'/api/{self.username}/groups/{group_id}')
+        # keep the group if the bridge refused to delete it
+        if result and 'success' in result[0]:
+            self.group_names.remove(group_id)
+            self.group_registry.remove(group_id)
+        self.cache.invalidate('groups')
+        return result
 
     #
     # MARK: Scenes
     #
 
-    def get_scene(self):
-        return self.request('GET', f'/api/{self.username}/scenes')
+    def get_scene(self, scene_id=None):
+        """ Return all scenes, or one scene with the states of its lights """
+        if scene_id is None:
+            return self.request('GET', f'/api/{self.username}/scenes')
+        return self.request('GET', f'/api/{self.username}/scenes/{scene_id}')
 
     @property
     def scenes(self):
-        return [Scene(k, **v) for k, v in self.get_scene().items()]
+        """ Access scenes as a list """
+        return self.scene_registry.scenes()
 
     def delete_scene(self, scene_id):
         try:
-            return self.request('DELETE', f'/api/{self.username}/scenes/{scene_id}')
+            result = self.request('DELETE', f'/api/{self.username}/scenes/{scene_id}')
+            self.cache.invalidate('scenes')
+            return result
         except:
-            logger.debug("Unable to delete scene with ID %d", scene_id)
+            logger.debug("Unable to delete scene with ID %s", scene_id)
 
     def activate_scene(self, group_id, scene_id, transition_time=4):
-        return self.request('PUT', f'/api/{self.username}/groups/{group_id}/action', {
+        return self._put_tracked('groups', group_id, f'/api/{self.username}/groups/{group_id}/action', {
             "scene": scene_id,
             "transitiontime": transition_time
         })
@@ -464,25 +950,26 @@ class Bridge:
         :returns True if a scene was run, False otherwise
 
         """
-        groups = [x for x in self.groups if x.name == group_name]
-        scenes = [x for x in self.scenes if x.name == scene_name]
-        if len(groups) != 1:
-            logger.warning("run_scene: More than 1 group found by name %s", group_name)
+        # the names and scenes are resolved from the cache, so running a
+        # scene while the cache is fresh only costs the request that
+        # activates it
+        group_id = self.get_group_id_by_name(group_name)
+        scenes = self.scene_registry.named(scene_name)
+        if group_id is False:
+            logger.warning("run_scene: No group found by name %s", group_name)
             return False
-        group = groups[0]
         if len(scenes) == 0:
             logger.warning("run_scene: No scene found %s", scene_name)
             return False
         if len(scenes) == 1:
-            self.activate_scene(group.group_id, scenes[0].scene_id, transition_time)
+            self.activate_scene(group_id, scenes[0].scene_id, transition_time)
+            return True
+        # otherwise, prefer a scene stored for the group, then one that
+        # uses all the lights of the group
+        group_lights = sorted(int(x) for x in self.memberships.lights_of(group_id))
+        for scene in [x for x in scenes if str(x.group) == str(group_id)] + [x for x in scenes if x.lights == group_lights]:
+            self.activate_scene(group_id, scene.scene_id, transition_time)
             return True
-        # otherwise, lets figure out if one of the named scenes uses
-        # all the lights of the group
-        group_lights = sorted([x.light_id for x in group.lights])
-        for scene in scenes:
-            if group_lights == scene.lights:
-                self.activate_scene(group.group_id, scene.scene_id, transition_time)
-                return True
         logger.warning("run_scene: did not find a scene: %s that shared lights with group %s", scene_name, group_name)
         return False
 
@@ -507,13 +994,13 @@ class Bridge:
             data["config"] = config
 
         result = self.request('POST', f'/api/{self.username}/sensors/', data)
+        self.cache.invalidate('sensors')
 
         if ("success" in result[0].keys()):
             new_id = result[0]["success"]["id"]
-            logger.debug("Created sensor with ID %d", new_id)
-            new_sensor = Sensor(self, int(new_id))
-            self.sensors_by_id[new_id] = new_sensor
-            self.sensors_by_name[name] = new_sensor
+            logger.debug("Created sensor with ID %s", new_id)
+            self.sensor_registry.add(int(new_id), name, Sensor(self, int(new_id)))
+            self.sensor_names.add(new_id, name)
             return new_id, None
         else:
             logger.debug("Failed to create sensor: %s", repr(result[0]))
@@ -534,20 +1021,28 @@ class Bridge:
             - a dict keyed by sensor name (str) id in 'name' mode
 
         """
-        if not self.sensors_by_id:  # the sensors have not been loaded
-            # load the sensors from the API
-            sensors = self.request('GET', f'/api/{self.username}/sensors/')
-            for sensor in sensors:  # create the sensor objects and pointers
-                self.sensors_by_id[int(sensor)] = Sensor(self, int(sensor))
-                self.sensors_by_name[sensors[sensor]['name']] = self.sensors_by_id[int(sensor)]
+        # load the sensors from the API the first time they are used
+        self.sensor_registry.load(lambda: self.cache.get('sensors'), lambda sensor_id: Sensor(self, sensor_id))
+        registry = self.sensor_registry
         # return the sensors based on data structure
         if mode == 'id':
-            return self.sensors_by_id
+            return registry.by_id
         if mode == 'name':
-            return self.sensors_by_name
+            return registry.by_name
         if mode == 'list':
             # return sensors in sorted id order, dicts have no natural order
-            return [self.sensors_by_id[id_] for id_ in sorted(self.sensors_by_id)]
+            by_id = registry.by_id
+            return [by_id[id_] for id_ in sorted(by_id)]
+
+    @property
+    def sensors_by_id(self) -> dict:
+        """Return the sensor objects keyed by ID, do not modify the dictionary."""
+        return self.get_sensor_objects('id')
+
+    @property
+    def sensors_by_name(self) -> dict:
+        """Return the sensor objects keyed by name, do not modify the dictionary."""
+        return self.get_sensor_objects('name')
 
     @property
     def sensors(self):
@@ -559,8 +1054,8 @@ class Bridge:
         if isinstance(sensor_id, str):
             sensor_id = self.get_sensor_id_by_name(sensor_id)
         if sensor_id is None:
-            return self.request('GET', f'/api/{self.username}/sensors/')
-        data = self.request('GET', f'/api/{self.username}/sensors/{sensor_id}')
+            return self.cache.get('sensors')
+        data = self._fetch_resource('sensors', sensor_id)
 
         if isinstance(data, list):
             logger.debug("Unable to read sensor with ID %d: %s", sensor_id, repr(data))
@@ -572,11 +1067,8 @@ class Bridge:
 
     def get_sensor_id_by_name(self, name):
         """ Lookup a sensor id based on string name. Case-sensitive. """
-        sensors = self.get_sensor()
-        for sensor_id in sensors:
-            if name == sensors[sensor_id]['name']:
-                return sensor_id
-        return False
+        sensor_id = self.sensor_names.id_of(name)
+        return False if sensor_id is None else sensor_id
 
     def set_sensor(self, sensor_id, parameter, value=None):
         """ Adjust properties of a sensor
@@ -592,7 +1084,10 @@ class Bridge:
 
         result = None
         logger.debug(str(data))
-        result = self.request('PUT', f'/api/{self.username}/sensors/{sensor_id}', data)
+        update = expect_attributes(self.cache, 'sensors', sensor_id, data)
+        result = self._put_optimistic(update, f'/api/{self.username}/sensors/{sensor_id}', data)
+        if 'name' in data and 'success' in result[0]:
+            self.sensor_names.rename(sensor_id, data['name'])
         if 'error' in list(result[0].keys()):
             logger.warning("ERROR: %s for sensor %d", result[0]['error']['description'], sensor_id)
 
@@ -635,7 +1130,8 @@ class Bridge:
 
         result = None
         logger.debug(str(data))
-        result = self.request('PUT', f'/api/{self.username}/sensors/{sensor_id}/{structure}', data)
+        update = expect_attributes(self.cache, 'sensors', sensor_id, data, structure)
+        result = self._put_optimistic(update, f'/api/{self.username}/sensors/{sensor_id}/{structure}', data)
         if 'error' in list(result[0].keys()):
             logger.warning("ERROR: %s for sensor %d", result[0]['error']['description'], sensor_id)
 
@@ -644,10 +1140,15 @@ class Bridge:
 
     def delete_sensor(self, sensor_id):
         try:
-            name = self.sensors_by_id[sensor_id].name
-            del self.sensors_by_name[name]
-            del self.sensors_by_id[sensor_id]
-            return self.request('DELETE', f'/api/{self.username}/sensors/{sensor_id}')
+            if int(sensor_id) not in self.get_sensor_objects('id'):
+                raise KeyError(sensor_id)
+            result = self.request('DELETE', f'/api/{self.username}/sensors/{sensor_id}')
+            # keep the sensor if the bridge refused to delete it
+            if result and 'success' in result[0]:
+                self.sensor_registry.remove(sensor_id)
+                self.sensor_names.remove(sensor_id)
+            self.cache.invalidate('sensors')
+            return result
         except:
             logger.debug("Unable to delete nonexistent sensor with ID %d", sensor_id)
 
@@ -0,0 +1,301 @@
+"""A cache of the resource collections on the Hue bridge."""
+import copy
+import hashlib
+import json
+import threading
+import time
+from typing import TYPE_CHECKING
+from .exceptions import PhueBridgeUnavailable
+from .logger import logger
+if TYPE_CHECKING:
+    from typing import Callable
+
+
+# the value of an attribute that doesn't exist, used to remove attributes
+MISSING = object()
+
+
+def digest(data) -> bytes:
+    """Return a short hash of JSON data that is independent of key order."""
+    return hashlib.blake2b(json.dumps(data, sort_keys=True).encode('utf-8'), digest_size=16).digest()
+
+
+class StateCache:
+    """A time-to-live cache of the resource collections on the Hue bridge."""
+
+    def __init__(self, fetch: 'Callable[[str], dict]', ttl: float = 2.0) -> None:
+        """
+        Initialize a new state cache.
+
+        Args:
+            fetch: a callable that downloads a collection (e.g., 'lights')
+                from the bridge and returns it as a dictionary
+            ttl: the number of seconds a collection is considered fresh. Use
+                None to never expire (only explicit refreshes) or 0 to
+                always read through to the bridge
+
+        Returns:
+            None
+
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        # the cached collections as (time of fetch, data) pairs
+        self._entries = dict()
+        # the version of each collection as (number, hash of the contents),
+        # the number only goes up when the contents change
+        self._versions = dict()
+        # the latest copy of each collection, kept through invalidation to
+        # serve while the bridge is unavailable
+        self._last_known = dict()
+        self._lock = threading.Lock()
+        # the callables notified of each collection stored in the cache
+        self._listeners = list()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(ttl={self.ttl}, collections={sorted(self._entries)})'
+
+    def is_fresh(self, collection: str) -> bool:
+        """
+        Return True if the given collection is cached and has not expired.
+
+        Args:
+            collection: the name of the collection (e.g., 'lights')
+
+        Returns:
+            True if the collection can be served from the cache
+
+        """
+        with self._lock:
+            entry = self._entries.get(collection)
+        if entry is None:
+            return False
+        return self.ttl is None or time.monotonic() - entry[0] < self.ttl
+
+    def get(self, collection: str) -> dict:
+        """
+        Return a collection, fetching it from the bridge if it is stale.
+
+        Args:
+            collection: the name of the collection (e.g., 'lights')
+
+        Returns:
+            the collection as a dictionary keyed by resource ID (str). The
+            dictionary is shared with the cache and must not be modified.
+            The last known copy is returned if the bridge is unavailable
+
+        """
+        with self._lock:
+            entry = self._entries.get(collection)
+        if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+            return entry[1]
+        return self._refresh_or_last_known(collection)
+
+    def get_versioned(self, collection: str) -> tuple:
+        """
+        Return a collection and its version, fetching it if it is stale.
+
+        Args:
+            collection: the name of the collection (e.g., 'lights')
+
+        Returns:
+            a tuple of (collection, version number). The version number only
+            changes when the contents of the collection change, and is 0 if
+            the collection could not be fetched
+
+        """
+        with self._lock:
+            entry = self._entries.get(collection)
+            version = self._versions.get(collection, (0, None))[0]
+        if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+            return entry[1], version
+        data = self._refresh_or_last_known(collection)
+        with self._lock:
+            entry = self._entries.get(collection)
+            version = self._versions.get(collection, (0, None))[0]
+        # another thread may have stored a newer copy in the meantime
+        if entry is not None:
+            return entry[1], version
+        return data, version if isinstance(data, dict) else 0
+
+    def version(self, collection: str) -> int:
+        """Return the version number of a collection (see get_versioned)."""
+        with self._lock:
+            return self._versions.get(collection, (0, None))[0]
+
+    def peek(self, collection: str) -> dict:
+        """
+        Return a collection if it is cached, whether or not it has expired.
+
+        Args:
+            collection: the name of the collection (e.g., 'lights')
+
+        Returns:
+            the cached collection or None if it is not cached
+
+        """
+        with self._lock:
+            entry = self._entries.get(collection)
+        return None if entry is None else entry[1]
+
+    def refresh(self, collection: str) -> dict:
+        """
+        Fetch a collection from the bridge and store it in the cache.
+
+        Args:
+            collection: the name of the collection (e.g., 'lights')
+
+        Returns:
+            the collection as a dictionary keyed by resource ID (str)
+
+        """
+        data = self.fetch(collection)
+        # the bridge reports failures as a list of errors, don't cache those
+        if isinstance(data, dict):
+            self.store(collection, data)
+        return data
+
+    def _refresh_or_last_known(self, collection: str) -> dict:
+        """Refresh a collection, falling back to the last known copy if the bridge is unavailable."""
+        try:
+            return self.refresh(collection)
+        except PhueBridgeUnavailable as error:
+            with self._lock:
+                data = self._last_known.get(collection)
+            if data is None:
+                raise
+            logger.debug('Serving the last known %s: %s', collection, error.message)
+            return data
+
+    def subscribe(self, listener: 'Callable[[str, dict], None]') -> None:
+        """
+        Call a function with each collection that is stored, patched, or
+        invalidated.
+
+        Args:
+            listener: a callable of (collection name, data) where data is
+                None when the collection was invalidated
+
+        Returns:
+            None
+
+        """
+        self._listeners.append(listener)
+
+    def store(self, collection: str, data: dict) -> None:
+        """
+        Store a collection in the cache.
+
+        Args:
+            collection: the name of the collection (e.g., 'lights')
+            data: the collection as a dictionary keyed by resource ID (str)
+
+        Returns:
+            None
+
+        """
+        contents = digest(data)
+        with self._lock:
+            self._entries[collection] = (time.monotonic(), data)
+            self._last_known[collection] = data
+            number, previous = self._versions.get(collection, (0, None))
+            if contents != previous:
+                self._versions[collection] = (number + 1, contents)
+        for listener in self._listeners:
+            listener(collection, data)
+
+    def patch(self, collection: str, changes: dict) -> dict:
+        """
+        Change attributes of a cached collection without fetching it.
+
+        The collection is copied rather than modified, so readers of the old
+        dictionary are unaffected. It keeps the time it was fetched at, so a
+        patch never makes the rest of the collection fresher. Attributes of
+        resources that aren't cached are skipped.
+
+        Args:
+            collection: the name of the collection (e.g., 'lights')
+            changes: a dictionary mapping paths of attributes in the
+                collection (e.g., ('3', 'state', 'bri')) to their new values,
+                or to MISSING to remove them
+
+        Returns:
+            a dictionary mapping the paths that were changed to their previous
+            values (MISSING for attributes that didn't exist)
+
+        """
+        previous = dict()
+        with self._lock:
+            entry = self._entries.get(collection)
+            if entry is None:
+                return previous
+            data = dict(entry[1])
+            copied = set()
+            for path, value in changes.items():
+                resource_id, *parents, key = path
+                if not isinstance(data.get(resource_id), dict):
+                    continue
+                if resource_id not in copied:
+                    data[resource_id] = copy.deepcopy(data[resource_id])
+                    copied.add(resource_id)
+                parent = data[resource_id]
+                for part in parents:
+                    parent = parent.get(part) if isinstance(parent, dict) else None
+                if not isinstance(parent, dict):
+                    continue
+                previous.setdefault(path, parent.get(key, MISSING))
+                if value is MISSING:
+                    parent.pop(key, None)
+                else:
+                    parent[key] = copy.deepcopy(value)
+            if not previous:
+                return previous
+            self._entries[collection] = (entry[0], data)
+            self._last_known[collection] = data
+            contents = digest(data)
+            number, old_contents = self._versions.get(collection, (0, None))
+            if contents != old_contents:
+                self._versions[collection] = (number + 1, contents)
+        for listener in self._listeners:
+            listener(collection, data)
+        return previous
+
+    def load(self, snapshot: dict) -> None:
+        """
+        Store every collection in a full snapshot (i.e., GET /api/<user>).
+
+        Args:
+            snapshot: the full state of the bridge keyed by collection name
+
+        Returns:
+            None
+
+        """
+        for collection, data in snapshot.items():
+            if isinstance(data, dict):
+                self.store(collection, data)
+
+    def invalidate(self, *collections: str) -> None:
+        """
+        Mark collections as stale so the next read goes to the bridge.
+
+        Args:
+            collections: the names of the collections to invalidate. All
+                collections are invalidated if none are given
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            if not collections:
+                collections = tuple(self._entries)
+            for collection in collections:
+                self._entries.pop(collection, None)
+        for listener in self._listeners:
+            for collection in collections:
+                listener(collection, None)
+
+
+# explicitly define the outward facing API of this module
+__all__ = [StateCache.__name__]
@@ -2,11 +2,104 @@
 
 Reference: https://developers.meethue.com/develop/application-design-guidance/color-conversion-formulas-rgb-to-xy-and-back/
 
+Each kernel is compiled with numba the first time any of them is called (or
+when `compile_kernels` is called), so importing this module does not import
+numba. Compiled machine code is cached on disk, so later processes skip the
+JIT step. When numba is not installed the kernels run as plain Python.
+
 """
-from numba import jit
+import threading
+import numpy as np
+from .logger import logger
+
+
+# the parallel range used by the array kernels, replaced by numba.prange
+# when the kernels are compiled
+prange = range
+
+
+# the color coordinates of D65 white, for lights that don't report xy
+WHITE_XY = (0.3127, 0.3290)
+# the kernels in definition order, callees are defined before their callers
+_KERNELS = []
+# a lock that ensures the kernels are compiled only once
+_COMPILE_LOCK = threading.Lock()
+
+
+class LazyKernel:
+    """A function that is JIT compiled with numba on its first call."""
+
+    def __init__(self, function, options: dict) -> None:
+        """
+        Initialize a new lazy kernel.
 
+        Args:
+            function: the pure Python implementation of the kernel
+            options: the keyword arguments for numba.jit
+
+        Returns:
+            None
+
+        """
+        self.py_func = function
+        self.options = options
+        self.compiled = None
+        self.__name__ = function.__name__
+        self.__doc__ = function.__doc__
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.__name__} compiled={self.compiled is not None}>'
+
+    def __call__(self, *args):
+        if self.compiled is None:
+            compile_kernels()
+        return self.compiled(*args)
+
+
+def kernel(**options):
+    """
+    Register a function as a lazily compiled kernel.
 
-@jit(nopython=True)
+    Args:
+        options: keyword arguments for numba.jit besides nopython and cache
+
+    Returns:
+        a decorator that converts a function to a LazyKernel
+
+    """
+    def decorator(function):
+        lazy_kernel = LazyKernel(function, options)
+        _KERNELS.append(lazy_kernel)
+        return lazy_kernel
+    return decorator
+
+
+def compile_kernels() -> None:
+    """Compile every kernel with numba, falling back to Python without it."""
+    global prange
+    with _COMPILE_LOCK:
+        if all(lazy_kernel.compiled is not None for lazy_kernel in _KERNELS):
+            return
+        try:
+            import numba
+        except ImportError:
+            numba = None
+            logger.warning('numba is not installed, color conversions run as pure Python')
+        if numba is not None:
+            prange = numba.prange
+        # rebind the module globals so kernels call each other directly
+        for lazy_kernel in _KERNELS:
+            if numba is None:
+                compiled = lazy_kernel.py_func
+            else:
+                compiled = numba.jit(nopython=True, cache=True, **lazy_kernel.options)(lazy_kernel.py_func)
+            globals()[lazy_kernel.__name__] = compiled
+        # publish the compiled functions only after every kernel is bound
+        for lazy_kernel in _KERNELS:
+            lazy_kernel.compiled = globals()[lazy_kernel.__name__]
+
+
+@kernel()
 def correct_xyz2rgb_gamma(channel):
     """
     Correct the gamma of a channel during an XYZ to sRGB conversion.
@@ -27,7 +120,7 @@ def correct_xyz2rgb_gamma(channel):
     return min(255, max(0, int(channel * 255)))
 
 
-@jit(nopython=True)
+@kernel()
 def xy_bri_to_rgb(x, y, brightness):
     """
     Convert an XY-Brightness color to RGB.
@@ -53,7 +146,7 @@ def xy_bri_to_rgb(x, y, brightness):
     return r, g, b
 
 
-@jit(nopython=True)
+@kernel()
 def correct_rgb2xyz_gamma(channel):
     """
     Correct the gamma of a channel during an XYZ to sRGB conversion.
@@ -75,7 +168,29 @@ def correct_rgb2xyz_gamma(channel):
     return channel
 
 
-@jit(nopython=True)
+# the gamma corrected value of each 8-bit sRGB channel value
+RGB2XYZ_GAMMA = np.array([correct_rgb2xyz_gamma.py_func(channel) for channel in range(256)])
+
+
+@kernel()
+def linearize_rgb(channel):
+    """
+    Correct the gamma of a channel using the lookup table when possible.
+
+    Args:
+        channel: the channel to correct the gamma of, in [0, 255]
+
+    Returns:
+        the channel after correcting the gamma
+
+    """
+    index = int(channel)
+    if index == channel and 0 <= index <= 255:
+        return RGB2XYZ_GAMMA[index]
+    return correct_rgb2xyz_gamma(channel)
+
+
+@kernel()
 def rgb_to_xy_bri(r, g, b):
     """
     Convert a color from RGB color space to x,y Brightness for Philips hue.
@@ -90,9 +205,9 @@ def rgb_to_xy_bri(r, g, b):
 
     """
     # correct the gamma
-    r = correct_rgb2xyz_gamma(r)
-    g = correct_rgb2xyz_gamma(g)
-    b = correct_rgb2xyz_gamma(b)
+    r = linearize_rgb(r)
+    g = linearize_rgb(g)
+    b = linearize_rgb(b)
     # Wide gamut conversion D65
     X = r * 0.664511 + g * 0.154324 + b * 0.162028
     Y = r * 0.283881 + g * 0.668433 + b * 0.047685
@@ -105,10 +220,224 @@ def rgb_to_xy_bri(r, g, b):
     return (x, y), min(255, max(0, int(Y * 255.0)))
 
 
+#
+# MARK: Gamuts
+#
+
+
+# the (red, green, blue) corners of the color gamut triangles of hue lights
+# Reference: https://developers.meethue.com/develop/hue-api/supported-devices/
+GAMUTS = {
+    'A': np.array([[0.704, 0.296], [0.2151, 0.7106], [0.138, 0.08]]),
+    'B': np.array([[0.675, 0.322], [0.409, 0.518], [0.167, 0.04]]),
+    'C': np.array([[0.6915, 0.3083], [0.17, 0.7], [0.1532, 0.0475]]),
+}
+
+
+# the gamut type of light models that don't report their capabilities
+MODEL_GAMUTS = {
+    'LST001': 'A', 'LLC005': 'A', 'LLC006': 'A', 'LLC007': 'A', 'LLC010': 'A',
+    'LLC011': 'A', 'LLC012': 'A', 'LLC013': 'A', 'LLC014': 'A',
+    'LCT001': 'B', 'LCT002': 'B', 'LCT003': 'B', 'LCT007': 'B', 'LLM001': 'B',
+    'LCT010': 'C', 'LCT011': 'C', 'LCT012': 'C', 'LCT014': 'C', 'LCT015': 'C',
+    'LCT016': 'C', 'LLC020': 'C', 'LST002': 'C',
+}
+
+
+def gamut_of(modelid: str = None, capabilities: dict = None) -> 'np.ndarray':
+    """
+    Return the color gamut of a light.
+
+    Args:
+        modelid: the model ID of the light (e.g., 'LCT015')
+        capabilities: the capabilities dictionary reported by the light
+
+    Returns:
+        a (3, 2) array of the red, green, and blue corners of the gamut, or
+        None if the gamut of the light is unknown
+
+    """
+    control = (capabilities or {}).get('control', {})
+    if 'colorgamut' in control:
+        return np.array(control['colorgamut'], dtype=np.float64)
+    if control.get('colorgamuttype') in GAMUTS:
+        return GAMUTS[control['colorgamuttype']]
+    if modelid in MODEL_GAMUTS:
+        return GAMUTS[MODEL_GAMUTS[modelid]]
+    return None
+
+
+@kernel()
+def closest_point_on_segment(x, y, ax, ay, bx, by):
+    """
+    Return the point on the line segment A-B closest to a point.
+
+    Args:
+        x: the x value of the point
+        y: the y value of the point
+        ax: the x value of the start of the segment
+        ay: the y value of the start of the segment
+        bx: the x value of the end of the segment
+        by: the y value of the end of the segment
+
+    Returns:
+        the x,y tuple of the closest point on the segment
+
+    """
+    dx = bx - ax
+    dy = by - ay
+    t = ((x - ax) * dx + (y - ay) * dy) / (dx * dx + dy * dy)
+    t = min(1.0, max(0.0, t))
+    return ax + t * dx, ay + t * dy
+
+
+@kernel()
+def clamp_xy_to_gamut(x, y, gamut):
+    """
+    Project an x,y color into a color gamut.
+
+    Args:
+        x: the x value of the color [0.0, 1.0]
+        y: the y value of the color [0.0, 1.0]
+        gamut: a (3, 2) array of the red, green, and blue corners of the gamut
+
+    Returns:
+        the x,y tuple unchanged if it is in the gamut, otherwise the closest
+        point on the edge of the gamut
+
+    """
+    # test which side of each edge (R->G, G->B, B->R) the point is on
+    inside = True
+    for i in range(3):
+        ax, ay = gamut[i, 0], gamut[i, 1]
+        bx, by = gamut[(i + 1) % 3, 0], gamut[(i + 1) % 3, 1]
+        if (bx - ax) * (y - ay) - (by - ay) * (x - ax) < 0:
+            inside = False
+    if inside:
+        return x, y
+    # find the closest point on the edges of the triangle
+    best_x, best_y = x, y
+    best_distance = np.inf
+    for i in range(3):
+        px, py = closest_point_on_segment(x, y,
+            gamut[i, 0], gamut[i, 1],
+            gamut[(i + 1) % 3, 0], gamut[(i + 1) % 3, 1],
+        )
+        distance = (px - x) ** 2 + (py - y) ** 2
+        if distance < best_distance:
+            best_x, best_y, best_distance = px, py, distance
+    return best_x, best_y
+
+
+@kernel()
+def rgb_to_xy_bri_in_gamut(r, g, b, gamut):
+    """
+    Convert a color from RGB to x,y Brightness within a light's gamut.
+
+    Args:
+        r: the red channel [0, 255]
+        g: the green channel [0, 255]
+        b: the blue channel [0, 255]
+        gamut: a (3, 2) array of the red, green, and blue corners of the gamut
+
+    Returns:
+        a tuple of
+        - the x,y values projected into the gamut
+        - the brightness
+
+    """
+    (x, y), brightness = rgb_to_xy_bri(r, g, b)
+    return clamp_xy_to_gamut(x, y, gamut), brightness
+
+
+#
+# MARK: Arrays
+#
+
+
+@kernel(parallel=True)
+def xy_bri_to_rgb_array(xy, brightness):
+    """
+    Convert many XY-Brightness colors to RGB.
+
+    Args:
+        xy: an (N, 2) array of x,y values in [0.0, 1.0]
+        brightness: an (N,) array of brightness values in [0, 254]
+
+    Returns:
+        an (N, 3) integer array of RGB values
+
+    """
+    rgb = np.empty((xy.shape[0], 3), dtype=np.int64)
+    for i in prange(xy.shape[0]):
+        r, g, b = xy_bri_to_rgb(xy[i, 0], xy[i, 1], brightness[i])
+        rgb[i, 0] = r
+        rgb[i, 1] = g
+        rgb[i, 2] = b
+    return rgb
+
+
+@kernel()
+def xy_bri_to_rgb_rows(xy, brightness):
+    """
+    Convert many XY-Brightness colors to RGB on the calling thread.
+
+    Unlike xy_bri_to_rgb_array this doesn't hand the work to a thread pool,
+    so several threads (e.g., web requests) can call it at the same time.
+
+    Args:
+        xy: an (N, 2) array of x,y values in [0.0, 1.0]
+        brightness: an (N,) array of brightness values in [0, 254]
+
+    Returns:
+        an (N, 3) integer array of RGB values
+
+    """
+    rgb = np.empty((xy.shape[0], 3), dtype=np.int64)
+    for i in range(xy.shape[0]):
+        r, g, b = xy_bri_to_rgb(xy[i, 0], xy[i, 1], brightness[i])
+        rgb[i, 0] = r
+        rgb[i, 1] = g
+        rgb[i, 2] = b
+    return rgb
+
+
+@kernel(parallel=True)
+def rgb_to_xy_bri_array(rgb):
+    """
+    Convert many colors from RGB color space to x,y Brightness.
+
+    Args:
+        rgb: an (N, 3) array of RGB values in [0, 255]
+
+    Returns:
+        a tuple of
+        - an (N, 2) array of x,y values
+        - an (N,) integer array of brightness values
+
+    """
+    xy = np.empty((rgb.shape[0], 2), dtype=np.float64)
+    brightness = np.empty(rgb.shape[0], dtype=np.int64)
+    for i in prange(rgb.shape[0]):
+        (x, y), bri = rgb_to_xy_bri(rgb[i, 0], rgb[i, 1], rgb[i, 2])
+        xy[i, 0] = x
+        xy[i, 1] = y
+        brightness[i] = bri
+    return xy, brightness
+
+
 # explicitly define the outward facing API of this module
 __all__ = [
+    compile_kernels.__name__,
     correct_xyz2rgb_gamma.__name__,
     xy_bri_to_rgb.__name__,
     correct_rgb2xyz_gamma.__name__,
-    rgb_to_xy_bri.__name__
+    linearize_rgb.__name__,
+    rgb_to_xy_bri.__name__,
+    gamut_of.__name__,
+    clamp_xy_to_gamut.__name__,
+    rgb_to_xy_bri_in_gamut.__name__,
+    xy_bri_to_rgb_array.__name__,
+    xy_bri_to_rgb_rows.__name__,
+    rgb_to_xy_bri_array.__name__,
 ]
@@ -0,0 +1,134 @@
+"""A latest-wins queue of commands sent to the bridge in the background."""
+import collections
+import threading
+from .logger import logger
+from .scheduler import INTERACTIVE
+
+
+# the resource types that commands can be sent to, each is paced by the lane
+# of the request scheduler with the same name
+KINDS = ('lights', 'groups')
+
+
+class CommandQueue:
+    """A per-target coalescing queue of light and group commands."""
+
+    def __init__(self, bridge) -> None:
+        """
+        Initialize a new command queue.
+
+        Commands are paced by the request scheduler of the bridge, so the
+        queue never holds a command that its lane isn't ready for.
+
+        Args:
+            bridge: the bridge to send the commands to
+
+        Returns:
+            None
+
+        """
+        self.bridge = bridge
+        # the pending command bodies keyed by (resource type, ID) in the
+        # order that each target first became pending
+        self._pending = collections.OrderedDict()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(pending={len(self)})'
+
+    def __len__(self):
+        with self._condition:
+            return len(self._pending)
+
+    def put(self, kind: str, target_id: int, data: dict) -> None:
+        """
+        Queue a command, replacing pending values of the same attributes.
+
+        Args:
+            kind: the resource type of the target ('lights' or 'groups')
+            target_id: the ID of the light or group to send the command to
+            data: the attributes to set (e.g., {'bri': 100})
+
+        Returns:
+            None
+
+        """
+        if kind not in KINDS:
+            raise ValueError(f'kind must be one of {set(KINDS)}, got {repr(kind)}')
+        with self._condition:
+            self._pending.setdefault((kind, target_id), dict()).update(data)
+            self._condition.notify()
+        self.start()
+
+    def put_light(self, light_id: int, data: dict) -> None:
+        """Queue a command for a light, see `put`."""
+        self.put('lights', light_id, data)
+
+    def put_group(self, group_id: int, data: dict) -> None:
+        """Queue a command for a group, see `put`."""
+        self.put('groups', group_id, data)
+
+    def start(self) -> None:
+        """Start the background sender if it is not already running."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='CommandQueue', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background sender after sending the pending commands."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _pop_ready(self) -> tuple:
+        """
+        Wait for a pending command whose scheduler lane has a token.
+
+        Returns:
+            a tuple of (kind, target ID, data) or None if the queue stopped
+            and there is nothing left to send
+
+        """
+        with self._condition:
+            while True:
+                if not self._pending and not self._running:
+                    return None
+                wait = None
+                for (kind, target_id) in self._pending:
+                    delay = self.bridge.scheduler.delay(kind)
+                    if delay <= 0:
+                        # the send takes the token, until then other commands
+                        # keep coalescing in the queue
+                        data = self._pending.pop((kind, target_id))
+                        return kind, target_id, data
+                    wait = delay if wait is None else min(wait, delay)
+                self._condition.wait(wait)
+
+    def _run(self) -> None:
+        """Send pending commands until the queue is stopped."""
+        # the queued commands come from users, let them preempt background work
+        with self.bridge.scheduler.priority(INTERACTIVE):
+            while True:
+                command = self._pop_ready()
+                if command is None:
+                    return
+                kind, target_id, data = command
+                try:
+                    if kind == 'lights':
+                        self.bridge.set_light(target_id, data)
+                    else:
+                        self.bridge.set_group(target_id, data)
+                except Exception:  # keep the sender alive for later commands
+                    logger.exception('Failed to send %s to %s %s', data, kind, target_id)
+
+
+# explicitly define the outward facing API of this module
+__all__ = [CommandQueue.__name__]
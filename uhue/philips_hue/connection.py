@@ -0,0 +1,188 @@
+"""A pool of persistent HTTP connections to the Hue bridge."""
+import collections
+import select
+import threading
+import time
+from http.client import HTTPConnection, HTTPException
+from .logger import logger
+
+
+# errors that indicate a kept-alive socket was closed by the bridge
+STALE_CONNECTION_ERRORS = (
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    HTTPException,
+)
+# the methods that are safe to send again when a kept-alive socket fails
+# mid-request. Others may have reached the bridge before the socket failed
+RETRYABLE_METHODS = {'GET', 'HEAD'}
+
+
+class ConnectFailed(ConnectionError):
+    """An error opening a connection, the request was never sent."""
+
+
+class ConnectionPool:
+    """A thread-safe pool of HTTP/1.1 keep-alive connections to one host."""
+
+    def __init__(self,
+        host: str,
+        size: int = 4,
+        idle_timeout: float = 30.0
+    ) -> None:
+        """
+        Initialize a new connection pool.
+
+        Args:
+            host: the host name or IP address to connect to
+            size: the maximum number of open connections to the host
+            idle_timeout: the number of seconds an unused connection may sit
+                in the pool before it is considered stale and closed
+
+        Returns:
+            None
+
+        """
+        if size < 1:
+            raise ValueError(f'size must be at least 1, got {size}')
+        self.host = host
+        self.size = size
+        self.idle_timeout = idle_timeout
+        # the idle connections as (connection, time of last use) pairs
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+        # bound the number of connections that are open at the same time
+        self._slots = threading.BoundedSemaphore(size)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(host={self.host!r}, size={self.size}, idle_timeout={self.idle_timeout})'
+
+    def _acquire(self) -> tuple:
+        """
+        Return a connection from the pool, creating a new one if needed.
+
+        Returns:
+            a tuple of (connection, whether the connection was reused)
+
+        """
+        self._slots.acquire()
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                connection, last_used = self._idle.pop()
+                if now - last_used < self.idle_timeout and not self._closed_by_peer(connection):
+                    return connection, True
+                # the bridge has likely dropped this socket already
+                connection.close()
+        return HTTPConnection(self.host), False
+
+    @staticmethod
+    def _closed_by_peer(connection: HTTPConnection) -> bool:
+        """Return True if the host closed an idle connection (its socket is readable)."""
+        if connection.sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([connection.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        # an idle keep-alive socket only becomes readable at EOF (or with
+        # data that no request asked for), either way it can't be used
+        return bool(readable)
+
+    def _release(self, connection: HTTPConnection, reusable: bool) -> None:
+        """
+        Return a connection to the pool.
+
+        Args:
+            connection: the connection to return to the pool
+            reusable: whether the connection can serve another request
+
+        Returns:
+            None
+
+        """
+        if reusable:
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        else:
+            connection.close()
+        self._slots.release()
+
+    def request(self,
+        method: str,
+        endpoint: str,
+        body: str = None,
+        timeout: float = 10,
+        connect_timeout: float = None
+    ) -> bytes:
+        """
+        Send a request over a pooled connection and return the response.
+
+        Idle connections the host already closed are replaced before the
+        request is sent. If a reused connection fails mid-request anyway,
+        only GET and HEAD requests are sent again on a new connection, since
+        other requests may have been applied before the socket failed.
+
+        Args:
+            method: the HTTP method to use (e.g., GET)
+            endpoint: the path to send the request to
+            body: the optional encoded body of the request
+            timeout: the socket timeout for sending the request and reading
+                the response
+            connect_timeout: the timeout for opening a new connection, or
+                None to use timeout
+
+        Returns:
+            the raw body of the response
+
+        Raises:
+            ConnectFailed: if a connection couldn't be opened, in which case
+                the request was never sent
+
+        """
+        timeouts = (timeout if connect_timeout is None else connect_timeout, timeout)
+        connection, reused = self._acquire()
+        reusable = False
+        try:
+            try:
+                response = self._exchange(connection, method, endpoint, body, timeouts)
+            except STALE_CONNECTION_ERRORS:
+                if not reused or method not in RETRYABLE_METHODS:
+                    raise
+                # the kept-alive socket went stale, reconnect and try again
+                logger.debug('Reconnecting stale connection to %s', self.host)
+                connection.close()
+                response = self._exchange(connection, method, endpoint, body, timeouts)
+            data = response.read()
+            reusable = not response.will_close
+            return data
+        finally:
+            self._release(connection, reusable)
+
+    @staticmethod
+    def _exchange(connection: HTTPConnection, method: str, endpoint: str, body: str, timeouts: tuple):
+        """Send a request on a connection and return the response object."""
+        connect_timeout, timeout = timeouts
+        if connection.sock is None:
+            connection.timeout = connect_timeout
+            try:
+                connection.connect()
+            except OSError as error:
+                raise ConnectFailed(f'Could not connect to {connection.host}:{connection.port}: {error}') from error
+        connection.sock.settimeout(timeout)
+        headers = {'Connection': 'keep-alive'}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        connection.request(method, endpoint, body, headers)
+        return connection.getresponse()
+
+    def close(self) -> None:
+        """Close all the idle connections in the pool."""
+        with self._lock:
+            while self._idle:
+                self._idle.pop()[0].close()
+
+
+# explicitly define the outward facing API of this module
+__all__ = [ConnectionPool.__name__]
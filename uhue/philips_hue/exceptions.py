@@ -14,5 +14,9 @@ class PhueRegistrationException(PhueException):
     """An error for failing to register."""
 
 
-class PhueRequestTimeout(PhueException):
+class PhueBridgeUnavailable(PhueException):
+    """An error for a bridge that can't be reached (e.g., while it reboots)."""
+
+
+class PhueRequestTimeout(PhueBridgeUnavailable):
     """An error for a network timeout."""
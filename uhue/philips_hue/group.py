@@ -35,13 +35,8 @@ class Group(Light):
         try:
             self.group_id = int(group_id)
         except:
-            name = group_id
-            groups = bridge.get_group()
-            for idnumber, info in groups.items():
-                if info['name'] == name:
-                    self.group_id = int(idnumber)
-                    break
-            else:
+            self.group_id = bridge.get_group_id_by_name(group_id)
+            if self.group_id is False:
                 raise LookupError("Could not find a group by that name.")
 
     # Wrapper functions for get/set through the bridge, adding support for
@@ -50,6 +45,8 @@ class Group(Light):
         return self.bridge.get_group(self.group_id, *args, **kwargs)
 
     def _set(self, *args, **kwargs):
+        if self._buffer(*args):
+            return None
         # let's get basic group functionality working first before adding
         # transition time...
         if self.transitiontime is not None:
@@ -57,10 +54,14 @@ class Group(Light):
             logger.debug("Setting with transitiontime = %f ds = %f s", self.transitiontime, float(self.transitiontime) / 10)
 
             if (args[0] == 'on' and args[1] is False) or (
-                    kwargs.get('on', True) is False):
+                    isinstance(args[0], dict) and args[0].get('on', True) is False):
                 self._reset_bri_after_on = True
         return self.bridge.set_group(self.group_id, *args, **kwargs)
 
+    def refresh(self):
+        '''Fetch the latest state of the groups from the bridge.'''
+        self.bridge.refresh('groups')
+
     @property
     def name(self):
         '''Get or set the name of the light group [string]'''
@@ -72,11 +73,13 @@ class Group(Light):
         self._name = value
         logger.debug("Renaming light group from '%s' to '%s'", old_name, value)
         self._set('name', self._name)
+        self.bridge.group_registry.rename(old_name, value, self)
 
     @property
     def lights(self):
         """ Return a list of all lights in this group"""
-        return [Light(self.bridge, int(l)) for l in self._get('lights')]
+        lights_by_id = self.bridge.lights_by_id
+        return [lights_by_id.get(int(l)) or Light(self.bridge, int(l)) for l in self._get('lights')]
 
     @lights.setter
     def lights(self, value):
@@ -84,6 +87,16 @@ class Group(Light):
         logger.debug("Setting lights in group %d to %s", self.group_id, value)
         self._set('lights', value)
 
+    @property
+    def any_on(self):
+        '''Whether any light in the group is on, from the cached lights [bool]'''
+        return self.bridge.get_group_aggregate(self.group_id)['any_on']
+
+    @property
+    def all_on(self):
+        '''Whether every light in the group is on, from the cached lights [bool]'''
+        return self.bridge.get_group_aggregate(self.group_id)['all_on']
+
 
 # explicitly define the outward facing API of this module
 __all__ = [Group.__name__]
@@ -0,0 +1,118 @@
+"""A two-way index between the names and IDs of bridge resources."""
+import threading
+
+
+class NameIndex:
+    """A two-way index between the names and IDs of one resource collection."""
+
+    def __init__(self, cache, collection: str) -> None:
+        """
+        Initialize a new name index.
+
+        Args:
+            cache: the StateCache holding the collection
+            collection: the name of the collection to index (e.g., 'lights')
+
+        Returns:
+            None
+
+        """
+        self.cache = cache
+        self.collection = collection
+        self._ids_by_name = dict()
+        self._names_by_id = dict()
+        # the cached collection that the index was last built from
+        self._source = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(collection={self.collection!r}, size={len(self._names_by_id)})'
+
+    def _sync(self) -> None:
+        """Rebuild the index if the cache holds a newer copy of the collection."""
+        data = self.cache.peek(self.collection)
+        if data is None and self._source is None:
+            # nothing has been loaded yet, fetch the collection once
+            data = self.cache.get(self.collection)
+        if data is not None and data is not self._source:
+            self.rebuild(data)
+
+    def rebuild(self, data: dict) -> None:
+        """
+        Rebuild the index from a collection.
+
+        Args:
+            data: the collection as a dictionary keyed by resource ID (str)
+
+        Returns:
+            None
+
+        """
+        if not isinstance(data, dict):  # an error response from the bridge
+            return
+        with self._lock:
+            self._source = data
+            self._names_by_id = {str(id_): info['name'] for id_, info in data.items()}
+            self._ids_by_name = {name: id_ for id_, name in self._names_by_id.items()}
+
+    def id_of(self, name: str) -> str:
+        """
+        Return the ID of a resource by name.
+
+        Args:
+            name: the case-sensitive name of the resource
+
+        Returns:
+            the ID of the resource (str) or None if no resource has the name
+
+        """
+        self._sync()
+        with self._lock:
+            id_ = self._ids_by_name.get(name)
+        if id_ is None:
+            # the resource may have been created or renamed by another client
+            self.rebuild(self.cache.refresh(self.collection))
+            with self._lock:
+                id_ = self._ids_by_name.get(name)
+        return id_
+
+    def name_of(self, id_) -> str:
+        """
+        Return the name of a resource by ID.
+
+        Args:
+            id_: the ID of the resource
+
+        Returns:
+            the name of the resource or None if the ID is unknown
+
+        """
+        self._sync()
+        with self._lock:
+            return self._names_by_id.get(str(id_))
+
+    def add(self, id_, name: str) -> None:
+        """Add a resource to the index (i.e., after creating it)."""
+        with self._lock:
+            self._names_by_id[str(id_)] = name
+            self._ids_by_name[name] = str(id_)
+
+    def rename(self, id_, name: str) -> None:
+        """Update the name of a resource in the index."""
+        with self._lock:
+            old_name = self._names_by_id.get(str(id_))
+            if self._ids_by_name.get(old_name) == str(id_):
+                del self._ids_by_name[old_name]
+            self._names_by_id[str(id_)] = name
+            self._ids_by_name[name] = str(id_)
+
+    def remove(self, id_) -> None:
+        """Remove a resource from the index (i.e., after deleting it)."""
+        with self._lock:
+            name = self._names_by_id.pop(str(id_), None)
+            if self._ids_by_name.get(name) == str(id_):
+                del self._ids_by_name[name]
+
+
+# explicitly define the outward facing API of this module
+__all__ = [NameIndex.__name__]
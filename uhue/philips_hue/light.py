@@ -1,6 +1,8 @@
 """A Hue light object."""
+import contextlib
+import threading
 from .logger import logger
-from .colors import xy_bri_to_rgb, rgb_to_xy_bri
+from .colors import gamut_of, xy_bri_to_rgb, rgb_to_xy_bri, rgb_to_xy_bri_in_gamut
 
 
 class Light:
@@ -33,6 +35,10 @@ class Light:
         self._capabilities = None
         self._config = None
         self._state = None
+        # the pending attribute writes of the batch each thread has open.
+        # Light objects are shared between threads, writes from threads
+        # without an open batch are sent directly
+        self._batches = threading.local()
 
     def __repr__(self):
         # like default python repr function, but add light name
@@ -44,15 +50,62 @@ class Light:
         return self.bridge.get_light(self.light_id, *args, **kwargs)
 
     def _set(self, *args, **kwargs):
+        if self._buffer(*args):
+            return None
         if self.transitiontime is not None:
             kwargs['transitiontime'] = self.transitiontime
             logger.debug("Setting with transitiontime = %f ds = %f s", self.transitiontime, float(self.transitiontime) / 10)
 
             if (args[0] == 'on' and args[1] is False) or (
-                    kwargs.get('on', True) is False):
+                    isinstance(args[0], dict) and args[0].get('on', True) is False):
                 self._reset_bri_after_on = True
         return self.bridge.set_light(self.light_id, *args, **kwargs)
 
+    def _buffer(self, parameter, value=None):
+        '''Add a write to the open batch, return True if it was buffered.'''
+        # names (and group members) are not part of the state, send directly
+        batch = getattr(self._batches, 'data', None)
+        if batch is None or parameter in {'name', 'lights'}:
+            return False
+        batch.update(parameter if isinstance(parameter, dict) else {parameter: value})
+        return True
+
+    def update(self, **attributes):
+        '''Set several state attributes in one request.
+
+        Example: light.update(on=True, bri=200, xy=[0.3, 0.3])
+        '''
+        return self._set(attributes)
+
+    @contextlib.contextmanager
+    def batch(self):
+        '''Merge the attribute writes made in a with block into one request.
+
+        Only writes made by the thread that opened the batch are merged.
+
+        Example:
+            >>> with light.batch():
+            ...     light.on = True
+            ...     light.brightness = 200
+            ...     light.colortemp = 300
+        '''
+        if getattr(self._batches, 'data', None) is not None:  # already batching, join the outer batch
+            yield self
+            return
+        self._batches.data = dict()
+        try:
+            yield self
+        except BaseException:
+            self._batches.data = None
+            raise
+        data, self._batches.data = self._batches.data, None
+        if data:
+            self._set(data)
+
+    def refresh(self):
+        '''Fetch the latest state of the lights from the bridge.'''
+        self.bridge.refresh('lights')
+
     @property
     def name(self):
         '''Get or set the name of the light [string]'''
@@ -66,8 +119,7 @@ class Light:
 
         logger.debug("Renaming light from '%s' to '%s'", old_name, value)
 
-        self.bridge.lights_by_name[self.name] = self
-        del self.bridge.lights_by_name[old_name]
+        self.bridge.light_registry.rename(old_name, value, self)
 
     @property
     def on(self):
@@ -291,6 +343,12 @@ class Light:
         self._state = self._get('state')
         return self._state
 
+    @property
+    def gamut(self):
+        '''Get the (red, green, blue) x,y corners of the color gamut [array or None]'''
+        data = self._get()
+        return gamut_of(data.get('modelid'), data.get('capabilities'))
+
     @property
     def color(self):
         """Return the color as a hexadecimal value."""
@@ -308,7 +366,12 @@ class Light:
             None
 
         """
-        self.xy, self.brightness = rgb_to_xy_bri(*value)
+        gamut = self.gamut
+        with self.batch():
+            if gamut is None:  # let the bridge clamp the color
+                self.xy, self.brightness = rgb_to_xy_bri(*value)
+            else:
+                self.xy, self.brightness = rgb_to_xy_bri_in_gamut(*value, gamut)
 
     @property
     def color_hex(self):
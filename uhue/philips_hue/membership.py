@@ -0,0 +1,179 @@
+"""A two-way index between groups and their lights, and group aggregates."""
+import threading
+import numpy as np
+from .colors import WHITE_XY, xy_bri_to_rgb_rows
+
+
+def group_aggregates(lights: dict, groups: dict) -> dict:
+    """
+    Return the combined state of every group computed from its lights.
+
+    The brightness and color are averaged over the lights of a group that
+    are on, or over all of its lights when none are on. The color is the
+    mean of the colors the lights are displayed with. All groups are computed
+    at once from a (groups, lights) membership matrix.
+
+    Args:
+        lights: the lights collection as returned by the bridge
+        groups: the groups collection as returned by the bridge
+
+    Returns:
+        a dictionary mapping group IDs (str, including '0' for all lights)
+        to dictionaries with:
+        - 'any_on': whether any light of the group is on
+        - 'all_on': whether every light of the group is on
+        - 'bri': the mean brightness of the group, or None without lights
+        - 'rgb': the mean (r, g, b) display color, or None without lights
+
+    """
+    light_ids = [light_id for light_id, light in lights.items() if isinstance(light, dict) and isinstance(light.get('state'), dict)]
+    columns = {light_id: column for column, light_id in enumerate(light_ids)}
+    states = [lights[light_id]['state'] for light_id in light_ids]
+    on = np.array([bool(state.get('on', False)) for state in states], dtype=bool)
+    bri = np.array([state.get('bri', 254) for state in states], dtype=np.int64)
+    xy = np.array([state.get('xy', WHITE_XY) for state in states], dtype=np.float64).reshape(-1, 2)
+    rgb = xy_bri_to_rgb_rows(xy, bri)
+    # the membership matrix, row 0 is the group of all lights
+    group_ids = ['0'] + [group_id for group_id, group in groups.items() if isinstance(group, dict)]
+    members = np.zeros((len(group_ids), len(light_ids)), dtype=bool)
+    members[0] = True
+    for row, group_id in enumerate(group_ids[1:], 1):
+        members[row, [columns[light_id] for light_id in groups[group_id].get('lights', []) if light_id in columns]] = True
+    lit = members & on
+    size = members.sum(axis=1)
+    lit_size = lit.sum(axis=1)
+    weights = np.where((lit_size > 0)[:, None], lit, members).astype(np.float64)
+    total = np.maximum(weights.sum(axis=1), 1.0)
+    mean_bri = np.rint(weights @ bri / total).astype(np.int64)
+    mean_rgb = np.rint(weights @ rgb / total[:, None]).astype(np.int64)
+    aggregates = dict()
+    for row, group_id in enumerate(group_ids):
+        empty = size[row] == 0
+        aggregates[group_id] = {
+            'any_on': bool(lit_size[row] > 0),
+            'all_on': bool(not empty and lit_size[row] == size[row]),
+            'bri': None if empty else int(mean_bri[row]),
+            'rgb': None if empty else tuple(int(channel) for channel in mean_rgb[row]),
+        }
+    return aggregates
+
+
+class MembershipIndex:
+    """A two-way index between groups and the lights they contain."""
+
+    def __init__(self, cache) -> None:
+        """
+        Initialize a new membership index.
+
+        Args:
+            cache: the StateCache that holds the groups and lights collections
+
+        Returns:
+            None
+
+        """
+        self.cache = cache
+        # the light IDs of each group and the group IDs of each light (str)
+        self._lights_by_group = dict()
+        self._groups_by_light = dict()
+        # the cached groups collection that the index was last built from
+        self._source = None
+        # the (lights, groups) collections the aggregates were computed from
+        # and the aggregates
+        self._aggregates = (None, None, dict())
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(groups={len(self._lights_by_group)}, lights={len(self._groups_by_light)})'
+
+    def _sync(self) -> None:
+        """Rebuild the index if the cache holds a newer copy of the groups."""
+        data = self.cache.peek('groups')
+        if data is None and self._source is None:
+            # nothing has been loaded yet, fetch the collection once
+            data = self.cache.get('groups')
+        if data is not None and data is not self._source:
+            self.rebuild(data)
+
+    def rebuild(self, data: dict) -> None:
+        """
+        Rebuild the index from the groups collection.
+
+        Args:
+            data: the groups collection as a dictionary keyed by ID (str)
+
+        Returns:
+            None
+
+        """
+        if not isinstance(data, dict):  # an error response from the bridge
+            return
+        lights_by_group = {group_id: list(group.get('lights', [])) for group_id, group in data.items()}
+        groups_by_light = dict()
+        for group_id, light_ids in lights_by_group.items():
+            for light_id in light_ids:
+                groups_by_light.setdefault(light_id, []).append(group_id)
+        with self._lock:
+            self._source = data
+            self._lights_by_group = lights_by_group
+            self._groups_by_light = groups_by_light
+
+    def lights_of(self, group_id) -> list:
+        """
+        Return the IDs of the lights in a group.
+
+        Args:
+            group_id: the ID of the group
+
+        Returns:
+            a list of light IDs (str), empty for unknown groups
+
+        """
+        self._sync()
+        with self._lock:
+            return list(self._lights_by_group.get(str(group_id), []))
+
+    def groups_of(self, light_id) -> list:
+        """
+        Return the IDs of the groups that contain a light.
+
+        Args:
+            light_id: the ID of the light
+
+        Returns:
+            a list of group IDs (str), empty if no group contains the light
+
+        """
+        self._sync()
+        with self._lock:
+            return list(self._groups_by_light.get(str(light_id), []))
+
+    def aggregates(self, cached_only: bool = False) -> dict:
+        """
+        Return the combined state of every group from the cached lights.
+
+        Args:
+            cached_only: whether to use the cached lights and groups even if
+                they expired, instead of fetching them from the bridge
+
+        Returns:
+            a dictionary of aggregates keyed by group ID (see
+            group_aggregates), shared with the index and must not be modified
+
+        """
+        read = self.cache.peek if cached_only else self.cache.get
+        lights = read('lights')
+        groups = read('groups')
+        if not isinstance(lights, dict) or not isinstance(groups, dict):
+            return dict()
+        with self._lock:
+            source_lights, source_groups, aggregates = self._aggregates
+        if lights is not source_lights or groups is not source_groups:
+            aggregates = group_aggregates(lights, groups)
+            with self._lock:
+                self._aggregates = (lights, groups, aggregates)
+        return aggregates
+
+
+# explicitly define the outward facing API of this module
+__all__ = [MembershipIndex.__name__, group_aggregates.__name__]
@@ -0,0 +1,215 @@
+"""Optimistic updates of the cached bridge state from commands."""
+from .tracker import COLOR_MODES, STATE_KEYS, is_incremental
+
+
+# the light and group state attributes that are applied to the cache before
+# the bridge confirms them. Others (e.g., 'alert' or 'scene') can't be
+# predicted from the command alone
+PREDICTABLE_KEYS = {'on', 'bri', 'hue', 'sat', 'xy', 'ct', 'effect'}
+
+
+def split_address(address: str) -> tuple:
+    """Return the parts of a response address (e.g., ('lights', '3', 'state', 'bri'))."""
+    return tuple(part for part in address.split('/') if part)
+
+
+class OptimisticUpdate:
+    """Changes applied to the cache ahead of a command and settled by its response."""
+
+    def __init__(self, cache) -> None:
+        """
+        Initialize a new empty optimistic update.
+
+        Args:
+            cache: the StateCache to update
+
+        Returns:
+            None
+
+        """
+        self.cache = cache
+        # the changes that each attribute of the command makes, keyed by the
+        # attribute as lists of (collection, path, expected value)
+        self.changes = dict()
+        # the collections that are invalidated once the command is settled
+        # because its effects can't be predicted
+        self.stale = set()
+        # the values of the changed paths before the update keyed by
+        # (collection, path)
+        self._previous = dict()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(attributes={sorted(self.changes)}, stale={sorted(self.stale)})'
+
+    def expect(self, attribute: str, collection: str, path: tuple, value) -> None:
+        """
+        Record a change that an attribute of the command makes.
+
+        Args:
+            attribute: the attribute of the command (e.g., 'bri')
+            collection: the collection that changes (e.g., 'lights')
+            path: the path of the changed value in the collection (e.g.,
+                ('3', 'state', 'bri'))
+            value: the value expected after the command
+
+        Returns:
+            None
+
+        """
+        self.changes.setdefault(attribute, []).append((collection, path, value))
+
+    def _patch(self, changes: dict) -> dict:
+        """Patch the cache with {(collection, path): value} and return the previous values."""
+        by_collection = dict()
+        for (collection, path), value in changes.items():
+            by_collection.setdefault(collection, dict())[path] = value
+        previous = dict()
+        for collection, paths in by_collection.items():
+            for path, value in self.cache.patch(collection, paths).items():
+                previous[(collection, path)] = value
+        return previous
+
+    def apply(self) -> None:
+        """Apply the expected changes to the cache before sending the command."""
+        changes = dict()
+        for attribute_changes in self.changes.values():
+            for collection, path, value in attribute_changes:
+                changes[(collection, path)] = value
+        self._previous = self._patch(changes)
+
+    def settle(self, response: list) -> None:
+        """
+        Keep the changes the bridge confirmed and roll back those it refused.
+
+        Args:
+            response: the response of the bridge to the command, a list of
+                {'success': {address: value}} and {'error': {...}} items
+
+        Returns:
+            None
+
+        """
+        if not isinstance(response, list):  # not a response to a command
+            return self.abandon()
+        rejected = list()
+        confirmed = dict()
+        for item in response:
+            if 'success' in item:
+                for address, value in item['success'].items():
+                    attribute = (split_address(address) or ('',))[-1]
+                    for collection, path, expected in self.changes.get(attribute, ()):
+                        # derived values (e.g., the color mode) keep their expectation
+                        confirmed[(collection, path)] = value if path[-1] == attribute else expected
+            elif 'error' in item:
+                address = split_address(item['error'].get('address', ''))
+                if address and address[-1] in self.changes:
+                    rejected.append(address[-1])
+                else:  # an error with the whole command (e.g., an unknown resource)
+                    rejected.extend(self.changes)
+        # restore the refused values first so confirmed values shared with
+        # them (e.g., the color mode) win
+        changes = dict()
+        for attribute in rejected:
+            for collection, path, _ in self.changes[attribute]:
+                if (collection, path) in self._previous:
+                    changes[(collection, path)] = self._previous[(collection, path)]
+        # reapply the confirmed values in case a fetch that started before
+        # the command replaced them in the meantime
+        changes.update(confirmed)
+        self._patch(changes)
+        if self.stale:
+            self.cache.invalidate(*sorted(self.stale))
+
+    def abandon(self) -> None:
+        """Invalidate everything the command touched when its outcome is unknown."""
+        collections = self.stale | {collection for attribute_changes in self.changes.values() for collection, _, _ in attribute_changes}
+        if collections:
+            self.cache.invalidate(*sorted(collections))
+
+
+def expect_attributes(cache, collection: str, resource_id, data: dict, section: str = None) -> OptimisticUpdate:
+    """
+    Return the update that setting attributes of a resource makes.
+
+    Args:
+        cache: the StateCache to update
+        collection: the collection of the resource (e.g., 'sensors')
+        resource_id: the ID of the resource
+        data: the attributes to set (e.g., {'name': 'Porch'})
+        section: the nested dictionary that holds the attributes (e.g.,
+            'config'), or None for top-level attributes
+
+    Returns:
+        an OptimisticUpdate with the changes
+
+    """
+    update = OptimisticUpdate(cache)
+    prefix = (str(resource_id),) if section is None else (str(resource_id), section)
+    for key, value in data.items():
+        update.expect(key, collection, prefix + (key,), value)
+    return update
+
+
+def expect_state(cache, kind: str, target_id, data: dict) -> OptimisticUpdate:
+    """
+    Return the update that a state command to a light or group makes.
+
+    Besides the target itself, a group action changes the state of its
+    member lights, and switching lights on or off changes whether the groups
+    they belong to are any / all on.
+
+    Args:
+        cache: the StateCache to update
+        kind: the resource type of the target ('lights' or 'groups')
+        target_id: the ID of the light or group
+        data: the state attributes of the command
+
+    Returns:
+        an OptimisticUpdate with the changes
+
+    """
+    update = OptimisticUpdate(cache)
+    target_id = str(target_id)
+    lights = cache.peek('lights') or {}
+    groups = cache.peek('groups') or {}
+    if kind == 'lights':
+        members = [target_id]
+    elif target_id == '0':  # the group of all lights isn't in the collection
+        members = list(lights)
+    else:
+        members = list(groups.get(target_id, {}).get('lights', []))
+    # the color attribute that decides the color mode of the lights
+    color = next((key for key, _ in COLOR_MODES if key in data), None)
+    for key, value in data.items():
+        if is_incremental(key) or key == 'scene':
+            # the resulting state isn't known until it is fetched again
+            update.stale.add('lights')
+            if kind == 'groups':
+                update.stale.add('groups')
+        if key not in PREDICTABLE_KEYS:
+            continue
+        if kind == 'groups' and target_id != '0':
+            update.expect(key, 'groups', (target_id, STATE_KEYS['groups'], key), value)
+        for light_id in members:
+            update.expect(key, 'lights', (light_id, 'state', key), value)
+    if color is not None:
+        mode = dict(COLOR_MODES)[color]
+        for light_id in members:
+            if 'colormode' in lights.get(light_id, {}).get('state', {}):
+                update.expect(color, 'lights', (light_id, 'state', 'colormode'), mode)
+    if 'on' in data:
+        changed = set(members)
+        for group_id, group in groups.items():
+            group_members = group.get('lights', [])
+            if not changed.intersection(group_members):
+                continue
+            states = [data['on'] if light_id in changed else lights.get(light_id, {}).get('state', {}).get('on', False)
+                for light_id in group_members
+            ]
+            update.expect('on', 'groups', (group_id, 'state', 'any_on'), any(states))
+            update.expect('on', 'groups', (group_id, 'state', 'all_on'), all(states))
+    return update
+
+
+# explicitly define the outward facing API of this module
+__all__ = [OptimisticUpdate.__name__, expect_attributes.__name__, expect_state.__name__]
@@ -0,0 +1,149 @@
+"""A planner that sends identical commands to many lights as group actions."""
+import collections
+import threading
+from .logger import logger
+
+
+# the name prefix of the groups that the planner creates and manages itself
+SCRATCH_PREFIX = 'uhue scratch '
+# the number of unmatched light sets to count usage for before starting over
+MAX_TRACKED_SETS = 256
+
+
+class CommandPlanner:
+    """A planner that maps sets of lights onto groups with the same members."""
+
+    def __init__(self,
+        bridge,
+        min_lights: int = 3,
+        scratch_groups: int = 0,
+        scratch_threshold: int = 3
+    ) -> None:
+        """
+        Initialize a new command planner.
+
+        Args:
+            bridge: the bridge holding the lights and groups
+            min_lights: the smallest number of lights to send as a group
+                action. Group actions share a slower lane (about 1 per second)
+                so a couple of light commands finish just as fast
+            scratch_groups: the number of groups the planner may create on the
+                bridge for light sets that match no existing group, or 0 to
+                only use existing groups
+            scratch_threshold: the number of times an unmatched light set is
+                commanded before a scratch group is set up for it
+
+        Returns:
+            None
+
+        """
+        self.bridge = bridge
+        self.min_lights = min_lights
+        self.scratch_groups = scratch_groups
+        self.scratch_threshold = scratch_threshold
+        # the number of commands sent to each unmatched light set
+        self._usage = collections.Counter()
+        # the IDs of the scratch groups, least recently used first
+        self._scratch = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(min_lights={self.min_lights}, scratch_groups={self.scratch_groups})'
+
+    def _groups(self) -> dict:
+        """Return the groups on the bridge, from the cache when possible."""
+        groups = self.bridge.cache.peek('groups')
+        if groups is None:
+            groups = self.bridge.cache.get('groups')
+        return groups if isinstance(groups, dict) else {}
+
+    def _lights(self) -> dict:
+        """Return the lights on the bridge, from the cache when possible."""
+        lights = self.bridge.cache.peek('lights')
+        if lights is None:
+            lights = self.bridge.cache.get('lights')
+        return lights if isinstance(lights, dict) else {}
+
+    def group_for(self, light_ids: list) -> int:
+        """
+        Return the ID of a group whose members are exactly a set of lights.
+
+        Args:
+            light_ids: the IDs of the lights
+
+        Returns:
+            the ID of the group (0 for all lights), or None if no group has
+            the same members (or the set is too small to be worth a group)
+
+        """
+        lights = frozenset(str(light_id) for light_id in light_ids)
+        if len(lights) < max(2, self.min_lights):
+            return None
+        if lights == frozenset(self._lights()):
+            return 0
+        for group_id, group in self._groups().items():
+            if frozenset(group.get('lights', ())) == lights:
+                self._touch(group_id)
+                return int(group_id)
+        return self._scratch_group_for(lights)
+
+    def _touch(self, group_id: str) -> None:
+        """Mark a scratch group as the most recently used."""
+        with self._lock:
+            if self._scratch is not None and group_id in self._scratch:
+                self._scratch.move_to_end(group_id)
+
+    def _scratch_group_for(self, lights: frozenset) -> int:
+        """
+        Set up a scratch group for a light set once it is used frequently.
+
+        Args:
+            lights: the IDs (str) of the lights
+
+        Returns:
+            the ID of the scratch group, or None to send light commands
+
+        """
+        if not self.scratch_groups:
+            return None
+        with self._lock:
+            if lights not in self._usage and len(self._usage) >= MAX_TRACKED_SETS:
+                self._usage.clear()
+            self._usage[lights] += 1
+            if self._usage[lights] < self.scratch_threshold:
+                return None
+            del self._usage[lights]
+            if self._scratch is None:  # adopt scratch groups of earlier runs
+                self._scratch = collections.OrderedDict((group_id, None)
+                    for group_id, group in self._groups().items()
+                    if group.get('name', '').startswith(SCRATCH_PREFIX)
+                )
+            if len(self._scratch) < self.scratch_groups:
+                group_id = None
+            else:  # repurpose the least recently used scratch group
+                group_id, _ = self._scratch.popitem(last=False)
+        members = sorted(lights, key=int)
+        if group_id is None:
+            names = {group.get('name') for group in self._groups().values()}
+            number = 1
+            while f'{SCRATCH_PREFIX}{number}' in names:
+                number += 1
+            name = f'{SCRATCH_PREFIX}{number}'
+            result = self.bridge.create_group(name, members)
+            if 'success' not in result[0]:
+                logger.warning('Failed to create scratch group %s: %s', name, result)
+                return None
+            group_id = str(result[0]['success']['id'])
+        else:
+            result = self.bridge.set_group(int(group_id), 'lights', members)
+            if not result or 'success' not in result[0][0]:
+                logger.warning('Failed to repurpose scratch group %s: %s', group_id, result)
+                return None
+        logger.debug('Using scratch group %s for lights %s', group_id, members)
+        with self._lock:
+            self._scratch[group_id] = None
+        return int(group_id)
+
+
+# explicitly define the outward facing API of this module
+__all__ = [CommandPlanner.__name__]
@@ -0,0 +1,313 @@
+"""A service that polls the bridge adaptively and reports changes."""
+import itertools
+import threading
+import time
+from typing import TYPE_CHECKING
+from .cache import digest
+from .logger import logger
+from .scheduler import BACKGROUND
+if TYPE_CHECKING:
+    from typing import Callable
+
+
+# the (fastest, slowest) polling intervals in seconds for each collection
+DEFAULT_INTERVALS = {
+    'lights': (0.5, 10.0),
+    'groups': (1.0, 10.0),
+    'sensors': (0.5, 5.0),
+}
+# the factor that the interval of a collection grows by after a quiet poll
+BACKOFF = 1.5
+# the nested dictionaries of a resource whose keys are attributes themselves
+NESTED = {'state', 'action', 'config'}
+
+
+def flatten(resource: dict) -> dict:
+    """
+    Return the attributes of a resource with nested states as dotted keys.
+
+    Args:
+        resource: a resource from the bridge (e.g., a light)
+
+    Returns:
+        a dictionary of attributes (e.g., {'name': ..., 'state.on': ...})
+
+    """
+    attributes = dict()
+    for key, value in resource.items():
+        if key in NESTED and isinstance(value, dict):
+            for nested_key, nested_value in value.items():
+                attributes[f'{key}.{nested_key}'] = nested_value
+        else:
+            attributes[key] = value
+    return attributes
+
+
+class PollSchedule:
+    """The polling interval and last known contents of one collection."""
+
+    def __init__(self, min_interval: float, max_interval: float) -> None:
+        """
+        Initialize a new poll schedule.
+
+        Args:
+            min_interval: the interval after recent activity
+            max_interval: the interval that quiet polls back off to
+
+        Returns:
+            None
+
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.due = 0.0
+        # the hash of the whole collection and of each resource
+        self.digest = None
+        self.digests = dict()
+        # the flattened attributes of each resource
+        self.attributes = dict()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(interval={self.interval:.2f}, range=({self.min_interval}, {self.max_interval}))'
+
+    def tighten(self, now: float) -> None:
+        """Poll quickly again after activity on the collection."""
+        self.interval = self.min_interval
+        self.due = min(self.due, now + self.min_interval)
+
+    def relax(self) -> None:
+        """Poll less often after a poll that found nothing new."""
+        self.interval = min(self.max_interval, self.interval * BACKOFF)
+
+    def update(self, data: dict) -> dict:
+        """
+        Store new contents of the collection and return what changed.
+
+        Args:
+            data: the collection as returned by the bridge
+
+        Returns:
+            a dictionary mapping resource IDs to the changed attributes and
+            their new values (None for attributes that were removed), or
+            None if this is the first time the collection was seen
+
+        """
+        first = self.digest is None
+        new_digest = digest(data)
+        if new_digest == self.digest:
+            return {}
+        self.digest = new_digest
+        changes = dict()
+        for resource_id, resource in data.items():
+            resource_digest = digest(resource)
+            if self.digests.get(resource_id) == resource_digest:
+                continue
+            self.digests[resource_id] = resource_digest
+            old = self.attributes.get(resource_id, {})
+            new = flatten(resource) if isinstance(resource, dict) else {}
+            self.attributes[resource_id] = new
+            changed = {key: value for key, value in new.items() if key not in old or old[key] != value}
+            changed.update({key: None for key in old if key not in new})
+            if changed:
+                changes[resource_id] = changed
+        # resources that were deleted from the bridge
+        for resource_id in [resource_id for resource_id in self.digests if resource_id not in data]:
+            del self.digests[resource_id]
+            del self.attributes[resource_id]
+            changes[resource_id] = None
+        return None if first else changes
+
+
+class PollingService:
+    """A background poller of the collections that subscribers care about."""
+
+    def __init__(self, bridge, intervals: dict = None) -> None:
+        """
+        Initialize a new polling service.
+
+        Args:
+            bridge: the bridge to poll
+            intervals: a dictionary mapping collection names to (fastest,
+                slowest) intervals in seconds, defaults to DEFAULT_INTERVALS
+
+        Returns:
+            None
+
+        """
+        self.bridge = bridge
+        self.intervals = dict(DEFAULT_INTERVALS, **(intervals or {}))
+        self._schedules = {collection: PollSchedule(*interval) for collection, interval in self.intervals.items()}
+        # the subscriptions keyed by handle as (collection, resource ID,
+        # attributes, callback) tuples
+        self._subscriptions = dict()
+        self._handles = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        # commands patch or invalidate the collections they change, poll
+        # those soon
+        bridge.cache.subscribe(self._on_cache_event)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(schedules={self._schedules})'
+
+    def subscribe(self,
+        callback: 'Callable[[str, dict], None]',
+        collection: str,
+        resource_id=None,
+        attributes: list = None
+    ) -> int:
+        """
+        Call a function when resources in a collection change.
+
+        Args:
+            callback: a callable of (collection name, changes) where changes
+                maps resource IDs (str) to dictionaries of changed attributes
+                (e.g., {'state.on': False}), or to None for deleted resources.
+                It is called from the polling thread, once per poll
+            collection: the collection to watch ('lights', 'groups', or
+                'sensors')
+            resource_id: the ID of the resource to watch, or None for all
+            attributes: the attributes to watch (e.g., ['state.on', 'name']),
+                or None for all
+
+        Returns:
+            a handle to unsubscribe with
+
+        """
+        if collection not in self._schedules:
+            raise ValueError(f'collection must be one of {set(self._schedules)}, got {repr(collection)}')
+        resource_id = None if resource_id is None else str(resource_id)
+        attributes = None if attributes is None else frozenset(attributes)
+        with self._condition:
+            handle = next(self._handles)
+            self._subscriptions[handle] = (collection, resource_id, attributes, callback)
+            self._schedules[collection].tighten(time.monotonic())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='PollingService', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return handle
+
+    def unsubscribe(self, handle: int) -> None:
+        """
+        Stop calling a subscribed function, polling stops with the last one.
+
+        Args:
+            handle: the handle returned by subscribe
+
+        Returns:
+            None
+
+        """
+        with self._condition:
+            self._subscriptions.pop(handle, None)
+            self._condition.notify()
+
+    def poke(self, *collections: str) -> None:
+        """
+        Poll collections at their fastest rate after outside activity.
+
+        Args:
+            collections: the names of the collections, all if none are given
+
+        Returns:
+            None
+
+        """
+        now = time.monotonic()
+        with self._condition:
+            for collection in collections or self._schedules:
+                if collection in self._schedules:
+                    self._schedules[collection].tighten(now)
+            self._condition.notify()
+
+    def _on_cache_event(self, collection: str, data: dict) -> None:
+        """Tighten the schedule of collections that changed in the cache."""
+        schedule = self._schedules.get(collection)
+        if schedule is None:
+            return
+        # the cache holds something the poller hasn't seen (e.g., the
+        # optimistic state of a command), confirm it with the bridge soon
+        if data is None or digest(data) != schedule.digest:
+            self.poke(collection)
+
+    def poll(self, collection: str) -> dict:
+        """
+        Fetch a collection now and notify subscribers of changes.
+
+        Args:
+            collection: the name of the collection
+
+        Returns:
+            the changes in the collection (see subscribe)
+
+        """
+        data = self.bridge.cache.refresh(collection)
+        with self._condition:
+            schedule = self._schedules[collection]
+            if not isinstance(data, dict):  # an error from the bridge, try later
+                changes = {}
+            else:
+                changes = schedule.update(data)
+            if changes:
+                schedule.tighten(time.monotonic())
+            elif changes is not None:
+                schedule.relax()
+            schedule.due = time.monotonic() + schedule.interval
+            subscriptions = [subscription for subscription in self._subscriptions.values() if subscription[0] == collection]
+        for _, resource_id, attributes, callback in subscriptions if changes else []:
+            selected = dict()
+            for changed_id, changed in changes.items():
+                if resource_id is not None and changed_id != resource_id:
+                    continue
+                if changed is not None and attributes is not None:
+                    changed = {key: value for key, value in changed.items() if key in attributes}
+                    if not changed:
+                        continue
+                selected[changed_id] = changed
+            if selected:
+                try:
+                    callback(collection, selected)
+                except Exception:  # one broken subscriber shouldn't stop the rest
+                    logger.exception('Polling subscriber %s failed', callback)
+        return changes or {}
+
+    def _next_due(self) -> tuple:
+        """Return the (collection, due time) that should be polled next."""
+        watched = {subscription[0] for subscription in self._subscriptions.values()}
+        if not watched:
+            return None, None
+        collection = min(watched, key=lambda x: self._schedules[x].due)
+        return collection, self._schedules[collection].due
+
+    def _run(self) -> None:
+        """Poll the watched collections until there are no subscribers."""
+        with self.bridge.scheduler.priority(BACKGROUND):
+            while True:
+                with self._condition:
+                    while True:
+                        collection, due = self._next_due()
+                        if collection is None:
+                            self._thread = None
+                            return
+                        delay = due - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                try:
+                    self.poll(collection)
+                except Exception:  # keep polling through bridge hiccups
+                    logger.exception('Failed to poll %s', collection)
+                    with self._condition:
+                        schedule = self._schedules[collection]
+                        schedule.due = time.monotonic() + schedule.max_interval
+
+    def statistics(self) -> dict:
+        """Return the current polling interval of each collection."""
+        with self._condition:
+            return {collection: schedule.interval for collection, schedule in self._schedules.items()}
+
+
+# explicitly define the outward facing API of this module
+__all__ = [PollingService.__name__]
@@ -0,0 +1,124 @@
+"""A thread-safe registry of the light, group, and sensor objects."""
+import threading
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Callable
+
+
+class ObjectRegistry:
+    """A registry of resource objects by ID and by name for one collection."""
+
+    def __init__(self, collection: str) -> None:
+        """
+        Initialize a new empty object registry.
+
+        Args:
+            collection: the name of the collection (e.g., 'lights')
+
+        Returns:
+            None
+
+        """
+        self.collection = collection
+        # the objects keyed by ID (int) and by name (str). Changes replace
+        # the dictionaries instead of mutating them, so a reader can use the
+        # dictionary it got without a lock while other threads change it
+        self.by_id = dict()
+        self.by_name = dict()
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(collection={self.collection!r}, size={len(self.by_id)})'
+
+    def load(self, fetch: 'Callable[[], dict]', factory: 'Callable[[int], object]') -> None:
+        """
+        Populate the registry once, other threads wait for the first load.
+
+        Only the lock of this registry is held while fetching, so loading one
+        collection never blocks the others.
+
+        Args:
+            fetch: a callable that returns the collection from the bridge
+            factory: a callable that creates the object for a resource ID
+
+        Returns:
+            None
+
+        """
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:  # another thread loaded it while this one waited
+                return
+            data = fetch()
+            if not isinstance(data, dict):  # an error from the bridge, try again later
+                return
+            by_id = dict(self.by_id)
+            by_name = dict(self.by_name)
+            for resource_id, resource in data.items():
+                by_id.setdefault(int(resource_id), factory(int(resource_id)))
+                by_name[resource['name']] = by_id[int(resource_id)]
+            self.by_id, self.by_name = by_id, by_name
+            self.loaded = True
+
+    def add(self, resource_id: int, name: str, obj) -> None:
+        """
+        Register a new object.
+
+        Args:
+            resource_id: the ID of the resource
+            name: the name of the resource
+            obj: the object that represents the resource
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            by_id = dict(self.by_id)
+            by_name = dict(self.by_name)
+            by_id[int(resource_id)] = obj
+            by_name[name] = obj
+            self.by_id, self.by_name = by_id, by_name
+
+    def rename(self, old_name: str, new_name: str, obj) -> None:
+        """
+        Move an object from its old name to a new one.
+
+        Args:
+            old_name: the name the resource had
+            new_name: the name the resource has now
+            obj: the object to register if the old name isn't registered
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            by_name = dict(self.by_name)
+            by_name[new_name] = by_name.pop(old_name, obj)
+            self.by_name = by_name
+
+    def remove(self, resource_id: int) -> None:
+        """
+        Unregister the object of a resource.
+
+        Args:
+            resource_id: the ID of the resource
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            by_id = dict(self.by_id)
+            obj = by_id.pop(int(resource_id), None)
+            if obj is None:
+                return
+            self.by_id = by_id
+            self.by_name = {name: other for name, other in self.by_name.items() if other is not obj}
+
+
+# explicitly define the outward facing API of this module
+__all__ = [ObjectRegistry.__name__]
@@ -7,7 +7,7 @@ class Scene:
     def __init__(self, sid, appdata=None, lastupdated=None,
                  lights=None, locked=False, name="", owner="",
                  picture="", recycle=False, version=0, type="", group="",
-                 *args, **kwargs):
+                 lightstates=None, *args, **kwargs):
         self.scene_id = sid
         self.appdata = appdata or {}
         self.lastupdated = lastupdated
@@ -23,6 +23,9 @@ class Scene:
         self.version = version
         self.type = type
         self.group = group
+        # the state of each light in the scene keyed by light ID (str), only
+        # reported by the bridge when a single scene is requested
+        self.lightstates = lightstates
 
     def __repr__(self):
         # like default python repr function, but add scene name
@@ -0,0 +1,122 @@
+"""A registry of the scenes on the bridge indexed by name and group."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .logger import logger
+from .scene import Scene
+
+
+class SceneRegistry:
+    """The scenes on the bridge, kept in sync with the cached scenes collection."""
+
+    def __init__(self, bridge) -> None:
+        """
+        Initialize a new empty scene registry.
+
+        Args:
+            bridge: the bridge that the scenes are on
+
+        Returns:
+            None
+
+        """
+        self.bridge = bridge
+        # the scenes keyed by ID, and lists of scenes keyed by name and by
+        # group ID (str, '' for scenes without a group). Updates replace the
+        # dictionaries instead of mutating them
+        self.by_id = dict()
+        self.by_name = dict()
+        self.by_group = dict()
+        # the cached scenes collection the registry was last built from
+        self._source = None
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(scenes={len(self.by_id)})'
+
+    def sync(self, refresh: bool = False) -> None:
+        """
+        Update the registry from the cached scenes collection.
+
+        Only scenes whose 'lastupdated' or 'version' changed are replaced, so
+        the light states of unchanged scenes stay loaded.
+
+        Args:
+            refresh: whether to fetch the collection even if the cached copy
+                hasn't expired. Otherwise it is only fetched once it expired
+
+        Returns:
+            None
+
+        """
+        cache = self.bridge.cache
+        data = cache.refresh('scenes') if refresh else cache.get('scenes')
+        if not isinstance(data, dict) or data is self._source:
+            return
+        with self._lock:
+            if data is self._source:  # another thread updated it meanwhile
+                return
+            by_id = dict()
+            for scene_id, info in data.items():
+                scene = self.by_id.get(scene_id)
+                if scene is None or (scene.lastupdated, scene.version) != (info.get('lastupdated'), info.get('version')):
+                    scene = Scene(scene_id, **info)
+                by_id[scene_id] = scene
+            by_name = dict()
+            by_group = dict()
+            for scene in by_id.values():
+                by_name.setdefault(scene.name, []).append(scene)
+                by_group.setdefault(str(scene.group), []).append(scene)
+            self.by_id, self.by_name, self.by_group = by_id, by_name, by_group
+            self._source = data
+
+    def scenes(self) -> list:
+        """Return every scene as a list of Scene objects."""
+        self.sync()
+        return list(self.by_id.values())
+
+    def named(self, name: str) -> list:
+        """Return the scenes with a name (case-sensitive)."""
+        self.sync()
+        scenes = self.by_name.get(name)
+        if not scenes:
+            # the scene may have been created or renamed by another client
+            self.sync(refresh=True)
+            scenes = self.by_name.get(name)
+        return list(scenes or [])
+
+    def of_group(self, group_id) -> list:
+        """Return the scenes of a group (i.e., group scenes stored for it)."""
+        self.sync()
+        return list(self.by_group.get(str(group_id), []))
+
+    def load_lightstates(self, scenes: list) -> None:
+        """
+        Fetch the light states of scenes that don't have them yet.
+
+        The bridge only reports light states for one scene at a time, so the
+        missing scenes are fetched concurrently over the connection pool.
+
+        Args:
+            scenes: the Scene objects to load the light states of
+
+        Returns:
+            None
+
+        """
+        missing = [scene for scene in scenes if scene.lightstates is None]
+        if not missing:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.bridge.pool_size, thread_name_prefix='SceneRegistry')
+        responses = self.bridge._map_concurrently(self._executor, lambda scene: self.bridge.get_scene(scene.scene_id), missing)
+        for scene, data in zip(missing, responses):
+            if isinstance(data, dict) and isinstance(data.get('lightstates'), dict):
+                scene.lightstates = data['lightstates']
+            else:
+                logger.debug('Unable to read the light states of scene %s: %r', scene.scene_id, data)
+
+
+# explicitly define the outward facing API of this module
+__all__ = [SceneRegistry.__name__]
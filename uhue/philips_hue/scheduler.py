@@ -0,0 +1,264 @@
+"""A rate limiter that paces requests to the bridge by type and priority."""
+import contextlib
+import heapq
+import itertools
+import re
+import threading
+import time
+
+
+# priority levels for requests, lower values are served first
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+
+
+# the default (rate per second, burst size) of each lane of requests
+DEFAULT_RATE_LIMITS = {
+    'lights': (10.0, 10),
+    'groups': (1.0, 1),
+    'reads': (20.0, 20),
+}
+
+
+# patterns that map endpoints to lanes of requests
+LIGHT_STATE = re.compile(r'^/api/[^/]+/lights/[^/]+/state/?$')
+GROUP_ACTION = re.compile(r'^/api/[^/]+/groups/[^/]+/action/?$')
+
+
+class TokenBucket:
+    """A token bucket that refills at a fixed rate up to a burst size."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        """
+        Initialize a new token bucket.
+
+        Args:
+            rate: the number of tokens added per second
+            capacity: the most tokens the bucket can hold (the burst size)
+
+        Returns:
+            None
+
+        """
+        if rate <= 0:
+            raise ValueError(f'rate must be positive, got {rate}')
+        if capacity < 1:
+            raise ValueError(f'capacity must be at least 1, got {capacity}')
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        # buckets are shared by threads and event loops
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(rate={self.rate}, capacity={self.capacity})'
+
+    def _refill(self, now: float) -> float:
+        """Add the tokens since the last update and return the seconds until a token is available."""
+        # callers may read the time before another one updated the bucket
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        return (1 - self.tokens) / self.rate
+
+    def delay(self, now: float) -> float:
+        """Return the seconds until a token is available (<= 0 if ready)."""
+        with self._lock:
+            return self._refill(now)
+
+    def take(self) -> None:
+        """Remove a token from the bucket."""
+        with self._lock:
+            self.tokens -= 1
+
+    def try_take(self, now: float) -> float:
+        """
+        Remove a token from the bucket if one is available.
+
+        Args:
+            now: the current time.monotonic()
+
+        Returns:
+            0.0 if a token was taken, otherwise the seconds until one is
+            available
+
+        """
+        with self._lock:
+            delay = self._refill(now)
+            if delay > 0:
+                return delay
+            self.tokens -= 1
+            return 0.0
+
+
+class LaneStatistics:
+    """Queue-depth and wait-time statistics for one lane of requests."""
+
+    def __init__(self) -> None:
+        """Initialize new empty statistics."""
+        self.depth = 0
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def as_dict(self) -> dict:
+        """Return the statistics as a dictionary."""
+        return {
+            'depth': self.depth,
+            'requests': self.requests,
+            'mean_wait': self.total_wait / self.requests if self.requests else 0.0,
+            'max_wait': self.max_wait,
+        }
+
+
+class RequestScheduler:
+    """Paces light, group, and read requests with priority lanes."""
+
+    def __init__(self, rate_limits: dict = None) -> None:
+        """
+        Initialize a new request scheduler.
+
+        Args:
+            rate_limits: a dictionary mapping lanes ('lights', 'groups',
+                'reads') to (rate per second, burst size) tuples. A value of
+                None disables pacing for the lane. Defaults to
+                DEFAULT_RATE_LIMITS
+
+        Returns:
+            None
+
+        """
+        rate_limits = dict(DEFAULT_RATE_LIMITS, **(rate_limits or {}))
+        self.buckets = {lane: TokenBucket(*limit) for lane, limit in rate_limits.items() if limit is not None}
+        self._statistics = {lane: LaneStatistics() for lane in self.buckets}
+        # the waiting requests of each lane as a heap of (priority, ticket)
+        self._waiting = {lane: [] for lane in self.buckets}
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+        self._thread_state = threading.local()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(buckets={self.buckets})'
+
+    @staticmethod
+    def classify(mode: str, endpoint: str) -> str:
+        """
+        Return the lane of a request.
+
+        Args:
+            mode: the HTTP mode of the request (e.g., GET)
+            endpoint: the address of the request
+
+        Returns:
+            the name of the lane ('lights', 'groups', 'reads') or None if
+            the request is not paced
+
+        """
+        if mode == 'GET':
+            return 'reads'
+        if mode == 'PUT' and LIGHT_STATE.match(endpoint):
+            return 'lights'
+        if mode == 'PUT' and GROUP_ACTION.match(endpoint):
+            return 'groups'
+        return None
+
+    @property
+    def current_priority(self) -> int:
+        """Return the priority of requests sent by the calling thread."""
+        return getattr(self._thread_state, 'priority', NORMAL)
+
+    @contextlib.contextmanager
+    def priority(self, level: int):
+        """
+        Send the requests of the calling thread at a priority level.
+
+        Args:
+            level: the priority level (e.g., INTERACTIVE, BACKGROUND)
+
+        Returns:
+            a context manager that restores the previous priority on exit
+
+        """
+        previous = self.current_priority
+        self._thread_state.priority = level
+        try:
+            yield
+        finally:
+            self._thread_state.priority = previous
+
+    def acquire(self, lane: str, priority: int = None) -> float:
+        """
+        Block until a request in the given lane may be sent.
+
+        Args:
+            lane: the lane of the request (e.g., 'lights')
+            priority: the priority of the request, defaults to the priority
+                of the calling thread
+
+        Returns:
+            the number of seconds spent waiting
+
+        """
+        if lane not in self.buckets:
+            return 0.0
+        if priority is None:
+            priority = self.current_priority
+        start = time.monotonic()
+        bucket = self.buckets[lane]
+        waiting = self._waiting[lane]
+        statistics = self._statistics[lane]
+        with self._condition:
+            entry = (priority, next(self._tickets))
+            heapq.heappush(waiting, entry)
+            statistics.depth += 1
+            try:
+                while True:
+                    # only the highest priority, oldest request may take a token
+                    if waiting[0] == entry:
+                        delay = bucket.try_take(time.monotonic())
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+            finally:
+                waiting.remove(entry)
+                heapq.heapify(waiting)
+                statistics.depth -= 1
+                self._condition.notify_all()
+            wait = time.monotonic() - start
+            statistics.requests += 1
+            statistics.total_wait += wait
+            statistics.max_wait = max(statistics.max_wait, wait)
+        return wait
+
+    def delay(self, lane: str) -> float:
+        """
+        Return the number of seconds until a lane has a token for a request.
+
+        Args:
+            lane: the lane of the request (e.g., 'lights')
+
+        Returns:
+            the seconds to wait, <= 0 if a request may be sent now or the
+            lane is not paced
+
+        """
+        if lane not in self.buckets:
+            return 0.0
+        with self._condition:
+            return self.buckets[lane].delay(time.monotonic())
+
+    def statistics(self) -> dict:
+        """Return the queue-depth and wait-time statistics of each lane."""
+        with self._condition:
+            return {lane: stats.as_dict() for lane, stats in self._statistics.items()}
+
+
+# explicitly define the outward facing API of this module
+__all__ = [
+    TokenBucket.__name__,
+    RequestScheduler.__name__,
+]
@@ -59,6 +59,10 @@ class Sensor:
     def _set(self, *args, **kwargs):
         return self.bridge.set_sensor(self.sensor_id, *args, **kwargs)
 
+    def refresh(self):
+        '''Fetch the latest state of the sensors from the bridge.'''
+        self.bridge.refresh('sensors')
+
     @property
     def name(self):
         '''Get or set the name of the sensor [string]'''
@@ -70,8 +74,7 @@ class Sensor:
         self._name = value
         self._set('name', self._name)
         logger.debug("Renaming sensor from '%s' to '%s'", old_name, value)
-        self.bridge.sensors_by_name[self.name] = self
-        del self.bridge.sensors_by_name[old_name]
+        self.bridge.sensor_registry.rename(old_name, value, self)
 
     @property
     def modelid(self):
@@ -0,0 +1,79 @@
+"""Coalescing of identical concurrent calls into one."""
+import threading
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Callable
+
+
+class _Call:
+    """A call in flight and the outcome that its waiters receive."""
+
+    def __init__(self) -> None:
+        """Initialize a new call that hasn't finished."""
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """A group of calls where concurrent callers of a key share one call."""
+
+    def __init__(self) -> None:
+        """
+        Initialize a new single-flight group.
+
+        Returns:
+            None
+
+        """
+        # the calls in flight keyed by the key they were made for
+        self._calls = dict()
+        self._lock = threading.Lock()
+        # the number of callers that received another caller's result
+        self.coalesced = 0
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(in_flight={len(self._calls)}, coalesced={self.coalesced})'
+
+    def do(self, key, function: 'Callable[[], object]'):
+        """
+        Call a function, or wait for the call already in flight for a key.
+
+        The first caller of a key makes the call. Callers that arrive before
+        it finishes wait for it and receive the same result (the same object,
+        not a copy) or have the same exception raised. Callers that arrive
+        after it finishes make a new call.
+
+        Args:
+            key: a hashable that identifies identical calls
+            function: a callable with no arguments that makes the call
+
+        Returns:
+            the result of the function
+
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if leader:
+            try:
+                call.result = function()
+            except BaseException as error:
+                call.error = error
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+# explicitly define the outward facing API of this module
+__all__ = [SingleFlight.__name__]
@@ -0,0 +1,218 @@
+"""A tracker of the last acknowledged state of lights and groups."""
+import threading
+
+
+# the keys that trigger an action instead of setting a state, always sent
+ACTION_KEYS = {'alert', 'scene'}
+# the keys that modify how a command is applied and never make it worth sending
+MODIFIER_KEYS = {'transitiontime'}
+# the keys that describe the color of a light, setting one changes the others
+COLOR_KEYS = {'hue', 'sat', 'xy', 'ct'}
+# the color attributes in the order the bridge prefers them when several are
+# set at once, and the color mode each one puts a light into
+COLOR_MODES = (('xy', 'xy'), ('ct', 'ct'), ('hue', 'hs'), ('sat', 'hs'))
+# the key in the bridge's data that holds the settable state of each type
+STATE_KEYS = {'lights': 'state', 'groups': 'action'}
+
+
+def is_incremental(key: str) -> bool:
+    """Return True if a key increments a state (e.g., 'bri_inc')."""
+    return key.endswith('_inc')
+
+
+def has_value(state: dict, key: str, value) -> bool:
+    """
+    Return True if a light state already has the value of an attribute.
+
+    Args:
+        state: the "state" dictionary of a light
+        key: the attribute (e.g., 'bri')
+        value: the value of the attribute
+
+    Returns:
+        True if setting the attribute wouldn't change the light. Colors must
+        also match the color mode of the light (e.g., a light in 'ct' mode
+        reports an 'xy' value too, but isn't displaying it)
+
+    """
+    if key not in state or state[key] != value:
+        return False
+    mode = dict(COLOR_MODES).get(key)
+    return mode is None or state.get('colormode', mode) == mode
+
+
+class StateTracker:
+    """The last state acknowledged by the bridge for each light and group."""
+
+    def __init__(self) -> None:
+        """Initialize a new empty state tracker."""
+        # the acknowledged states keyed by (resource type, ID as str)
+        self._states = dict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(targets={len(self._states)})'
+
+    def known(self, kind: str, target_id) -> dict:
+        """
+        Return a copy of the acknowledged state of a target.
+
+        Args:
+            kind: the resource type of the target ('lights' or 'groups')
+            target_id: the ID of the light or group
+
+        Returns:
+            the acknowledged attributes of the target (may be empty)
+
+        """
+        with self._lock:
+            return dict(self._states.get((kind, str(target_id)), {}))
+
+    def diff(self, kind: str, target_id, data: dict, members: list = None) -> dict:
+        """
+        Return the part of a command that would change the state of a target.
+
+        Args:
+            kind: the resource type of the target ('lights' or 'groups')
+            target_id: the ID of the light or group
+            data: the body of the command (e.g., {'on': True, 'bri': 100})
+            members: the current "state" dictionaries of the lights in a
+                group. Only used when the target is a group, whose attributes
+                are unchanged if every light already has them. The last
+                action sent to a group doesn't describe its lights once they
+                are changed individually (e.g., by a wall switch)
+
+        Returns:
+            the body with unchanged attributes removed, or None if nothing in
+            the command would have an effect
+
+        """
+        if kind == 'groups':
+            def unchanged(key, value):
+                return bool(members) and all(has_value(state, key, value) for state in members)
+        else:
+            with self._lock:
+                state = dict(self._states.get((kind, str(target_id)), {}))
+
+            def unchanged(key, value):
+                return key in state and state[key] == value
+        delta = {key: value for key, value in data.items()
+            if key in ACTION_KEYS or key in MODIFIER_KEYS or is_incremental(key)
+            or not unchanged(key, value)
+        }
+        if not set(delta) - MODIFIER_KEYS:
+            return None
+        return delta
+
+    def acknowledge(self, kind: str, target_id, response: list, members: list = None) -> None:
+        """
+        Record the attributes that the bridge reports as successfully set.
+
+        The attributes of a group action are recorded for its lights, not
+        for the group itself (see diff).
+
+        Args:
+            kind: the resource type of the target ('lights' or 'groups')
+            target_id: the ID of the light or group
+            response: the response of the bridge to the command, a list of
+                {'success': {address: value}} or {'error': ...} dictionaries
+            members: the IDs of the lights in a group, or None for all lights
+                (only those with recorded states). Only used when the target
+                is a group
+
+        Returns:
+            None
+
+        """
+        acknowledged = dict()
+        for line in response if isinstance(response, list) else []:
+            success = line.get('success')
+            if isinstance(success, dict):
+                for address, value in success.items():
+                    acknowledged[address.rsplit('/', 1)[-1]] = value
+        if not acknowledged:
+            return
+        with self._lock:
+            if kind != 'groups':
+                targets = [(kind, str(target_id))]
+            elif members is None:
+                targets = [target for target in self._states if target[0] == 'lights']
+            else:
+                # the group action changed the member lights
+                targets = [('lights', str(light_id)) for light_id in members]
+            for target in targets:
+                self._record(self._states.setdefault(target, dict()), acknowledged)
+
+    @staticmethod
+    def _record(state: dict, acknowledged: dict) -> None:
+        """Record acknowledged attributes in the state of a light."""
+        for key, value in acknowledged.items():
+            if key in ACTION_KEYS or key in MODIFIER_KEYS:
+                if key == 'scene':  # a scene sets anything, forget it all
+                    state.clear()
+                continue
+            base = key[:-len('_inc')] if is_incremental(key) else key
+            # colors are linked, a new value of one makes the others stale
+            if base in COLOR_KEYS:
+                for color in COLOR_KEYS - {base}:
+                    state.pop(color, None)
+            if is_incremental(key):  # the new absolute value is unknown
+                state.pop(base, None)
+            else:
+                state[key] = value
+
+    def forget(self, kind: str = None, target_id=None) -> None:
+        """
+        Forget acknowledged states so the next command is sent in full.
+
+        Args:
+            kind: the resource type to forget, or None to forget everything
+            target_id: the ID of the light or group to forget, or None to
+                forget every target of the resource type
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            if kind is None:
+                self._states.clear()
+            elif target_id is None:
+                for target in [target for target in self._states if target[0] == kind]:
+                    del self._states[target]
+            else:
+                self._states.pop((kind, str(target_id)), None)
+
+    def reconcile(self, collection: str, data: dict) -> None:
+        """
+        Drop acknowledged values that disagree with fresh state of the bridge.
+
+        Other clients (e.g., the Hue app or a wall switch) may change lights
+        without going through this tracker, so freshly downloaded state wins.
+
+        Args:
+            collection: the name of the collection (e.g., 'lights')
+            data: the collection as downloaded from the bridge, or None if
+                the collection was only invalidated
+
+        Returns:
+            None
+
+        """
+        state_key = STATE_KEYS.get(collection)
+        if state_key is None or data is None:
+            return
+        with self._lock:
+            for (kind, target_id), state in list(self._states.items()):
+                if kind != collection:
+                    continue
+                actual = data.get(target_id, {}).get(state_key)
+                if actual is None:
+                    del self._states[(kind, target_id)]
+                    continue
+                for key in [key for key, value in state.items() if actual.get(key) != value]:
+                    del state[key]
+
+
+# explicitly define the outward facing API of this module
+__all__ = [StateTracker.__name__]
@@ -0,0 +1,111 @@
+"""Production WSGI serving of the web application."""
+import importlib.util
+import sys
+
+
+# the message shown when no production server is installed
+MISSING_SERVER = (
+    'production mode needs a WSGI server, install one with '
+    '`pip install waitress` (threads) or `pip install gunicorn` (workers '
+    'and threads, Unix only)'
+)
+
+
+def serve_waitress(host: str, port: int, threads: int, streams: int) -> None:
+    """
+    Serve the application from one process with a pool of threads.
+
+    Args:
+        host: the address to listen at
+        port: the port to listen at
+        threads: the number of threads that handle requests
+        streams: the most event streams open at once, each holds a thread
+            on top of the request threads
+
+    Returns:
+        None
+
+    """
+    import waitress
+    from .app import create_app
+    app = create_app({'MAX_EVENT_STREAMS': streams})
+    waitress.serve(app, host=host, port=port, threads=threads + streams)
+
+
+def serve_gunicorn(host: str, port: int, workers: int, threads: int, streams: int) -> None:
+    """
+    Serve the application from several processes with threads each.
+
+    Args:
+        host: the address to listen at
+        port: the port to listen at
+        workers: the number of worker processes
+        threads: the number of threads per worker process
+        streams: the most event streams open at once per worker process,
+            each holds a thread on top of the request threads
+
+    Returns:
+        None
+
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        """A gunicorn application that creates the app in each worker."""
+
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads + streams)
+            self.cfg.set('worker_class', 'gthread')
+            # server-sent event streams stay open, don't kill their workers
+            self.cfg.set('timeout', 0)
+
+        def load(self):
+            # import and create the app after the fork so that every worker
+            # has its own bridge connection and background threads
+            from .app import create_app
+            return create_app({'BRIDGE_SHARE': 1.0 / workers, 'MAX_EVENT_STREAMS': streams})
+
+    Application().run()
+
+
+def serve(host: str, port: int, workers: int = 1, threads: int = 8, streams: int = 4) -> None:
+    """
+    Serve the application with a production WSGI server.
+
+    waitress is used for a single process if it is installed, otherwise
+    gunicorn. Several worker processes need gunicorn.
+
+    Event streams (live page updates) stay open and each holds a thread, so
+    they get threads of their own and requests beyond the limit are refused.
+    Every process that streams events polls the bridge for them, so streams
+    are disabled with several worker processes.
+
+    Args:
+        host: the address to listen at
+        port: the port to listen at
+        workers: the number of worker processes
+        threads: the number of threads per worker process for requests
+        streams: the most event streams open at once
+
+    Returns:
+        None
+
+    """
+    if workers < 1 or threads < 1 or streams < 0:
+        raise ValueError('workers and threads must be at least 1 and streams at least 0')
+    if workers > 1 and streams:
+        print(f'warning: live page updates are disabled with {workers} workers, use 1 worker to enable them', file=sys.stderr)
+        streams = 0
+    if workers == 1 and importlib.util.find_spec('waitress') is not None:
+        return serve_waitress(host, port, threads, streams)
+    if importlib.util.find_spec('gunicorn') is not None:
+        return serve_gunicorn(host, port, workers, threads, streams)
+    if workers > 1:
+        sys.exit(f'error: {workers} workers need gunicorn; {MISSING_SERVER}')
+    sys.exit(f'error: {MISSING_SERVER}')
+
+
+# explicitly define the outward facing API of this module
+__all__ = [serve.__name__]
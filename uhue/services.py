@@ -0,0 +1,74 @@
+"""The long-lived objects that one instance of the web application uses."""
+import collections
+import threading
+from . import philips_hue
+from .philips_hue.colors import compile_kernels
+from .philips_hue.scheduler import DEFAULT_RATE_LIMITS
+from .events import StatePoller
+
+
+def share_rate_limits(share: float) -> dict:
+    """
+    Return the request rate limits for one of several processes.
+
+    Every worker process has its own connection to the bridge, so each may
+    only use its share of what the bridge can absorb.
+
+    Args:
+        share: the fraction of the bridge's capacity for this process
+
+    Returns:
+        the rate limits of the scheduler lanes (see RequestScheduler)
+
+    """
+    return {lane: (rate * share, max(1, int(burst * share)))
+        for lane, (rate, burst) in DEFAULT_RATE_LIMITS.items()
+    }
+
+
+class Services:
+    """The bridge connection and background services of an application."""
+
+    def __init__(self, config: dict) -> None:
+        """
+        Initialize the services of an application.
+
+        Args:
+            config: the configuration of the application. BRIDGE_SHARE is
+                the fraction of the bridge's capacity this process may use
+                (i.e., 1 / the number of worker processes). MAX_EVENT_STREAMS
+                is the most event streams open at once (None for no limit)
+
+        Returns:
+            None
+
+        """
+        rate_limits = share_rate_limits(config.get('BRIDGE_SHARE', 1.0))
+        # create the connection to the Hue bridge
+        self.bridge = philips_hue.Bridge(rate_limits=rate_limits)
+        # check for a configuration file and load it
+        if self.bridge.has_config_file:
+            self.bridge.load_config_file()
+        # compile the color kernels in the background so the first page doesn't wait
+        threading.Thread(target=compile_kernels, name='compile_kernels', daemon=True).start()
+        # create the queue that coalesces interactive commands (e.g., color drags)
+        self.commands = philips_hue.CommandQueue(self.bridge)
+        # create the engine that plays animations over lights and groups
+        self.animation_engine = philips_hue.AnimationEngine(self.bridge,
+            light_rate=rate_limits['lights'][0],
+            group_rate=rate_limits['groups'][0],
+        )
+        # create the service that polls the bridge while anything is watching it
+        self.polling = philips_hue.PollingService(self.bridge)
+        # create the relay that pushes state changes to every open page
+        self.state_poller = StatePoller(self.polling, max_subscribers=config.get('MAX_EVENT_STREAMS'))
+        # the encoded bodies of recent state API responses keyed by ETag
+        self.encoded_states = collections.OrderedDict()
+        self.encoded_states_lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<{self.__class__.__module__}.{self.__class__.__name__} bridge={self.bridge.ip_address}>'
+
+
+# explicitly define the outward facing API of this module
+__all__ = [Services.__name__]
@@ -130,3 +130,129 @@ function set_group_color(group_id, value) {
 function set_group_on(group_id, checkbox) {
     set_group(group_id, 'on', $(checkbox).is(":checked"));
 }
+
+// ---------------------------------------------------------------------------
+// MARK: Scenes
+// ---------------------------------------------------------------------------
+
+/**
+    Activate a scene on a group on the hue server.
+
+    @param scene_id the ID for the scene to activate
+    @param group_id the ID for the group to activate the scene on
+
+*/
+function activate_scene(scene_id, group_id) {
+    $.ajax({
+        type: "POST",
+        contentType: "application/json; charset=utf-8",
+        url: "/hue/scenes",
+        data: JSON.stringify({
+            "scene_id": scene_id,
+            "group_id": group_id
+        }),
+        success: function (data) {
+            console.log("TODO: giggity");
+        },
+        dataType: "json"
+    });
+}
+
+// ---------------------------------------------------------------------------
+// MARK: Animations
+// ---------------------------------------------------------------------------
+
+/**
+    Send an animation command to the hue server and reload the page.
+
+    @param data the command with the action and name of the animation
+
+*/
+function send_animation(data) {
+    $.ajax({
+        type: "POST",
+        contentType: "application/json; charset=utf-8",
+        url: "/hue/animations",
+        data: JSON.stringify(data),
+        success: function (data) {
+            location.reload();
+        },
+        dataType: "json"
+    });
+}
+
+/**
+    Start an animation over all the lights on the hue server.
+
+    @param name the name to control the animation with
+    @param animation the type of animation (e.g., colorloop, breathe)
+
+*/
+function start_animation(name, animation) {
+    send_animation({"action": "start", "name": name, "animation": animation});
+}
+
+/**
+    Pause, resume, or stop an animation on the hue server.
+
+    @param action the action to take (pause, resume, or stop)
+    @param name the name of the animation
+
+*/
+function control_animation(action, name) {
+    send_animation({"action": action, "name": name});
+}
+
+// ---------------------------------------------------------------------------
+// MARK: Events
+// ---------------------------------------------------------------------------
+
+/**
+    Update the displayed fields of a light or group card.
+
+    @param card the card element of the light or group
+    @param fields the changed fields (name, on, brightness, color_hex)
+
+*/
+function patch_card(card, fields) {
+    card.find('[data-field]').each(function () {
+        var field = $(this).data('field');
+        // don't fight with a control that the user is interacting with
+        if (!(field in fields) || this === document.activeElement) {
+            return;
+        }
+        var value = fields[field];
+        if (field === 'name') {
+            $(this).text(value);
+        } else if (field === 'on') {
+            $(this).prop('checked', value);
+        } else if (field === 'brightness') {
+            $(this).val(value);
+        } else if (field === 'color_hex' && this.jscolor) {
+            this.jscolor.fromString(value);
+        }
+    });
+}
+
+/**
+    Subscribe to the state changes pushed by the hue server.
+*/
+function subscribe_events() {
+    var source = new EventSource('/hue/events');
+    source.onmessage = function (event) {
+        var changes = JSON.parse(event.data);
+        $.each(changes.lights || {}, function (light_id, fields) {
+            patch_card($('[data-light-id="' + light_id + '"]'), fields);
+        });
+        $.each(changes.groups || {}, function (group_id, fields) {
+            patch_card($('[data-group-id="' + group_id + '"]'), fields);
+        });
+    };
+}
+
+// subscribe to state changes on the pages that show lights or groups
+$(document).ready(function () {
+    if (window.EventSource && $('[data-light-id], [data-group-id]').length) {
+        subscribe_events();
+    }
+});
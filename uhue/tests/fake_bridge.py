@@ -0,0 +1,297 @@
+"""An in-process imitation of the REST API of a Hue bridge for test cases."""
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# the username that the fake bridge accepts
+USERNAME = 'test-user'
+
+
+def make_state(num_lights: int = 6) -> dict:
+    """
+    Return the initial state of a fake bridge.
+
+    Args:
+        num_lights: the number of color lights on the bridge. Group 1
+            (Kitchen) holds lights 1-3 and group 2 (Living) lights 4-6
+
+    Returns:
+        the full state of the bridge as returned by GET /api/<username>
+
+    """
+    lights = dict()
+    for light_id in range(1, num_lights + 1):
+        lights[str(light_id)] = {
+            'state': {
+                'on': True, 'bri': 100 + light_id, 'hue': 1000, 'sat': 100, 'effect': 'none',
+                'xy': [0.3, 0.3], 'ct': 300, 'alert': 'none', 'colormode': 'xy', 'reachable': True,
+            },
+            'type': 'Extended color light',
+            'name': f'Light {light_id}',
+            'modelid': 'LCT015',
+            'manufacturername': 'Signify',
+            'productname': 'Hue color lamp',
+            'capabilities': {'control': {'colorgamuttype': 'C'}},
+            'config': {'archetype': 'sultanbulb'},
+            'uniqueid': f'00:17:88:01:00:{light_id:02x}',
+            'swversion': '1.0',
+        }
+
+    def group(name, light_ids):
+        return {
+            'name': name,
+            'lights': [str(light_id) for light_id in light_ids if str(light_id) in lights],
+            'type': 'Room',
+            'state': {'all_on': True, 'any_on': True},
+            'action': {'on': True, 'bri': 100, 'xy': [0.3, 0.3], 'colormode': 'xy', 'alert': 'none'},
+        }
+
+    return {
+        'lights': lights,
+        'groups': {'1': group('Kitchen', [1, 2, 3]), '2': group('Living', [4, 5, 6])},
+        'sensors': {
+            '1': {
+                'name': 'Daylight', 'type': 'Daylight', 'modelid': 'PHDL00', 'uniqueid': 'daylight',
+                'manufacturername': 'Signify', 'swversion': '1.0',
+                'state': {'daylight': True, 'lastupdated': 'none'}, 'config': {'on': True},
+            },
+        },
+        'scenes': {
+            'abc': {
+                'name': 'Relax', 'type': 'GroupScene', 'group': '1', 'lights': ['1', '2', '3'],
+                'owner': USERNAME, 'lastupdated': '2020-01-01T00:00:00', 'version': 2,
+            },
+            'def': {
+                'name': 'Bright', 'type': 'LightScene', 'lights': ['4', '5'],
+                'owner': USERNAME, 'lastupdated': '2020-01-01T00:00:00', 'version': 2,
+            },
+        },
+        'config': {'name': 'Fake bridge'},
+        'schedules': dict(),
+    }
+
+
+def error(error_type: int, address: str, description: str) -> dict:
+    """Return an error item of a bridge response."""
+    return {'error': {'type': error_type, 'address': address, 'description': description}}
+
+
+class FakeBridge:
+    """A fake Hue bridge served over HTTP on a local port."""
+
+    def __init__(self, num_lights: int = 6) -> None:
+        """
+        Initialize a new fake bridge.
+
+        Args:
+            num_lights: the number of lights on the bridge (see make_state)
+
+        Returns:
+            None
+
+        """
+        self.state = make_state(num_lights)
+        # the requests that were received as (method, path, JSON body)
+        self.requests = list()
+        # canned responses that replace the normal ones keyed by (method, path)
+        self.overrides = dict()
+        # the number of connections that were opened to the bridge
+        self.connections = 0
+        self.lock = threading.RLock()
+        # the sockets of the open connections, tracked under their own lock
+        # so connections are accepted while a test holds the bridge lock
+        self._sockets = set()
+        self._sockets_lock = threading.Lock()
+        self._server = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(address={self.address!r})'
+
+    @property
+    def address(self) -> str:
+        """Return the host:port address of the running bridge."""
+        host, port = self._server.server_address[:2]
+        return f'{host}:{port}'
+
+    def start(self) -> 'FakeBridge':
+        """Start serving requests in a background thread and return self."""
+        handler = type('Handler', (FakeBridgeHandler,), {'bridge': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='FakeBridge', daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving requests."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def requests_of(self, method: str) -> list:
+        """Return the (path, body) of the received requests with an HTTP method."""
+        with self.lock:
+            return [(path, body) for mode, path, body in self.requests if mode == method]
+
+    def clear(self) -> None:
+        """Forget the received requests."""
+        with self.lock:
+            self.requests.clear()
+
+    def drop_connections(self, timeout: float = 1.0) -> None:
+        """Close every open connection from the server side (e.g., after a restart)."""
+        with self._sockets_lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        # wait for the handlers to notice so the clients see the closed sockets
+        deadline = time.monotonic() + timeout
+        while self._sockets and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def set_light_state(self, light_id, **state) -> None:
+        """Change the state of a light outside the API (e.g., a wall switch)."""
+        with self.lock:
+            self.state['lights'][str(light_id)]['state'].update(state)
+            self._update_group_states()
+
+    def _update_group_states(self) -> None:
+        """Update whether the lights of each group are any / all on."""
+        lights = self.state['lights']
+        for group in self.state['groups'].values():
+            states = [lights[light_id]['state']['on'] for light_id in group['lights']]
+            group['state'] = {'any_on': any(states), 'all_on': bool(states) and all(states)}
+
+    def _group(self, group_id: str) -> dict:
+        """Return a group, including group 0 of all lights."""
+        if group_id == '0':
+            return {'name': 'Group 0', 'lights': list(self.state['lights']), 'type': 'LightGroup',
+                'action': {'on': True}, 'state': {}}
+        return self.state['groups'].get(group_id)
+
+    def get(self, parts: list):
+        """Return the response to a GET of an address below /api/<username>."""
+        if not parts:
+            return self.state
+        if parts[0] == 'groups' and len(parts) == 2:
+            node = self._group(parts[1])
+        else:
+            node = self.state
+            for part in parts:
+                node = node.get(part) if isinstance(node, dict) else None
+        if node is None:
+            return [error(3, '/' + '/'.join(parts), f'resource, /{"/".join(parts)}, not available')]
+        if parts[0] == 'scenes' and len(parts) == 2:
+            lights = self.state['lights']
+            states = {light_id: dict(lights[light_id]['state']) for light_id in node['lights']}
+            node = dict(node, lightstates=states)
+        return node
+
+    def put(self, parts: list, body: dict) -> list:
+        """Apply a PUT to an address below /api/<username> and return the response."""
+        address = '/' + '/'.join(parts)
+        if parts[:1] == ['groups'] and parts[-1:] == ['action']:
+            group = self._group(parts[1])
+            node = None if group is None else group['action']
+        else:
+            node = self.state
+            for part in parts:
+                node = node.get(part) if isinstance(node, dict) else None
+        if node is None:
+            return [error(3, address, f'resource, {address}, not available')]
+        response = list()
+        for key, value in body.items():
+            if key == 'transitiontime':
+                continue
+            if key == 'bri' and not isinstance(value, int):
+                response.append(error(7, f'{address}/{key}', f'invalid value, {value}, for parameter, bri'))
+                continue
+            node[key] = value
+            if parts[-1:] == ['action']:
+                group = self._group(parts[1])
+                if key == 'scene':  # switch the lights of the scene on
+                    scene = self.state['scenes'].get(value, {})
+                    members, key, value = scene.get('lights', []), 'on', True
+                else:
+                    members = group['lights']
+                for light_id in members:
+                    self.state['lights'][light_id]['state'][key] = value
+            response.append({'success': {f'{address}/{key}': value}})
+        self._update_group_states()
+        return response
+
+    def post(self, parts: list, body: dict) -> list:
+        """Create a resource in a collection and return the response."""
+        collection = self.state.setdefault(parts[0], dict())
+        new_id = str(max([int(key) for key in collection if key.isdigit()] + [0]) + 1)
+        collection[new_id] = dict(body, state=dict(), action=dict()) if parts[0] == 'groups' else body
+        return [{'success': {'id': new_id}}]
+
+    def delete(self, parts: list) -> list:
+        """Delete a resource and return the response."""
+        address = '/' + '/'.join(parts)
+        if self.state.get(parts[0], {}).pop(parts[1], None) is None:
+            return [error(3, address, f'resource, {address}, not available')]
+        return [{'success': f'{address} deleted'}]
+
+
+class FakeBridgeHandler(BaseHTTPRequestHandler):
+    """The HTTP handler of a FakeBridge (set as the bridge attribute)."""
+
+    # keep connections alive like the real bridge
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.bridge._sockets_lock:
+            self.bridge.connections += 1
+            self.bridge._sockets.add(self.connection)
+
+    def finish(self):
+        with self.bridge._sockets_lock:
+            self.bridge._sockets.discard(self.connection)
+        super().finish()
+
+    def _respond(self, payload) -> None:
+        """Send a JSON response."""
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        try:
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:  # the connection was dropped (see drop_connections)
+            self.close_connection = True
+
+    def _handle(self) -> None:
+        """Record the request and dispatch it to the bridge."""
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'null')
+        parts = [part for part in self.path.split('/') if part]
+        with self.bridge.lock:
+            self.bridge.requests.append((self.command, self.path, body))
+            if (self.command, self.path) in self.bridge.overrides:
+                return self._respond(self.bridge.overrides[(self.command, self.path)])
+            if self.command == 'POST' and parts == ['api']:
+                return self._respond([{'success': {'username': USERNAME}}])
+            if parts[:2] != ['api', USERNAME]:
+                return self._respond([error(1, self.path, 'unauthorized user')])
+            response = getattr(self.bridge, self.command.lower())(parts[2:], *([body] if body is not None else []))
+        self._respond(response)
+
+    do_GET = _handle
+    do_PUT = _handle
+    do_POST = _handle
+    do_DELETE = _handle
+
+
+# explicitly define the outward facing API of this module
+__all__ = [FakeBridge.__name__, make_state.__name__, error.__name__]
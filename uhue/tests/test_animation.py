@@ -0,0 +1,139 @@
+"""Test cases for the animation engine."""
+import time
+from unittest import TestCase
+from ..philips_hue.animation import Animation, AnimationEngine
+from ..philips_hue.bridge import Bridge
+from .fake_bridge import FakeBridge, USERNAME, error
+
+
+class Constant(Animation):
+    """An animation that holds its targets at one brightness."""
+
+    def state(self, t, index, target):
+        return {'bri': 50}
+
+
+class ShouldRestartAnimations(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME)
+        self.engine = AnimationEngine(self.bridge, fps=50.0, light_rate=50.0)
+
+    def tearDown(self):
+        self.engine.shutdown()
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def wait_for_puts(self, count: int) -> list:
+        """Wait for the bridge to receive a number of PUT requests."""
+        deadline = time.monotonic() + 2.0
+        while len(self.fake.requests_of('PUT')) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.fake.requests_of('PUT')
+
+    def test_restart_sends_first_frame(self):
+        self.engine.start('dim', Constant(lights=[1]))
+        self.assertEqual(1, len(self.wait_for_puts(1)))
+        self.engine.stop('dim')
+        # the light changes outside the animation before it is restarted
+        self.fake.set_light_state(1, bri=200)
+        self.bridge.refresh('lights')
+        self.engine.start('dim', Constant(lights=[1]))
+        puts = self.wait_for_puts(2)
+        self.assertEqual(2, len(puts))
+        self.assertEqual(50, puts[-1][1]['bri'])
+        self.assertEqual(50, self.fake.state['lights']['1']['state']['bri'])
+
+    def test_unchanged_frames_are_not_resent(self):
+        self.engine.start('dim', Constant(lights=[1]))
+        self.wait_for_puts(1)
+        time.sleep(0.2)
+        self.assertEqual(1, len(self.fake.requests_of('PUT')))
+        self.assertGreater(self.engine.statistics()['dim']['commands_unchanged'], 0)
+
+
+class ShouldResendFailedFrames(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME, plan_commands=False)
+        self.engine = AnimationEngine(self.bridge, fps=50.0, light_rate=50.0)
+
+    def tearDown(self):
+        self.engine.shutdown()
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def puts_to(self, light_id) -> list:
+        return [body for path, body in self.fake.requests_of('PUT') if path == f'/api/{USERNAME}/lights/{light_id}/state']
+
+    def test_refused_frame_is_resent(self):
+        address = '/lights/1/state'
+        self.fake.overrides[('PUT', f'/api/{USERNAME}{address}')] = [error(201, address, 'device is off')]
+        self.engine.start('dim', Constant(lights=[1, 2]))
+        time.sleep(0.2)
+        self.assertGreater(len(self.puts_to(1)), 1)
+        self.assertEqual(1, len(self.puts_to(2)))
+        self.assertGreater(self.engine.statistics()['dim']['commands_failed'], 0)
+        # once the bridge accepts the frame it isn't sent again
+        del self.fake.overrides[('PUT', f'/api/{USERNAME}{address}')]
+        time.sleep(0.1)
+        sent = len(self.puts_to(1))
+        time.sleep(0.1)
+        self.assertEqual(sent, len(self.puts_to(1)))
+        self.assertEqual(50, self.fake.state['lights']['1']['state']['bri'])
+
+    def test_exception_skips_only_its_target(self):
+        set_light = self.bridge.set_light
+        failures = list()
+
+        def flaky(light_id, data):
+            if light_id == 1 and len(failures) < 3:
+                failures.append(light_id)
+                raise OSError('connection reset')
+            return set_light(light_id, data)
+
+        self.bridge.set_light = flaky
+        self.engine.start('dim', Constant(lights=[1, 2]))
+        time.sleep(0.2)
+        self.assertEqual(3, len(failures))
+        self.assertEqual(1, len(self.puts_to(1)))
+        self.assertEqual(1, len(self.puts_to(2)))
+
+
+class ShouldSleepWithoutAnimations(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME)
+        self.engine = AnimationEngine(self.bridge, fps=50.0, light_rate=50.0)
+        self.ticks = list()
+        tick = self.engine._tick
+        self.engine._tick = lambda now, missed: (self.ticks.append(now), tick(now, missed))
+
+    def tearDown(self):
+        self.engine.shutdown()
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def test_idle(self):
+        self.engine.start('dim', Constant(lights=[1]))
+        time.sleep(0.1)
+        self.engine.stop('dim')
+        time.sleep(0.05)
+        ticks = len(self.ticks)
+        time.sleep(0.2)
+        self.assertEqual(ticks, len(self.ticks))
+        # a new animation wakes the engine
+        self.engine.start('dim', Constant(lights=[1]))
+        time.sleep(0.1)
+        self.assertGreater(len(self.ticks), ticks)
+
+    def test_paused(self):
+        self.engine.start('dim', Constant(lights=[1]))
+        self.engine.pause('dim')
+        time.sleep(0.05)
+        ticks = len(self.ticks)
+        time.sleep(0.2)
+        self.assertEqual(ticks, len(self.ticks))
+        self.engine.resume('dim')
+        time.sleep(0.1)
+        self.assertGreater(len(self.ticks), ticks)
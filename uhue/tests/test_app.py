@@ -0,0 +1,189 @@
+"""Test cases for the web application."""
+import gzip
+import json
+import threading
+from unittest import TestCase
+from ..app import create_app
+from ..philips_hue.bridge import Bridge
+from .fake_bridge import FakeBridge, USERNAME
+
+
+def create_test_app(fake: FakeBridge, config: dict = None):
+    """Return a testing application connected to a fake bridge."""
+    app = create_app(dict({'TESTING': True}, **(config or {})))
+    bridge = app.extensions['uhue'].bridge
+    bridge.ip_address = fake.address
+    bridge.username = USERNAME
+    return app
+
+
+class ShouldRenderPagesWithinRequestBudget(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.app = create_test_app(self.fake)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.app.extensions['uhue'].bridge.connection_pool.close()
+        self.fake.stop()
+
+    def test_lights(self):
+        response = self.client.get('/lights')
+        self.assertEqual(200, response.status_code)
+        self.assertIn(b'Light 1', response.data)
+        self.assertEqual(['/api/test-user/lights'], [path for path, _ in self.fake.requests_of('GET')])
+
+    def test_groups(self):
+        response = self.client.get('/groups')
+        self.assertEqual(200, response.status_code)
+        self.assertIn(b'Kitchen', response.data)
+        self.assertLessEqual(len(self.fake.requests), self.app.config['MAX_BRIDGE_REQUESTS_PER_PAGE'])
+
+    def test_cached_render_sends_nothing(self):
+        self.client.get('/groups')
+        self.fake.clear()
+        self.client.get('/lights')
+        self.client.get('/groups')
+        self.assertEqual([], self.fake.requests)
+
+    def test_error_response(self):
+        self.app.extensions['uhue'].bridge.username = 'unknown-user'
+        for page in ('/lights', '/groups'):
+            response = self.client.get(page)
+            self.assertEqual(200, response.status_code)
+            self.assertNotIn(b'Light 1', response.data)
+            self.assertNotIn(b'Kitchen', response.data)
+
+    def test_budget_trips(self):
+        self.app.config['MAX_BRIDGE_REQUESTS_PER_PAGE'] = 1
+        with self.assertRaises(AssertionError):
+            self.client.get('/groups')
+
+
+class ShouldCountRequestsPerContext(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME, max_workers=3, plan_commands=False)
+
+    def tearDown(self):
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def test_fan_out_is_counted(self):
+        with self.bridge.count_requests() as counter:
+            self.bridge.set_light([1, 2, 3], 'bri', 5, force=True)
+        self.assertEqual(3, len(self.fake.requests_of('PUT')))
+        self.assertEqual(3, counter.value)
+
+    def test_other_threads_are_excluded(self):
+        with self.bridge.count_requests() as counter:
+            thread = threading.Thread(target=self.bridge.request, args=('GET', f'/api/{USERNAME}/config'))
+            thread.start()
+            thread.join()
+            self.bridge.request('GET', f'/api/{USERNAME}/lights')
+        self.assertEqual(1, counter.value)
+        self.assertEqual(2, self.bridge.requests_sent)
+
+
+class ShouldLimitEventStreams(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.app = create_test_app(self.fake, {'MAX_EVENT_STREAMS': 1})
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.app.extensions['uhue'].state_poller.polling.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def test_limit(self):
+        first = self.client.get('/hue/events', buffered=False)
+        self.assertEqual('text/event-stream', first.mimetype)
+        second = self.client.get('/hue/events', buffered=False)
+        self.assertEqual(503, second.status_code)
+        self.assertIn('Retry-After', second.headers)
+        # closing a stream frees its slot, even if it never started
+        first.close()
+        third = self.client.get('/hue/events', buffered=False)
+        self.assertEqual(200, third.status_code)
+        third.close()
+        self.assertEqual(0, len(self.app.extensions['uhue'].state_poller._subscribers))
+
+    def test_disabled(self):
+        self.app.extensions['uhue'].state_poller.max_subscribers = 0
+        self.assertEqual(503, self.client.get('/hue/events').status_code)
+
+
+class ShouldEscapeAnimationNames(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.app = create_test_app(self.fake)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.app.extensions['uhue'].animation_engine.shutdown()
+        self.app.extensions['uhue'].bridge.connection_pool.close()
+        self.fake.stop()
+
+    def test_name_is_not_script(self):
+        name = "x');alert(1);//"
+        response = self.client.post('/hue/animations', json={'action': 'start', 'name': name, 'animation': 'breathe', 'lights': [1]})
+        self.assertEqual(200, response.status_code)
+        self.client.post('/hue/animations', json={'action': 'pause', 'name': name})
+        page = self.client.get('/animations').get_data(as_text=True)
+        self.assertIn('data-name="x&#39;);alert(1);//"', page)
+        for line in page.splitlines():
+            if 'data-name' in line:
+                self.assertIn('this.dataset.name)', line)
+                self.assertNotIn('alert', line.split('onclick=')[1])
+
+
+class ShouldServeStateWithETags(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.app = create_test_app(self.fake, {'STATE_API_GZIP_MIN_BYTES': 0})
+        self.client = self.app.test_client()
+        self.services = self.app.extensions['uhue']
+
+    def tearDown(self):
+        self.services.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def test_not_modified(self):
+        response = self.client.get('/hue/state')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('Light 1', response.json['lights']['1']['name'])
+        etag = response.headers['ETag']
+        response = self.client.get('/hue/state', headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.data)
+        self.assertEqual(etag, response.headers['ETag'])
+
+    def test_patch_changes_etag(self):
+        etag = self.client.get('/hue/lights/1').headers['ETag']
+        self.services.bridge.cache.patch('lights', {('1', 'state', 'bri'): 5})
+        response = self.client.get('/hue/lights/1', headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers['ETag'])
+        self.assertEqual(5, response.json['state']['bri'])
+        self.assertEqual(404, self.client.get('/hue/lights/99').status_code)
+
+    def test_gzip(self):
+        plain = self.client.get('/hue/state')
+        response = self.client.get('/hue/state', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(plain.headers['ETag'][:-1] + '-gz"', response.headers['ETag'])
+        self.assertEqual(plain.json, json.loads(gzip.decompress(response.data)))
+        # either representation means the client is up to date
+        response = self.client.get('/hue/state', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(304, response.status_code)
+
+    def test_encoded_states_are_bounded(self):
+        self.client.get('/hue/lights')
+        self.assertEqual(1, len(self.services.encoded_states))
+        self.client.get('/hue/lights')
+        self.assertEqual(1, len(self.services.encoded_states))
+        for bri in range(70):
+            self.services.bridge.cache.patch('lights', {('1', 'state', 'bri'): bri})
+            self.client.get('/hue/lights')
+        self.assertEqual(64, len(self.services.encoded_states))
@@ -0,0 +1,81 @@
+"""Test cases for the asyncio interface to the bridge."""
+import asyncio
+import gc
+import threading
+import time
+import warnings
+from unittest import TestCase
+from ..philips_hue.async_bridge import AsyncBridge
+from ..philips_hue.scheduler import TokenBucket
+from .fake_bridge import FakeBridge, USERNAME
+
+
+class ShouldSendRequests(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = AsyncBridge(self.fake.address, USERNAME)
+
+    def tearDown(self):
+        asyncio.run(self.bridge.aclose())
+        self.fake.stop()
+
+    def test_get_and_set(self):
+        lights = asyncio.run(self.bridge.get_light())
+        self.assertEqual('Light 1', lights['1']['name'])
+        self.assertEqual('Kitchen', asyncio.run(self.bridge.get_group(1, 'name')))
+        responses = asyncio.run(self.bridge.set_light(['Light 1', 2], 'bri', 50))
+        self.assertEqual(2, len(responses))
+        self.assertEqual(50, self.fake.state['lights']['1']['state']['bri'])
+        self.assertEqual(50, self.fake.state['lights']['2']['state']['bri'])
+
+    def test_connections_are_reused_across_loops(self):
+        for _ in range(3):
+            self.assertEqual({'name': 'Fake bridge'}, asyncio.run(self.bridge.get_config()))
+        self.assertEqual(1, self.fake.connections)
+
+    def test_aclose_closes_streams(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', ResourceWarning)
+            for _ in range(3):
+                asyncio.run(self.bridge.get_config())
+            asyncio.run(self.bridge.aclose())
+            gc.collect()
+        self.assertEqual([], [str(warning.message) for warning in caught if warning.category is ResourceWarning])
+        # the bridge starts over after it was closed
+        self.assertEqual({'name': 'Fake bridge'}, asyncio.run(self.bridge.get_config()))
+
+
+class ShouldShareRateLimits(TestCase):
+    def test_bucket_across_threads(self):
+        bucket = TokenBucket(50.0, 5)
+        taken = list()
+        start = time.monotonic()
+
+        def take():
+            while time.monotonic() - start < 0.2:
+                if bucket.try_take(time.monotonic()) <= 0:
+                    taken.append(1)
+
+        threads = [threading.Thread(target=take) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+        self.assertLessEqual(len(taken), 5 + 50.0 * elapsed + 1)
+
+    def test_requests_across_loops(self):
+        fake = FakeBridge().start()
+        bridge = AsyncBridge(fake.address, USERNAME, rate_limits={'lights': (20.0, 1)})
+        start = time.monotonic()
+        threads = [threading.Thread(target=asyncio.run, args=(bridge.set_light([1, 2, 3, 4, 5], 'bri', 1),)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+        asyncio.run(bridge.aclose())
+        fake.stop()
+        self.assertEqual(10, len(fake.requests_of('PUT')))
+        # nine requests beyond the burst at 20 per second
+        self.assertGreaterEqual(elapsed, 0.44)
@@ -0,0 +1,101 @@
+"""Test cases for the retries and circuit breaker of bridge requests."""
+import time
+from unittest import TestCase
+from ..philips_hue.breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+from ..philips_hue.bridge import Bridge
+from ..philips_hue.connection import ConnectFailed
+from ..philips_hue.exceptions import PhueBridgeUnavailable
+from .fake_bridge import USERNAME
+
+
+class FakePool:
+    """A connection pool that replays canned responses (bytes or exceptions)."""
+
+    def __init__(self, host: str, responses: list) -> None:
+        self.host = host
+        self.responses = list(responses)
+        self.requests = list()
+
+    def request(self, mode, endpoint, body=None, timeout=None, connect_timeout=None):
+        self.requests.append((mode, endpoint))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def close(self):
+        pass
+
+
+class ShouldRetryAndFailFast(TestCase):
+    def setUp(self):
+        self.bridge = Bridge('bridge.local', USERNAME, retries=2, failure_threshold=3, recovery_timeout=0.1)
+        self.endpoint = f'/api/{USERNAME}/config'
+
+    def replay(self, *responses) -> FakePool:
+        self.bridge._pool = FakePool(self.bridge.ip_address, responses)
+        return self.bridge._pool
+
+    def test_retry_get(self):
+        pool = self.replay(ConnectionResetError(), b'{"name": "Bridge"}')
+        self.assertEqual({'name': 'Bridge'}, self.bridge.request('GET', self.endpoint))
+        self.assertEqual(2, len(pool.requests))
+        self.assertEqual(CLOSED, self.bridge.breaker.state)
+
+    def test_retry_put_only_if_unsent(self):
+        pool = self.replay(ConnectFailed(), b'[]')
+        self.assertEqual([], self.bridge.request('PUT', self.endpoint, {'name': 'Bridge'}))
+        self.assertEqual(2, len(pool.requests))
+        # a command that may have reached the bridge is not repeated
+        pool = self.replay(ConnectionResetError(), b'[]')
+        with self.assertRaises(PhueBridgeUnavailable):
+            self.bridge.request('PUT', self.endpoint, {'name': 'Bridge'})
+        self.assertEqual(1, len(pool.requests))
+
+    def test_fail_fast(self):
+        pool = self.replay(*[ConnectionResetError()] * 3)
+        with self.assertRaises(PhueBridgeUnavailable):
+            self.bridge.request('GET', self.endpoint)
+        self.assertEqual(OPEN, self.bridge.breaker.state)
+        with self.assertRaises(PhueBridgeUnavailable):
+            self.bridge.request('GET', self.endpoint)
+        self.assertEqual(3, len(pool.requests))
+
+    def test_recovery(self):
+        pool = self.replay(*[ConnectionResetError()] * 3, b'{"name": "Bridge"}')
+        with self.assertRaises(PhueBridgeUnavailable):
+            self.bridge.request('GET', self.endpoint)
+        time.sleep(self.bridge.breaker.retry_after())
+        self.assertEqual({'name': 'Bridge'}, self.bridge.request('GET', self.endpoint))
+        self.assertEqual(CLOSED, self.bridge.breaker.state)
+        self.assertEqual(4, len(pool.requests))
+
+    def test_garbled_probe(self):
+        pool = self.replay(*[ConnectionResetError()] * 3, b'<html>busy</html>', b'{"name": "Bridge"}')
+        with self.assertRaises(PhueBridgeUnavailable):
+            self.bridge.request('GET', self.endpoint)
+        time.sleep(self.bridge.breaker.retry_after())
+        with self.assertRaises(ValueError):
+            self.bridge.request('GET', self.endpoint)
+        # the failed probe opens the breaker again instead of leaving it half-open
+        self.assertEqual(OPEN, self.bridge.breaker.state)
+        self.assertGreater(self.bridge.breaker.retry_after(), 0.0)
+        time.sleep(self.bridge.breaker.retry_after())
+        self.assertEqual({'name': 'Bridge'}, self.bridge.request('GET', self.endpoint))
+        self.assertEqual(5, len(pool.requests))
+
+
+class ShouldReplaceUnsettledProbes(TestCase):
+    def test_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.05)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(HALF_OPEN, breaker.state)
+        # only one probe at a time
+        self.assertFalse(breaker.allow())
+        self.assertGreater(breaker.retry_after(), 0.0)
+        # the probe never settled, so another one is let through
+        time.sleep(0.05)
+        self.assertTrue(breaker.allow())
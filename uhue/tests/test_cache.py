@@ -0,0 +1,134 @@
+"""Test cases for the cache of bridge state."""
+import time
+from unittest import TestCase
+from ..philips_hue.bridge import Bridge
+from ..philips_hue.cache import MISSING, StateCache
+from ..philips_hue.exceptions import PhueBridgeUnavailable
+from .fake_bridge import FakeBridge, USERNAME, make_state
+
+
+class StubFetch:
+    """A fetch function that serves a fake state and counts its calls."""
+
+    def __init__(self):
+        self.state = make_state(2)
+        self.calls = 0
+        self.available = True
+
+    def __call__(self, collection):
+        self.calls += 1
+        if not self.available:
+            raise PhueBridgeUnavailable(None, 'the bridge is down')
+        return {key: dict(value) for key, value in self.state[collection].items()}
+
+
+class ShouldExpireCollections(TestCase):
+    def setUp(self):
+        self.fetch = StubFetch()
+
+    def test_ttl(self):
+        cache = StateCache(self.fetch, ttl=0.05)
+        self.assertIs(cache.get('lights'), cache.get('lights'))
+        self.assertEqual(1, self.fetch.calls)
+        self.assertTrue(cache.is_fresh('lights'))
+        time.sleep(0.05)
+        self.assertFalse(cache.is_fresh('lights'))
+        cache.get('lights')
+        self.assertEqual(2, self.fetch.calls)
+
+    def test_read_through(self):
+        cache = StateCache(self.fetch, ttl=0)
+        cache.get('lights')
+        cache.get('lights')
+        self.assertEqual(2, self.fetch.calls)
+
+    def test_never_expire(self):
+        cache = StateCache(self.fetch, ttl=None)
+        cache.get('lights')
+        cache.get('lights')
+        self.assertEqual(1, self.fetch.calls)
+        cache.invalidate('lights')
+        self.assertIsNone(cache.peek('lights'))
+        cache.get('lights')
+        self.assertEqual(2, self.fetch.calls)
+
+    def test_errors_are_not_cached(self):
+        cache = StateCache(lambda collection: [{'error': {'type': 1}}], ttl=None)
+        self.assertIsInstance(cache.get('lights'), list)
+        self.assertIsNone(cache.peek('lights'))
+
+
+class ShouldVersionCollections(TestCase):
+    def test_version_bumps_on_change(self):
+        fetch = StubFetch()
+        cache = StateCache(fetch, ttl=0)
+        _, version = cache.get_versioned('lights')
+        self.assertEqual(1, version)
+        # the same contents keep their version
+        self.assertEqual(1, cache.get_versioned('lights')[1])
+        fetch.state['lights']['1']['name'] = 'Lamp'
+        data, version = cache.get_versioned('lights')
+        self.assertEqual(2, version)
+        self.assertEqual('Lamp', data['1']['name'])
+
+
+class ShouldPatchCollections(TestCase):
+    def test_patch_notifies_listeners(self):
+        cache = StateCache(StubFetch(), ttl=None)
+        original = cache.get('lights')
+        version = cache.version('lights')
+        notified = list()
+        cache.subscribe(lambda collection, data: notified.append((collection, data)))
+        previous = cache.patch('lights', {('1', 'state', 'bri'): 50, ('1', 'state', 'ct'): MISSING, ('9', 'state', 'bri'): 1})
+        self.assertEqual({('1', 'state', 'bri'): 101, ('1', 'state', 'ct'): 300}, previous)
+        patched = cache.peek('lights')
+        self.assertEqual(50, patched['1']['state']['bri'])
+        self.assertNotIn('ct', patched['1']['state'])
+        # readers of the old copy are unaffected
+        self.assertEqual(101, original['1']['state']['bri'])
+        self.assertEqual(version + 1, cache.version('lights'))
+        self.assertEqual([('lights', patched)], notified)
+
+    def test_patch_of_uncached_collection(self):
+        cache = StateCache(StubFetch(), ttl=None)
+        self.assertEqual(dict(), cache.patch('lights', {('1', 'state', 'bri'): 50}))
+        self.assertIsNone(cache.peek('lights'))
+
+
+class ShouldServeLastKnownState(TestCase):
+    def test_last_known(self):
+        fetch = StubFetch()
+        cache = StateCache(fetch, ttl=0)
+        lights = cache.get('lights')
+        fetch.available = False
+        self.assertIs(lights, cache.get('lights'))
+        # explicit refreshes still report the failure
+        with self.assertRaises(PhueBridgeUnavailable):
+            cache.refresh('lights')
+
+    def test_nothing_known(self):
+        fetch = StubFetch()
+        fetch.available = False
+        with self.assertRaises(PhueBridgeUnavailable):
+            StateCache(fetch).get('lights')
+
+
+class ShouldFetchResources(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+
+    def tearDown(self):
+        self.fake.stop()
+
+    def test_error_response(self):
+        bridge = Bridge(self.fake.address, 'unknown-user')
+        response = bridge.get_light(1)
+        bridge.connection_pool.close()
+        self.assertEqual(1, response[0]['error']['type'])
+
+    def test_cached_resource(self):
+        bridge = Bridge(self.fake.address, USERNAME)
+        self.assertEqual('Light 1', bridge.get_light(1)['name'])
+        self.assertEqual('Light 2', bridge.get_light(2)['name'])
+        bridge.connection_pool.close()
+        self.assertEqual([f'/api/{USERNAME}/lights'], [path for path, _ in self.fake.requests_of('GET')])
@@ -0,0 +1,34 @@
+"""Test cases for the color conversion kernels."""
+from unittest import TestCase
+import numpy as np
+from ..philips_hue import colors
+
+
+class ShouldMatchScalarConversions(TestCase):
+    def setUp(self):
+        random = np.random.default_rng(0)
+        self.xy = random.uniform(0.05, 0.7, size=(500, 2))
+        self.brightness = random.integers(0, 255, size=500)
+        self.rgb = random.integers(0, 256, size=(500, 3))
+
+    def expected_rgb(self, function):
+        return np.array([function(x, y, bri) for (x, y), bri in zip(self.xy, self.brightness)])
+
+    def test_xy_bri_to_rgb_rows(self):
+        rgb = colors.xy_bri_to_rgb_rows(self.xy, self.brightness)
+        np.testing.assert_allclose(rgb, self.expected_rgb(colors.xy_bri_to_rgb))
+        # the pure Python version may round a channel differently
+        np.testing.assert_allclose(rgb, self.expected_rgb(colors.xy_bri_to_rgb.py_func), atol=1)
+
+    def test_xy_bri_to_rgb_array(self):
+        rgb = colors.xy_bri_to_rgb_array(self.xy, self.brightness)
+        np.testing.assert_allclose(rgb, self.expected_rgb(colors.xy_bri_to_rgb))
+
+    def test_rgb_to_xy_bri_array(self):
+        xy, brightness = colors.rgb_to_xy_bri_array(self.rgb)
+        expected = [colors.rgb_to_xy_bri(r, g, b) for r, g, b in self.rgb]
+        np.testing.assert_allclose(xy, np.array([xy for xy, _ in expected]), rtol=1e-12)
+        np.testing.assert_allclose(brightness, np.array([bri for _, bri in expected]))
+        expected = [colors.rgb_to_xy_bri.py_func(r, g, b) for r, g, b in self.rgb]
+        np.testing.assert_allclose(xy, np.array([xy for xy, _ in expected]), rtol=1e-9)
+        np.testing.assert_allclose(brightness, np.array([bri for _, bri in expected]), atol=1)
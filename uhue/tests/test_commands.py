@@ -0,0 +1,54 @@
+"""Test cases for the queue of interactive commands."""
+import time
+from unittest import TestCase
+from ..philips_hue.bridge import Bridge
+from ..philips_hue.commands import CommandQueue
+from .fake_bridge import FakeBridge, USERNAME
+
+
+class ShouldPaceCommandsByScheduler(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME, plan_commands=False,
+            rate_limits={'lights': (20.0, 1), 'groups': (2.0, 1)},
+        )
+        self.commands = CommandQueue(self.bridge)
+
+    def tearDown(self):
+        self.commands.stop()
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def wait_for(self, count, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while len(self.fake.requests_of('PUT')) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.fake.requests_of('PUT')
+
+    def test_coalesce(self):
+        for bri in range(1, 11):
+            self.commands.put_light(1, {'bri': bri})
+        self.commands.stop()
+        puts = self.fake.requests_of('PUT')
+        self.assertLessEqual(len(puts), 2)
+        self.assertEqual(10, self.fake.state['lights']['1']['state']['bri'])
+
+    def test_lane_rate(self):
+        start = time.monotonic()
+        for light_id in range(1, 6):
+            self.commands.put_light(light_id, {'bri': 1})
+        self.commands.stop()
+        elapsed = time.monotonic() - start
+        self.assertEqual(5, len(self.fake.requests_of('PUT')))
+        # four tokens at 20 per second, paced once
+        self.assertGreaterEqual(elapsed, 0.15)
+        self.assertLess(elapsed, 0.5)
+
+    def test_no_head_of_line_blocking(self):
+        self.commands.put_group(1, {'bri': 1})
+        self.wait_for(1)
+        self.commands.put_group(2, {'bri': 2})
+        self.commands.put_light(4, {'bri': 3})
+        puts = self.wait_for(2)
+        # the light goes out while the group waits for its lane
+        self.assertEqual(f'/api/{USERNAME}/lights/4/state', puts[1][0])
@@ -0,0 +1,75 @@
+"""Test cases for the pool of keep-alive connections to the bridge."""
+import json
+import time
+from http.client import HTTPException
+from unittest import TestCase
+from ..philips_hue.connection import ConnectFailed, ConnectionPool
+from .fake_bridge import FakeBridge, USERNAME
+
+
+class ShouldReuseConnections(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.pool = ConnectionPool(self.fake.address, size=2)
+        self.endpoint = f'/api/{USERNAME}/config'
+
+    def tearDown(self):
+        self.pool.close()
+        self.fake.stop()
+
+    def get(self):
+        return json.loads(self.pool.request('GET', self.endpoint))
+
+    def test_keep_alive(self):
+        for _ in range(3):
+            self.assertEqual({'name': 'Fake bridge'}, self.get())
+        self.assertEqual(1, self.fake.connections)
+
+    def test_stale_socket_is_replaced(self):
+        self.get()
+        self.fake.drop_connections()
+        self.assertEqual({'name': 'Fake bridge'}, self.get())
+        self.assertEqual(2, self.fake.connections)
+        self.assertEqual(2, len(self.fake.requests))
+
+    def test_idle_eviction(self):
+        self.pool.idle_timeout = 0.05
+        self.get()
+        time.sleep(0.05)
+        self.get()
+        self.assertEqual(2, self.fake.connections)
+
+    def test_connect_failed(self):
+        pool = ConnectionPool('127.0.0.1:1')
+        with self.assertRaises(ConnectFailed):
+            pool.request('GET', self.endpoint, timeout=1)
+
+
+class ShouldRetryOnlySafeMethods(TestCase):
+    """A socket that the bridge closes after the pool checked it."""
+
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.pool = ConnectionPool(self.fake.address)
+        # miss the closed socket as if the bridge closed it mid-request
+        self.pool._closed_by_peer = lambda connection: False
+        self.pool.request('GET', f'/api/{USERNAME}/config')
+        self.fake.drop_connections()
+        self.fake.clear()
+
+    def tearDown(self):
+        self.pool.close()
+        self.fake.stop()
+
+    def test_get_is_resent(self):
+        self.assertEqual({'name': 'Fake bridge'}, json.loads(self.pool.request('GET', f'/api/{USERNAME}/config')))
+        self.assertEqual(2, self.fake.connections)
+
+    def test_put_is_not_resent(self):
+        body = json.dumps({'name': 'Porch'})
+        with self.assertRaises((OSError, HTTPException)):
+            self.pool.request('PUT', f'/api/{USERNAME}/sensors/1', body)
+        self.assertEqual([], self.fake.requests_of('PUT'))
+        self.assertEqual(1, self.fake.connections)
+        # the failed connection isn't returned to the pool
+        self.assertEqual({'name': 'Fake bridge'}, json.loads(self.pool.request('GET', f'/api/{USERNAME}/config')))
@@ -0,0 +1,85 @@
+"""Test cases for pushing state changes to pages."""
+import copy
+from unittest import TestCase, mock
+from ..events import StatePoller, merge
+from ..philips_hue import membership
+from ..philips_hue.bridge import Bridge
+from .fake_bridge import make_state
+
+
+class StubPolling:
+    """A polling service that never polls."""
+
+    def __init__(self):
+        self.bridge = Bridge('127.0.0.1:1', 'test-user')
+
+    def subscribe(self, callback, collection):
+        return (callback, collection)
+
+    def unsubscribe(self, handle):
+        pass
+
+
+def drain(subscriber) -> list:
+    """Return every queued update of a subscriber."""
+    updates = []
+    while not subscriber.empty():
+        updates.append(subscriber.get_nowait())
+    return updates
+
+
+class ShouldMergeBackloggedUpdates(TestCase):
+    def test_merge(self):
+        pending = {'lights': {'1': {'on': True, 'brightness': 10}}}
+        changes = {'lights': {'1': {'brightness': 20}, '2': {'on': False}}, 'groups': {'1': {'on': True}}}
+        self.assertEqual({
+            'lights': {'1': {'on': True, 'brightness': 20}, '2': {'on': False}},
+            'groups': {'1': {'on': True}},
+        }, merge(pending, changes))
+        # the inputs are left alone
+        self.assertEqual({'lights': {'1': {'on': True, 'brightness': 10}}}, pending)
+
+    def test_slow_subscriber_misses_nothing(self):
+        poller = StatePoller(StubPolling(), max_backlog=2)
+        subscriber = poller.subscribe()
+        poller.publish({'lights': {'2': {'on': False}}})
+        for brightness in range(1, 6):
+            poller.publish({'lights': {'1': {'brightness': brightness}}})
+        poller.publish({'groups': {'1': {'name': 'Cook'}}})
+        updates = drain(subscriber)
+        self.assertLessEqual(len(updates), 2)
+        final = dict()
+        for update in updates:
+            final = merge(final, update)
+        self.assertEqual({
+            'lights': {'1': {'brightness': 5}, '2': {'on': False}},
+            'groups': {'1': {'name': 'Cook'}},
+        }, final)
+
+    def test_fast_subscriber_gets_each_update(self):
+        poller = StatePoller(StubPolling(), max_backlog=4)
+        subscriber = poller.subscribe()
+        poller.publish({'lights': {'1': {'on': True}}})
+        poller.publish({'lights': {'1': {'on': False}}})
+        self.assertEqual([{'lights': {'1': {'on': True}}}, {'lights': {'1': {'on': False}}}], drain(subscriber))
+
+
+class ShouldReuseGroupAggregates(TestCase):
+    def test_once_per_snapshot(self):
+        polling = StubPolling()
+        cache = polling.bridge.cache
+        cache.load(make_state())
+        poller = StatePoller(polling)
+        with mock.patch.object(membership, 'group_aggregates', wraps=membership.group_aggregates) as compute:
+            subscriber = poller.subscribe()
+            poller._on_change('groups', {'1': {}})
+            self.assertEqual(1, compute.call_count)
+            # a new snapshot of the lights computes them again
+            lights = copy.deepcopy(cache.peek('lights'))
+            lights['1']['state']['on'] = False
+            cache.store('lights', lights)
+            poller._on_change('lights', {'1': lights['1']})
+            self.assertEqual(2, compute.call_count)
+        updates = drain(subscriber)
+        self.assertEqual({'1'}, set(updates[-1]['groups']))
+        self.assertFalse(updates[-1]['lights']['1']['on'])
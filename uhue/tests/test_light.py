@@ -0,0 +1,35 @@
+"""Test cases for the Light object."""
+import threading
+from unittest import TestCase
+from ..philips_hue.bridge import Bridge
+from .fake_bridge import FakeBridge, USERNAME
+
+
+class ShouldBatchAttributeWrites(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME)
+        self.light = self.bridge.lights_by_id[1]
+        self.fake.clear()
+
+    def tearDown(self):
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def test_one_request(self):
+        with self.light.batch():
+            self.light.on = False
+            self.light.brightness = 20
+            self.light.colortemp = 250
+        self.assertEqual([('/api/test-user/lights/1/state', {'on': False, 'bri': 20, 'ct': 250})], self.fake.requests_of('PUT'))
+
+    def test_other_threads_are_not_absorbed(self):
+        with self.light.batch():
+            self.light.brightness = 20
+            thread = threading.Thread(target=self.light.update, kwargs={'on': False})
+            thread.start()
+            thread.join()
+            # the other thread's write was sent right away
+            self.assertEqual([('/api/test-user/lights/1/state', {'on': False})], self.fake.requests_of('PUT'))
+        self.assertEqual({'bri': 20}, self.fake.requests_of('PUT')[-1][1])
+        self.assertEqual(2, len(self.fake.requests_of('PUT')))
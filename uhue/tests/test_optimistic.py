@@ -0,0 +1,56 @@
+"""Test cases for the optimistic updates of the cached bridge state."""
+from unittest import TestCase
+from ..philips_hue.bridge import Bridge
+from .fake_bridge import FakeBridge, USERNAME, error
+
+
+class ShouldSettleOptimisticUpdates(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME, cache_ttl=None, plan_commands=False)
+        self.bridge.cache.get('lights')
+        self.bridge.cache.get('groups')
+
+    def tearDown(self):
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def cached_state(self, light_id):
+        return self.bridge.cache.peek('lights')[str(light_id)]['state']
+
+    def test_confirmed_response(self):
+        self.bridge.set_light(1, 'bri', 50)
+        self.assertEqual(50, self.cached_state(1)['bri'])
+        self.assertEqual(50, self.fake.state['lights']['1']['state']['bri'])
+
+    def test_partial_error(self):
+        self.bridge.set_light(1, {'on': False, 'bri': 'dim'})
+        # the refused attribute is rolled back and the confirmed one is kept
+        self.assertEqual(101, self.cached_state(1)['bri'])
+        self.assertFalse(self.cached_state(1)['on'])
+        self.assertFalse(self.bridge.cache.peek('groups')['1']['state']['all_on'])
+
+    def test_whole_command_error(self):
+        address = '/lights/1/state'
+        self.fake.overrides[('PUT', f'/api/{USERNAME}{address}')] = [error(3, address, 'resource not available')]
+        self.bridge.set_light(1, {'on': False, 'bri': 50})
+        self.assertEqual(101, self.cached_state(1)['bri'])
+        self.assertTrue(self.cached_state(1)['on'])
+        self.assertTrue(self.bridge.cache.peek('groups')['1']['state']['all_on'])
+
+    def test_exception(self):
+        in_flight = list()
+
+        def fail(*args, **kwargs):
+            in_flight.append(self.cached_state(1)['bri'])
+            raise OSError('connection reset')
+
+        self.bridge.request = fail
+        with self.assertRaises(OSError):
+            self.bridge.set_light(1, 'bri', 50)
+        # the cache reflects the command while it is in flight
+        self.assertEqual([50], in_flight)
+        # and everything it touched is fetched again once it failed
+        self.assertIsNone(self.bridge.cache.peek('lights'))
+        del self.bridge.request
+        self.assertEqual(101, self.bridge.cache.get('lights')['1']['state']['bri'])
@@ -0,0 +1,54 @@
+"""Test cases for sending multi-light commands as group actions."""
+from unittest import TestCase
+from ..philips_hue.bridge import Bridge
+from .fake_bridge import FakeBridge, USERNAME
+
+
+class ShouldPlanGroupActions(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME)
+        # load the groups and lights the plan is made from
+        self.bridge.refresh()
+        self.fake.clear()
+
+    def tearDown(self):
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def test_one_group_action(self):
+        result = self.bridge.set_light([1, 2, 3], {'on': True, 'bri': 80}, transitiontime=2)
+        self.assertEqual([('/api/test-user/groups/1/action', {'on': True, 'bri': 80, 'transitiontime': 2})], self.fake.requests_of('PUT'))
+        self.assertEqual(3, len(result))
+        self.assertTrue(all(response == result[0] and response for response in result))
+
+    def test_sent_when_the_cache_is_stale(self):
+        # a wall switch turns the lights off, the cache still shows them on
+        for light_id in (1, 2, 3):
+            self.fake.set_light_state(light_id, on=False)
+        result = self.bridge.set_light([1, 2, 3], 'on', True)
+        self.assertEqual([('/api/test-user/groups/1/action', {'on': True})], self.fake.requests_of('PUT'))
+        self.assertTrue(all(result))
+        self.assertTrue(all(self.fake.state['lights'][str(x)]['state']['on'] for x in (1, 2, 3)))
+
+    def test_after_the_cache_is_refetched(self):
+        for light_id in (1, 2, 3):
+            self.fake.set_light_state(light_id, on=False)
+        self.bridge.refresh('lights')
+        self.bridge.set_light([1, 2, 3], 'on', True)
+        self.assertEqual([('/api/test-user/groups/1/action', {'on': True})], self.fake.requests_of('PUT'))
+
+    def test_only_needed_attributes(self):
+        self.bridge.set_light(1, 'bri', 80)
+        self.bridge.set_light(2, 'bri', 80)
+        self.fake.clear()
+        # lights 1 and 2 already have the brightness, but light 3 needs it
+        result = self.bridge.set_light([1, 2, 3], {'bri': 80, 'ct': 300})
+        self.assertEqual([('/api/test-user/groups/1/action', {'bri': 80, 'ct': 300})], self.fake.requests_of('PUT'))
+        self.assertTrue(all(result))
+
+    def test_lights_in_the_state_are_skipped(self):
+        self.bridge.set_light([1, 2, 3], 'ct', 250)
+        self.fake.clear()
+        self.assertEqual([[], [], []], self.bridge.set_light([1, 2, 3], 'ct', 250))
+        self.assertEqual([], self.fake.requests_of('PUT'))
@@ -0,0 +1,104 @@
+"""Test cases for the registries of light, group, and sensor objects."""
+import threading
+from unittest import TestCase
+from ..philips_hue.bridge import Bridge
+from ..philips_hue.registry import ObjectRegistry
+from .fake_bridge import FakeBridge, USERNAME, error
+
+
+class Resource:
+    """A stand-in for a light, group, or sensor object."""
+
+    def __init__(self, resource_id):
+        self.resource_id = resource_id
+
+
+class ShouldShareRegistriesBetweenThreads(TestCase):
+    def test_concurrent_reads_and_writes(self):
+        registry = ObjectRegistry('lights')
+        registry.load(lambda: {str(x): {'name': f'Light {x}'} for x in range(100)}, Resource)
+        stop = threading.Event()
+        failures = []
+
+        def read():
+            while not stop.is_set():
+                try:
+                    for resource_id, obj in registry.by_id.items():
+                        assert obj.resource_id == resource_id
+                    for name, obj in registry.by_name.items():
+                        assert isinstance(obj, Resource)
+                except Exception as exception:  # e.g., changed size during iteration
+                    failures.append(exception)
+                    return
+
+        def write(first):
+            for resource_id in range(first, first + 200):
+                registry.add(resource_id, f'New {resource_id}', Resource(resource_id))
+                registry.rename(f'New {resource_id}', f'Renamed {resource_id}', None)
+                if resource_id % 2:
+                    registry.remove(resource_id)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        writers = [threading.Thread(target=write, args=(1000 * (x + 1),)) for x in range(4)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+        self.assertEqual([], failures)
+        expected = set(range(100)) | {x for first in (1000, 2000, 3000, 4000) for x in range(first, first + 200) if not x % 2}
+        self.assertEqual(expected, set(registry.by_id))
+        self.assertEqual(len(expected), len(registry.by_name))
+        self.assertNotIn('New 1000', registry.by_name)
+        self.assertIs(registry.by_id[1000], registry.by_name['Renamed 1000'])
+
+
+class ShouldLoadRegistriesOnce(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME)
+
+    def tearDown(self):
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def test_concurrent_first_access(self):
+        barrier = threading.Barrier(16)
+        results = []
+
+        def access():
+            barrier.wait()
+            results.append(self.bridge.lights_by_id)
+
+        threads = [threading.Thread(target=access) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(['/api/test-user/lights'], [path for path, _ in self.fake.requests_of('GET')])
+        self.assertEqual(16, len(results))
+        self.assertTrue(all(result[1] is results[0][1] for result in results))
+
+
+class ShouldDeleteSensors(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME)
+
+    def tearDown(self):
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def test_deleted(self):
+        self.bridge.delete_sensor(1)
+        self.assertNotIn(1, self.bridge.sensors_by_id)
+        self.assertFalse(self.bridge.get_sensor_id_by_name('Daylight'))
+
+    def test_refused(self):
+        path = '/api/test-user/sensors/1'
+        self.fake.overrides[('DELETE', path)] = [error(1, path, 'unauthorized user')]
+        self.bridge.delete_sensor(1)
+        self.assertIn(1, self.bridge.sensors_by_id)
+        self.assertEqual('1', self.bridge.get_sensor_id_by_name('Daylight'))
@@ -0,0 +1,49 @@
+"""Test cases for finding and running scenes."""
+import time
+from unittest import TestCase
+from ..philips_hue.bridge import Bridge
+from .fake_bridge import FakeBridge, USERNAME
+
+
+class ShouldRunScenesByName(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME, cache_ttl=60.0)
+
+    def tearDown(self):
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def add_scene(self, scene_id, name, group_id):
+        with self.fake.lock:
+            self.fake.state['scenes'][scene_id] = {
+                'name': name, 'type': 'GroupScene', 'group': group_id, 'lights': list(self.fake.state['groups'][group_id]['lights']),
+                'owner': USERNAME, 'lastupdated': '2020-01-02T00:00:00', 'version': 2,
+            }
+
+    def test_warm_run_sends_one_put(self):
+        self.assertTrue(self.bridge.run_scene('Kitchen', 'Relax'))
+        self.fake.clear()
+        self.assertTrue(self.bridge.run_scene('Kitchen', 'Relax'))
+        self.assertEqual([('PUT', f'/api/{USERNAME}/groups/1/action', {'scene': 'abc', 'transitiontime': 4})], self.fake.requests)
+
+    def test_new_scene_is_found(self):
+        self.assertTrue(self.bridge.run_scene('Kitchen', 'Relax'))
+        self.add_scene('ghi', 'Party', '1')
+        self.fake.clear()
+        self.assertTrue(self.bridge.run_scene('Kitchen', 'Party'))
+        self.assertEqual([
+            ('GET', f'/api/{USERNAME}/scenes', None),
+            ('PUT', f'/api/{USERNAME}/groups/1/action', {'scene': 'ghi', 'transitiontime': 4}),
+        ], self.fake.requests)
+
+    def test_missing_scene(self):
+        self.assertFalse(self.bridge.run_scene('Kitchen', 'Party'))
+        self.assertEqual([], self.fake.requests_of('PUT'))
+
+    def test_expired_scenes_are_fetched(self):
+        self.bridge.cache.ttl = 0.05
+        self.assertEqual(1, len(self.bridge.scene_registry.named('Relax')))
+        self.add_scene('ghi', 'Relax', '2')
+        time.sleep(0.05)
+        self.assertEqual({'abc', 'ghi'}, {scene.scene_id for scene in self.bridge.scene_registry.named('Relax')})
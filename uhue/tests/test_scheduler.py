@@ -0,0 +1,89 @@
+"""Test cases for pacing requests to the bridge."""
+import threading
+import time
+from unittest import TestCase
+from ..philips_hue.scheduler import BACKGROUND, INTERACTIVE, NORMAL, RequestScheduler, TokenBucket
+
+
+class ShouldClassifyRequests(TestCase):
+    def test_lanes(self):
+        classify = RequestScheduler.classify
+        self.assertEqual('reads', classify('GET', '/api/user/lights'))
+        self.assertEqual('lights', classify('PUT', '/api/user/lights/1/state'))
+        self.assertEqual('groups', classify('PUT', '/api/user/groups/1/action'))
+        self.assertIsNone(classify('PUT', '/api/user/lights/1'))
+        self.assertIsNone(classify('DELETE', '/api/user/scenes/abc'))
+
+
+class ShouldPaceLanes(TestCase):
+    def test_token_bucket(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0, 1)
+        with self.assertRaises(ValueError):
+            TokenBucket(1, 0)
+
+    def test_burst_then_rate(self):
+        scheduler = RequestScheduler({'lights': (20.0, 2)})
+        start = time.monotonic()
+        waits = [scheduler.acquire('lights') for _ in range(6)]
+        elapsed = time.monotonic() - start
+        self.assertEqual([0.0, 0.0], [round(wait, 2) for wait in waits[:2]])
+        # four requests beyond the burst at 20 per second
+        self.assertGreaterEqual(elapsed, 0.19)
+        self.assertLess(elapsed, 0.4)
+
+    def test_lanes_are_independent(self):
+        scheduler = RequestScheduler({'groups': (1.0, 1), 'lights': (10.0, 1)})
+        scheduler.acquire('groups')
+        self.assertGreater(scheduler.delay('groups'), 0.5)
+        self.assertLess(scheduler.acquire('lights'), 0.05)
+
+    def test_unpaced_lane(self):
+        scheduler = RequestScheduler({'reads': None})
+        self.assertNotIn('reads', scheduler.statistics())
+        self.assertEqual(0.0, scheduler.acquire('reads'))
+        self.assertEqual(0.0, scheduler.acquire(None))
+
+
+class ShouldServeHigherPrioritiesFirst(TestCase):
+    def test_priority_order(self):
+        scheduler = RequestScheduler({'groups': (10.0, 1)})
+        scheduler.acquire('groups')
+        order = list()
+
+        def send(priority):
+            scheduler.acquire('groups', priority)
+            order.append(priority)
+
+        threads = list()
+        # queue the requests from lowest to highest priority while the
+        # lane has no token
+        for depth, priority in enumerate([BACKGROUND, NORMAL, INTERACTIVE], 1):
+            thread = threading.Thread(target=send, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            while scheduler.statistics()['groups']['depth'] < depth:
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        self.assertEqual([INTERACTIVE, NORMAL, BACKGROUND], order)
+
+    def test_thread_priority(self):
+        scheduler = RequestScheduler()
+        self.assertEqual(NORMAL, scheduler.current_priority)
+        with scheduler.priority(BACKGROUND):
+            self.assertEqual(BACKGROUND, scheduler.current_priority)
+        self.assertEqual(NORMAL, scheduler.current_priority)
+
+
+class ShouldReportStatistics(TestCase):
+    def test_statistics(self):
+        scheduler = RequestScheduler({'lights': (20.0, 1)})
+        for _ in range(3):
+            scheduler.acquire('lights')
+        statistics = scheduler.statistics()['lights']
+        self.assertEqual(0, statistics['depth'])
+        self.assertEqual(3, statistics['requests'])
+        self.assertGreater(statistics['max_wait'], 0.02)
+        self.assertLessEqual(statistics['mean_wait'], statistics['max_wait'])
+        self.assertEqual(0, scheduler.statistics()['reads']['requests'])
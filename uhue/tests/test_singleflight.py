@@ -0,0 +1,66 @@
+"""Test cases for coalescing identical concurrent reads."""
+import threading
+import time
+from unittest import TestCase
+from ..philips_hue.bridge import Bridge
+from ..philips_hue.exceptions import PhueBridgeUnavailable
+from .fake_bridge import FakeBridge, USERNAME
+
+
+class ShouldCoalesceConcurrentReads(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME, retries=0)
+        self.endpoint = f'/api/{USERNAME}/lights'
+        self.results = list()
+
+    def tearDown(self):
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def read(self):
+        try:
+            self.results.append(self.bridge.request('GET', self.endpoint))
+        except PhueBridgeUnavailable as error:
+            self.results.append(error)
+
+    def read_together(self, count: int, while_waiting=None) -> None:
+        """Send reads from several threads while the bridge holds the first one."""
+        threads = [threading.Thread(target=self.read) for _ in range(count)]
+        # the bridge can't answer while the test holds its lock
+        with self.fake.lock:
+            for thread in threads:
+                thread.start()
+            deadline = time.monotonic() + 2.0
+            while self.bridge.reads_in_flight.coalesced < count - 1 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            if while_waiting is not None:
+                while_waiting()
+        for thread in threads:
+            thread.join()
+
+    def test_one_request(self):
+        self.read_together(5)
+        self.assertEqual(1, len(self.fake.requests_of('GET')))
+        self.assertEqual(5, len(self.results))
+        # every caller receives the same response
+        self.assertTrue(all(result is self.results[0] for result in self.results))
+        self.assertEqual('Light 1', self.results[0]['1']['name'])
+
+    def test_leader_error_reaches_followers(self):
+        def drop():
+            # close the connection of the leader before the bridge answers it
+            while not self.fake._sockets:
+                time.sleep(0.001)
+            self.fake.drop_connections(timeout=0)
+
+        self.read_together(5, drop)
+        self.assertEqual(1, len(self.fake.requests_of('GET')))
+        self.assertEqual(5, len(self.results))
+        self.assertIsInstance(self.results[0], PhueBridgeUnavailable)
+        self.assertTrue(all(result is self.results[0] for result in self.results))
+
+    def test_later_reads_are_sent(self):
+        self.read()
+        self.read()
+        self.assertEqual(2, len(self.fake.requests_of('GET')))
@@ -0,0 +1,74 @@
+"""Test cases for stripping unchanged attributes from commands."""
+from unittest import TestCase
+from ..philips_hue.bridge import Bridge
+from ..philips_hue.tracker import StateTracker
+from .fake_bridge import FakeBridge, USERNAME
+
+
+class ShouldDiffGroupsAgainstTheirLights(TestCase):
+    def test_every_light_agrees(self):
+        members = [{'on': True, 'bri': 10}, {'on': True, 'bri': 20}]
+        diff = StateTracker().diff('groups', 1, {'on': True, 'bri': 10}, members)
+        self.assertEqual({'bri': 10}, diff)
+
+    def test_nothing_changes(self):
+        members = [{'on': False}, {'on': False}]
+        self.assertIsNone(StateTracker().diff('groups', 1, {'on': False, 'transitiontime': 4}, members))
+
+    def test_color_mode_must_match(self):
+        members = [{'xy': [0.3, 0.3], 'colormode': 'ct'}]
+        self.assertEqual({'xy': [0.3, 0.3]}, StateTracker().diff('groups', 1, {'xy': [0.3, 0.3]}, members))
+
+    def test_no_members(self):
+        self.assertEqual({'on': True}, StateTracker().diff('groups', 1, {'on': True}, []))
+
+    def test_acknowledged_action_is_not_remembered(self):
+        tracker = StateTracker()
+        tracker.acknowledge('groups', 1, [{'success': {'/groups/1/action/on': True}}], ['1'])
+        self.assertEqual({'on': True}, tracker.diff('groups', 1, {'on': True}, [{'on': False}]))
+
+    def test_acknowledged_action_is_recorded_for_lights(self):
+        tracker = StateTracker()
+        tracker.acknowledge('groups', 1, [{'success': {'/groups/1/action/bri': 80}}], ['1', '2'])
+        self.assertIsNone(tracker.diff('lights', 2, {'bri': 80}))
+        self.assertEqual({'bri': 80}, tracker.diff('lights', 3, {'bri': 80}))
+
+
+class ShouldResendGroupActionsAfterExternalChanges(TestCase):
+    def setUp(self):
+        self.fake = FakeBridge().start()
+        self.bridge = Bridge(self.fake.address, USERNAME)
+
+    def tearDown(self):
+        self.bridge.connection_pool.close()
+        self.fake.stop()
+
+    def switch_off_kitchen(self):
+        """Switch the kitchen lights off outside the API and refetch them."""
+        for light_id in (1, 2, 3):
+            self.fake.set_light_state(light_id, on=False)
+        self.bridge.refresh('lights')
+
+    def test_on_after_wall_switch(self):
+        self.switch_off_kitchen()
+        self.bridge.set_group(1, 'on', True)
+        self.switch_off_kitchen()
+        self.fake.clear()
+        self.bridge.set_group(1, 'on', True)
+        self.assertEqual([('/api/test-user/groups/1/action', {'on': True})], self.fake.requests_of('PUT'))
+        self.assertTrue(all(self.fake.state['lights'][str(x)]['state']['on'] for x in (1, 2, 3)))
+
+    def test_on_after_one_light_is_switched_off(self):
+        self.fake.set_light_state(2, on=False)
+        self.bridge.refresh('lights')
+        self.assertEqual([[{'success': {'/groups/1/action/on': True}}]], self.bridge.set_group(1, 'on', True))
+
+    def test_unchanged_action_is_skipped(self):
+        self.bridge.set_group(1, 'bri', 50)
+        self.fake.clear()
+        self.assertEqual([[]], self.bridge.set_group(1, 'bri', 50))
+        self.assertEqual([], self.fake.requests_of('PUT'))
+
+    def test_force(self):
+        self.bridge.set_group(1, 'on', True, force=True)
+        self.assertEqual(1, len(self.fake.requests_of('PUT')))
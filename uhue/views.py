@@ -0,0 +1,149 @@
+"""Plain view-models for rendering pages from bulk bridge data."""
+from .philips_hue.colors import WHITE_XY, xy_bri_to_rgb
+
+
+def color_hex(state: dict) -> str:
+    """
+    Return the display color of a light state in hex format.
+
+    Args:
+        state: the "state" (light) or "action" (group) dictionary
+
+    Returns:
+        the color as a hex string without a leading "#"
+
+    """
+    return '%02x%02x%02x' % xy_bri_to_rgb(*state.get('xy', WHITE_XY), state.get('bri', 254))
+
+
+class LightView:
+    """The data needed to render a single light."""
+
+    def __init__(self, light_id: int, data: dict) -> None:
+        """
+        Initialize a new light view.
+
+        Args:
+            light_id: the ID of the light
+            data: the light resource as returned by the bridge
+
+        Returns:
+            None
+
+        """
+        self.light_id = light_id
+        self.name = data['name']
+        self.manufacturername = data.get('manufacturername', '')
+        self.productname = data.get('productname', '')
+        self.config = data.get('config', {})
+        self.on = data['state'].get('on', False)
+        self.brightness = data['state'].get('bri', 254)
+        self.color_hex = color_hex(data['state'])
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} id={self.light_id} name="{self.name}">'
+
+
+class GroupView:
+    """The data needed to render a single group."""
+
+    def __init__(self, group_id: int, data: dict, aggregate: dict = None) -> None:
+        """
+        Initialize a new group view.
+
+        Args:
+            group_id: the ID of the group
+            data: the group resource as returned by the bridge
+            aggregate: the combined state of the group's lights (see
+                Bridge.get_group_aggregate), or None to show the last action
+                sent to the group
+
+        Returns:
+            None
+
+        """
+        self.group_id = group_id
+        self.name = data['name']
+        self.lights = [int(light_id) for light_id in data.get('lights', [])]
+        if aggregate is None or aggregate['bri'] is None:
+            self.on = data['action'].get('on', False)
+            self.brightness = data['action'].get('bri', 254)
+            self.color_hex = color_hex(data['action'])
+        else:
+            self.on = aggregate['any_on']
+            self.brightness = aggregate['bri']
+            self.color_hex = '%02x%02x%02x' % aggregate['rgb']
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} id={self.group_id} name="{self.name}">'
+
+
+class SceneView:
+    """The data needed to render a single scene."""
+
+    def __init__(self, scene, group_name: str = '') -> None:
+        """
+        Initialize a new scene view.
+
+        Args:
+            scene: the Scene to render, with its light states loaded
+            group_name: the name of the group the scene is stored for, or an
+                empty string for scenes without a group
+
+        Returns:
+            None
+
+        """
+        self.scene_id = scene.scene_id
+        self.name = scene.name
+        self.group_id = int(scene.group) if scene.group else 0
+        self.group_name = group_name
+        # the color of each light in the scene, black for lights that are off
+        lightstates = scene.lightstates or {}
+        self.colors = [color_hex(state) if state.get('on', False) else '000000'
+            for _, state in sorted(lightstates.items(), key=lambda x: int(x[0]))
+        ]
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} id={self.scene_id} name="{self.name}">'
+
+
+def light_views(bridge) -> list:
+    """Return views of all the lights sorted by name from one bulk fetch."""
+    lights = bridge.get_light()
+    # the bridge answers with a list of errors (e.g., for an unknown user)
+    if not isinstance(lights, dict):
+        return []
+    views = [LightView(int(light_id), data) for light_id, data in lights.items()]
+    return sorted(views, key=lambda x: x.name)
+
+
+def group_views(bridge) -> list:
+    """Return views of all the groups sorted by name from bulk fetches of the groups and lights."""
+    groups = bridge.get_group()
+    if not isinstance(groups, dict):  # a list of errors
+        return []
+    aggregates = bridge.get_group_aggregate()
+    views = [GroupView(int(group_id), data, aggregates.get(group_id)) for group_id, data in groups.items()]
+    return sorted(views, key=lambda x: x.name)
+
+
+def scene_views(bridge) -> list:
+    """Return views of all the scenes sorted by name with their light states fetched concurrently."""
+    scenes = bridge.scene_registry.scenes()
+    bridge.scene_registry.load_lightstates(scenes)
+    groups = bridge.cache.get('groups')
+    groups = groups if isinstance(groups, dict) else dict()
+    views = [SceneView(scene, groups.get(str(scene.group), {}).get('name', '')) for scene in scenes]
+    return sorted(views, key=lambda x: x.name)
+
+
+# explicitly define the outward facing API of this module
+__all__ = [
+    LightView.__name__,
+    GroupView.__name__,
+    SceneView.__name__,
+    light_views.__name__,
+    group_views.__name__,
+    scene_views.__name__,
+]